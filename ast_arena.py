@@ -0,0 +1,277 @@
+import marshal
+from array import array
+from typing import List, Optional
+
+from parser import *
+
+# Field layout of every node class, in constructor order.
+#   node  - optional child node      nodes - list of child nodes
+#   str   - string (or None)         value - literal value
+#   flag  - boolean
+SCHEMA = {
+    Program: [('declarations', 'nodes')],
+    FunctionDeclaration: [('return_type', 'str'), ('name', 'str'), ('parameters', 'nodes'), ('body', 'node')],
+    VariableDeclaration: [('type_name', 'str'), ('name', 'str'), ('initializer', 'node'), ('size', 'node')],
+    Parameter: [('type_name', 'str'), ('name', 'str')],
+    CompoundStatement: [('statements', 'nodes')],
+    ExpressionStatement: [('expression', 'node')],
+    IfStatement: [('condition', 'node'), ('then_stmt', 'node'), ('else_stmt', 'node')],
+    WhileStatement: [('condition', 'node'), ('body', 'node')],
+    ForStatement: [('init', 'node'), ('condition', 'node'), ('update', 'node'), ('body', 'node')],
+    ReturnStatement: [('expression', 'node')],
+    BreakStatement: [],
+    ContinueStatement: [],
+    BinaryExpression: [('left', 'node'), ('operator', 'str'), ('right', 'node')],
+    UnaryExpression: [('operator', 'str'), ('operand', 'node')],
+    AssignmentExpression: [('left', 'node'), ('operator', 'str'), ('right', 'node')],
+    FunctionCall: [('function', 'node'), ('arguments', 'nodes')],
+    Identifier: [('name', 'str')],
+    Literal: [('value', 'value')],
+    ArrayAccess: [('array', 'node'), ('index', 'node')],
+    MemberAccess: [('object', 'node'), ('member', 'str'), ('is_arrow', 'flag')],
+    CastExpression: [('type_name', 'str'), ('operand', 'node')],
+    StructDeclaration: [('name', 'str'), ('members', 'nodes')],
+    SizeofExpression: [('type_name', 'str')],
+}
+
+NODE_CLASSES = list(SCHEMA)
+KIND_CODES = {cls: code for code, cls in enumerate(NODE_CLASSES)}
+MAX_FIELDS = max(len(fields) for fields in SCHEMA.values())
+
+# Identifies the serialized layout: changes whenever SCHEMA does
+ARENA_FORMAT = repr([(cls.__name__, fields) for cls, fields in SCHEMA.items()])
+
+
+def make_view_class(cls):
+    """Subclass of cls whose fields are read from an ASTArena row instead of slots"""
+    namespace = {'__slots__': ('_arena', '_index')}
+    for column, (field, kind) in enumerate(SCHEMA[cls]):
+        if kind == 'node':
+            getter = lambda self, c=column: self._arena.view(self._arena.fields[c][self._index])
+        elif kind == 'nodes':
+            getter = lambda self, c=column: self._arena.views(self._arena.fields[c][self._index])
+        elif kind == 'str':
+            getter = lambda self, c=column: self._arena.string(self._arena.fields[c][self._index])
+        elif kind == 'value':
+            getter = lambda self, c=column: self._arena.literals[self._arena.fields[c][self._index]]
+        else:
+            getter = lambda self, c=column: bool(self._arena.fields[c][self._index])
+        namespace[field] = property(getter)
+    return type(cls.__name__ + 'View', (cls,), namespace)
+
+
+VIEW_CLASSES = [make_view_class(cls) for cls in NODE_CLASSES]
+VIEW_BASES = {view: cls for view, cls in zip(VIEW_CLASSES, NODE_CLASSES)}
+
+
+def copy_tree(node):
+    """Ordinary copy of node's subtree without any annotations; node may be
+    an arena view. Built bottom-up from a work list, so nesting depth is not
+    bounded by the recursion limit."""
+    results = []
+    pending = [(node, None)]
+    while pending:
+        node, counts = pending.pop()
+        if node is None:
+            results.append(None)
+            continue
+        cls = VIEW_BASES.get(type(node), type(node))
+        if counts is None:
+            # First visit: queue the node again behind its children
+            children = []
+            counts = []
+            for field, kind in SCHEMA[cls]:
+                if kind == 'node':
+                    children.append(getattr(node, field))
+                elif kind == 'nodes':
+                    value = getattr(node, field)
+                    counts.append(len(value))
+                    children.extend(value)
+            pending.append((node, counts))
+            pending.extend((child, None) for child in reversed(children))
+            continue
+        start = len(results) - sum(counts) - sum(1 for _, kind in SCHEMA[cls] if kind == 'node')
+        copies = iter(results[start:])
+        del results[start:]
+        counts = iter(counts)
+        values = []
+        for field, kind in SCHEMA[cls]:
+            if kind == 'node':
+                values.append(next(copies))
+            elif kind == 'nodes':
+                values.append([next(copies) for _ in range(next(counts))])
+            else:
+                values.append(getattr(node, field))
+        if cls is Program:
+            program = Program()
+            program.declarations = values[0]
+            results.append(program)
+        else:
+            results.append(cls(*values))
+    return results[0]
+
+
+class ASTArena:
+    """Columnar storage for a whole AST.
+
+    Each node is one row: a kind code in `kinds` and up to MAX_FIELDS int
+    columns in `fields`. A child node is stored as its row index, a child
+    list as an offset into `lists` (where the run is prefixed by its
+    length), strings such as names and operator spellings as an index into
+    the interned `strings` pool, and literal values as an index into
+    `literals`. -1 stands for None.
+
+    `root` returns lightweight views: instances of subclasses of the
+    regular node classes that read their fields from the arena on access,
+    so isinstance checks and attribute access work as on a parsed tree.
+    Views are read-only and built on demand; `to_program` rebuilds an
+    ordinary tree when one is needed, e.g. for the Resolver to annotate.
+    """
+
+    def __init__(self) -> None:
+        self.kinds = array('B')
+        self.fields = [array('i') for _ in range(MAX_FIELDS)]
+        self.lists = array('i')
+        self.strings: List[str] = []
+        self.string_ids: dict = {}
+        self.literals: list = []
+        self.literal_ids: dict = {}
+        self.root_index = -1
+
+    @classmethod
+    def from_program(cls, program: Program) -> 'ASTArena':
+        arena = cls()
+        arena.root_index = arena.add(program)
+        return arena
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def add(self, node) -> int:
+        """Store node and its subtree; return the row index of node"""
+        if node is None:
+            return -1
+        values = []
+        for field, kind in SCHEMA[type(node)]:
+            value = getattr(node, field)
+            if kind == 'node':
+                values.append(self.add(value))
+            elif kind == 'nodes':
+                values.append(self.add_list([self.add(child) for child in value]))
+            elif kind == 'str':
+                values.append(self.add_string(value))
+            elif kind == 'value':
+                values.append(self.add_literal(value))
+            else:
+                values.append(1 if value else 0)
+        values.extend([-1] * (MAX_FIELDS - len(values)))
+
+        index = len(self.kinds)
+        self.kinds.append(KIND_CODES[type(node)])
+        for column, value in zip(self.fields, values):
+            column.append(value)
+        return index
+
+    def add_list(self, indices: List[int]) -> int:
+        offset = len(self.lists)
+        self.lists.append(len(indices))
+        self.lists.extend(indices)
+        return offset
+
+    def add_string(self, text: Optional[str]) -> int:
+        if text is None:
+            return -1
+        sid = self.string_ids.get(text)
+        if sid is None:
+            sid = len(self.strings)
+            self.string_ids[text] = sid
+            self.strings.append(text)
+        return sid
+
+    def add_literal(self, value) -> int:
+        key = (type(value), value)  # keep 1 and 1.0 apart
+        lid = self.literal_ids.get(key)
+        if lid is None:
+            lid = len(self.literals)
+            self.literal_ids[key] = lid
+            self.literals.append(value)
+        return lid
+
+    def string(self, sid: int) -> Optional[str]:
+        return self.strings[sid] if sid >= 0 else None
+
+    def view(self, index: int):
+        if index < 0:
+            return None
+        view = VIEW_CLASSES[self.kinds[index]].__new__(VIEW_CLASSES[self.kinds[index]])
+        view._arena = self
+        view._index = index
+        return view
+
+    def views(self, offset: int) -> list:
+        count = self.lists[offset]
+        return [self.view(index) for index in self.lists[offset + 1:offset + 1 + count]]
+
+    @property
+    def root(self) -> Program:
+        return self.view(self.root_index)
+
+    def to_program(self) -> Program:
+        """Rebuild an ordinary node tree from the arena"""
+        return self.build(self.root_index)
+
+    def build(self, index: int):
+        if index < 0:
+            return None
+        cls = NODE_CLASSES[self.kinds[index]]
+        values = []
+        for column, (field, kind) in enumerate(SCHEMA[cls]):
+            raw = self.fields[column][index]
+            if kind == 'node':
+                values.append(self.build(raw))
+            elif kind == 'nodes':
+                count = self.lists[raw]
+                values.append([self.build(child) for child in self.lists[raw + 1:raw + 1 + count]])
+            elif kind == 'str':
+                values.append(self.string(raw))
+            elif kind == 'value':
+                values.append(self.literals[raw])
+            else:
+                values.append(bool(raw))
+        if cls is Program:
+            program = Program()
+            program.declarations = values[0]
+            return program
+        return cls(*values)
+
+    def to_bytes(self) -> bytes:
+        """Serialize the arena; the layout is tied to SCHEMA via ARENA_FORMAT"""
+        return marshal.dumps((
+            ARENA_FORMAT,
+            self.root_index,
+            self.kinds.tobytes(),
+            [column.tobytes() for column in self.fields],
+            self.lists.tobytes(),
+            self.strings,
+            self.literals,
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ASTArena':
+        try:
+            fmt, root_index, kinds, fields, lists, strings, literals = marshal.loads(data)
+        except (EOFError, ValueError, TypeError) as e:
+            raise ValueError(f"Corrupt AST arena: {e}")
+        if fmt != ARENA_FORMAT:
+            raise ValueError(f"AST arena format {fmt!r}, expected {ARENA_FORMAT!r}")
+        arena = cls()
+        arena.root_index = root_index
+        arena.kinds.frombytes(kinds)
+        for column, raw in zip(arena.fields, fields):
+            column.frombytes(raw)
+        arena.lists.frombytes(lists)
+        arena.strings = strings
+        arena.string_ids = {text: sid for sid, text in enumerate(strings)}
+        arena.literals = literals
+        arena.literal_ids = {(type(value), value): lid for lid, value in enumerate(literals)}
+        return arena
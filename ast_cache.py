@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+from lexer import *
+from parser import *
+from ast_arena import ASTArena
+
+# Next to the front end, like __pycache__, rather than in whatever directory the caller runs from
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "__astcache__")
+FRONT_END_MODULES = ("lexer.py", "parser.py", "ast_arena.py")
+
+
+def compiler_version() -> str:
+    """Fingerprint of the front end, so editing the lexer or parser invalidates the cache"""
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in FRONT_END_MODULES:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class ASTCache:
+    """Persistent cache of parsed Programs, in the spirit of __pycache__.
+
+    Entries are ASTArena serializations named by the SHA-256 of the
+    compiler version and the source text, so a hit skips the lexer and
+    parser entirely. Files are written to a temporary name and renamed
+    into place, so readers never see a partial entry. Hits refresh the
+    file's mtime, and when the directory grows past max_bytes the least
+    recently used entries are deleted. A cache that can't be written to
+    only costs the reparse: load_or_parse still returns the program.
+    """
+
+    SUFFIX = ".ast"
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = 64 << 20) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = compiler_version()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source: str) -> str:
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(b"\0")
+        digest.update(source.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def load(self, source: str) -> Optional[Program]:
+        path = self.path(self.key(source))
+        try:
+            with open(path, 'rb') as f:
+                arena = ASTArena.from_bytes(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Unreadable or stale entry: drop it and parse again
+            self.discard(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return arena.to_program()
+
+    def store(self, source: str, program: Program) -> None:
+        data = ASTArena.from_program(program).to_bytes()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path(self.key(source)))
+        except OSError:
+            self.discard(tmp_path)
+            raise
+        self.evict()
+
+    def load_or_parse(self, source: str) -> Program:
+        program = self.load(source)
+        if program is not None:
+            self.hits += 1
+            return program
+        self.misses += 1
+        program = CParser(regex_lexer(source, skip_newlines=True)).parse()
+        try:
+            self.store(source, program)
+        except OSError:
+            pass
+        return program
+
+    def evict(self) -> None:
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(self.SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= size
+
+    def clear(self) -> None:
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(self.SUFFIX):
+                    self.discard(os.path.join(self.directory, name))
+
+    @staticmethod
+    def discard(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
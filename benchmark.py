@@ -0,0 +1,332 @@
+import importlib.util
+import os
+import time
+from importlib.machinery import SourceFileLoader
+from lexer import *
+from parser import *
+import optimizer
+import vectorize
+
+FIBONACCI_SOURCE = """
+int fibonacci(int n) {
+    if (n <= 1) {
+        return n;
+    }
+    return fibonacci(n - 1) + fibonacci(n - 2);
+}
+
+int main() {
+    return fibonacci(%d);
+}
+"""
+
+
+LOOP_SOURCE = """
+int main() {
+    int count = 0;
+    for (int i = 2; i < %d; i++) {
+        int j = 2;
+        while (j * j <= i) {
+            if (i %% j == 0) {
+                break;
+            }
+            j++;
+        }
+        if (j * j > i) {
+            count += 1;
+        }
+    }
+    return count;
+}
+"""
+
+
+HELPER_SOURCE = """
+int square(int x) {
+    return x * x;
+}
+
+int is_even(int x) {
+    return x %% 2 == 0;
+}
+
+int clamp(int v, int limit) {
+    int r = v;
+    if (r > limit) {
+        r = limit;
+    }
+    return r;
+}
+
+int main() {
+    int total = 0;
+    for (int i = 0; i < %d; i++) {
+        int s = square(i);
+        int c = clamp(s, 1000);
+        total = total + c + is_even(i) * 2;
+    }
+    return total;
+}
+"""
+
+
+def call_cost_source(depth: int, variables: int) -> str:
+    """2**depth calls to a small function, made while main holds `variables` live locals"""
+    locals_ = "".join(f"    int v{i} = {i};\n" for i in range(variables))
+    return f"""
+int calls(int n) {{
+    if (n <= 0) {{
+        return 1;
+    }}
+    return calls(n - 1) + calls(n - 1);
+}}
+
+int main() {{
+{locals_}    return calls({depth});
+}}
+"""
+
+
+DEEP_SOURCE = """
+int sum(int n) {
+    if (n == 0) {
+        return 0;
+    }
+    return n + sum(n - 1);
+}
+
+int main() {
+    return sum(%d);
+}
+"""
+
+KERNEL_SOURCE = """
+int main() {
+    int n = %d;
+    int a[%d];
+    int b[%d];
+    int d[%d];
+    int sum = 0;
+    for (int i = 0; i < n; i++) {
+        b[i] = i %% 100;
+        d[i] = i * 3;
+    }
+    for (int r = 0; r < 10; r++) {
+        for (int i = 0; i < n; i++) {
+            a[i] = b[i] * 7 + d[i];
+        }
+        for (int i = 0; i < n; i++) {
+            sum += a[i];
+        }
+    }
+    return sum %% 1000;
+}
+"""
+
+
+LIST_SOURCE = """
+struct node {
+    int value;
+    struct node *next;
+};
+
+int main() {
+    int n = %d;
+    int *values = malloc(n * sizeof(int));
+    struct node *head = 0;
+    for (int i = 0; i < n; i++) {
+        values[i] = i;
+        struct node *node = malloc(sizeof(struct node));
+        node->value = values[i];
+        node->next = head;
+        head = node;
+    }
+    int sum = 0;
+    while (head) {
+        struct node *next = head->next;
+        sum = (sum + head->value) %% 1000;
+        free(head);
+        head = next;
+    }
+    free(values);
+    return sum;
+}
+"""
+
+
+def load_interpreter():
+    """Import the extension-less AST_interpreter script as a module"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "AST_interpreter")
+    loader = SourceFileLoader("AST_interpreter", path)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def expression_source(functions: int) -> str:
+    """C source whose function bodies are dominated by arithmetic expressions"""
+    body = """
+    int NAME(int a, int b, int c) {
+        int x = a * b + c - (a << 2) % 7 + (b >> 1) * (c - a) / 3;
+        int y = x < a && b >= c || !(a == b) ? x + 1 : y - 2;
+        x += (a | b) ^ (c & 255) + -x * ~y;
+        return NAME(x - 1, y + 2, x * y + a * b * c) + 10 * 20 + 30 - 40;
+    }
+    """
+    return "".join(body.replace("NAME", f"f{i}") for i in range(functions))
+
+
+def best_of(repeat: int, run) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_expression_parsing(functions: int = 2000, repeat: int = 5) -> None:
+    """Compare the recursive-descent and precedence-climbing expression engines"""
+    tokens = regex_lexer(expression_source(functions), skip_newlines=True).tokenize()
+
+    def parse(engine):
+        tokens.index = 0
+        CParser(tokens, engine).parse()
+
+    print(f"Expression parsing ({len(tokens)} tokens, best of {repeat})")
+    for engine in CParser.EXPRESSION_ENGINES:
+        elapsed = best_of(repeat, lambda: parse(engine))
+        print(f"  {engine:<10} {elapsed:8.3f}s  {len(tokens) / elapsed / 1e6:6.2f} M tokens/s")
+
+
+def bench_engines(n: int = 20, limit: int = 5000, repeat: int = 3) -> None:
+    """Run the fibonacci example and a loop-heavy prime count on every CInterpreter execution engine"""
+    bench_program(f"fibonacci({n})", FIBONACCI_SOURCE % n, repeat)
+    bench_program(f"primes below {limit}", LOOP_SOURCE % limit, repeat)
+
+
+def bench_program(title: str, source: str, repeat: int) -> None:
+    interpreter = load_interpreter()
+    program = CParser(regex_lexer(source, skip_newlines=True)).parse()
+
+    print(f"{title} (best of {repeat})")
+    configurations = [('tree', {'engine': 'tree', 'hot_threshold': None})]
+    configurations.append(('tiered', {'engine': 'tree'}))
+    configurations.append(('memoized', {'engine': 'tree', 'memoize': True}))
+    configurations.extend((engine, {'engine': engine}) for engine in interpreter.CInterpreter.ENGINES[1:])
+    configurations.append(('typed', {'engine': 'closure', 'typed': True}))
+
+    baseline = None
+    for label, options in configurations:
+        result = None
+
+        def run():
+            nonlocal result
+            result = interpreter.CInterpreter(**options).interpret(program)
+        elapsed = best_of(repeat, run)
+        baseline = baseline or elapsed
+        print(f"  {label:<10} {elapsed:8.3f}s  x{baseline / elapsed:5.1f}  result {result}")
+
+
+def bench_call_cost(depth: int = 11, repeat: int = 3) -> None:
+    """Time tree-walker calls while the caller holds more and more variables"""
+    interpreter = load_interpreter()
+
+    print(f"{2 ** (depth + 1) - 1} calls, tree walker without tiering (best of {repeat})")
+    for variables in (0, 100, 1000):
+        program = CParser(regex_lexer(call_cost_source(depth, variables), skip_newlines=True)).parse()
+        elapsed = best_of(repeat, lambda: interpreter.CInterpreter('tree', hot_threshold=None).interpret(program))
+        print(f"  {variables:>5} live variables {elapsed:8.3f}s")
+
+
+def bench_optimizer(n: int = 3000, repeat: int = 3) -> None:
+    """Run a helper-heavy program on each engine with and without the AST optimisation passes"""
+    interpreter = load_interpreter()
+    source = HELPER_SOURCE % n
+
+    print(f"helper calls, {n} iterations (best of {repeat})")
+    for engine in interpreter.CInterpreter.ENGINES:
+        timings = []
+        for optimize in (False, True):
+            program = CParser(regex_lexer(source, skip_newlines=True)).parse()
+            if optimize:
+                report = optimizer.optimize(program)
+            timings.append(best_of(repeat, lambda: interpreter.CInterpreter(engine, hot_threshold=None).interpret(program)))
+        print(f"  {engine:<10} {timings[0]:8.3f}s -> {timings[1]:8.3f}s optimised  x{timings[0] / timings[1]:5.1f}")
+    for line in report:
+        print(f"  {line}")
+
+
+def bench_deep_recursion(depths=(50, 5000, 100000), nesting: int = 20000, repeat: int = 3) -> None:
+    """Compare the recursive tree walker and parser with their explicit-stack counterparts
+    (stack engine, bytecode VM, stack parser) on guest recursion and expression nesting
+    deep enough to break the former"""
+    interpreter = load_interpreter()
+
+    def attempt(run):
+        try:
+            return f"{best_of(repeat, run):8.3f}s"
+        except RecursionError:
+            return f"{'recursion limit':>9}"
+
+    print(f"non-tail recursion depth, tree walker without tiering vs stack engine and VM (best of {repeat})")
+    for depth in depths:
+        program = CParser(regex_lexer(DEEP_SOURCE % depth, skip_newlines=True)).parse()
+        tree = attempt(lambda: interpreter.CInterpreter('tree', hot_threshold=None).interpret(program))
+        stack = attempt(lambda: interpreter.CInterpreter('stack').interpret(program))
+        vm = attempt(lambda: interpreter.CInterpreter('bytecode').interpret(program))
+        print(f"  {depth:>7} calls  tree {tree}  stack {stack}  bytecode {vm}")
+
+    print(f"expression nested {nesting} deep, recursive vs stack parser (best of {repeat})")
+    tokens = regex_lexer("int main() { return " + "(1 + " * nesting + "1" + ")" * nesting + "; }").tokenize()
+    for engine in ('recursive', 'stack'):
+        def parse():
+            tokens.index = 0
+            CParser(tokens, engine).parse()
+        print(f"  {engine:<10} {attempt(parse)}")
+
+
+def bench_vectorize(sizes=(1000, 20000), repeat: int = 3) -> None:
+    """Time array kernels element by element and as whole-array NumPy loops"""
+    interpreter = load_interpreter()
+
+    print(f"array kernels, tree walker (best of {repeat})")
+    if vectorize.numpy is None:
+        print("  NumPy is not installed, skipped")
+        return
+    for n in sizes:
+        program = CParser(regex_lexer(KERNEL_SOURCE % ((n,) * 4), skip_newlines=True)).parse()
+        timings = [best_of(repeat, lambda: interpreter.CInterpreter('tree', vectorize=enabled).interpret(program))
+                   for enabled in (False, True)]
+        print(f"  {n:>7} elements {timings[0]:8.3f}s -> {timings[1]:8.3f}s vectorised  x{timings[0] / timings[1]:6.1f}")
+
+
+def bench_memory(sizes=(10000, 50000), repeat: int = 3) -> None:
+    """Time malloc/free and member access, and report the heap the data needed"""
+    interpreter = load_interpreter()
+    instances = []
+
+    def run(program):
+        instances.append(interpreter.CInterpreter('tree'))
+        instances[-1].interpret(program)
+
+    print(f"int array plus linked list in linear memory, tree walker (best of {repeat})")
+    for n in sizes:
+        program = CParser(regex_lexer(LIST_SOURCE % n, skip_newlines=True)).parse()
+        timing = best_of(repeat, lambda: run(program))
+        memory = instances[-1].memory
+        print(f"  {n:>7} nodes {timing:8.3f}s  peak heap {memory.heap_peak - memory.stack_limit:>9} bytes")
+
+
+def main():
+    bench_expression_parsing()
+    bench_engines()
+    bench_deep_recursion()
+    bench_call_cost()
+    bench_optimizer()
+    bench_vectorize()
+    bench_memory()
+
+if __name__ == "__main__":
+    main()
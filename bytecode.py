@@ -0,0 +1,746 @@
+import marshal
+from array import array
+from typing import Dict, List, Optional
+
+from parser import *
+from closure_compiler import FunctionScope, COMPOUND_OPS
+from memory import TypeTable, cast_handler
+
+# Opcodes. Every instruction is one opcode byte plus one int operand.
+LOAD_CONST = 0      # push consts[arg]
+LOAD_LOCAL = 1      # push frame[arg]
+STORE_LOCAL = 2     # frame[arg] = pop()
+LOAD_GLOBAL = 3     # push globals[arg]
+STORE_GLOBAL = 4    # globals[arg] = pop()
+POP = 5
+DUP = 6
+JUMP = 7            # pc = arg
+JUMP_IF_FALSE = 8   # if not pop(): pc = arg
+JUMP_IF_TRUE = 9    # if pop(): pc = arg
+CALL = 10           # call functions[arg] with its parameter count of arguments
+RETURN = 11         # return pop()
+FAIL = 12           # raise RuntimeError(consts[arg])
+INC_LOCAL = 13      # frame[arg] += 1, a statement-level i++
+DEC_LOCAL = 14      # frame[arg] -= 1
+NEG = 15
+NOT = 16
+INVERT = 17
+BINARY_LOCAL = 18   # top = top <op> frame[arg >> 8], op = BINARY_FUNCS[arg & 0xFF]
+BINARY_CONST = 19   # top = top <op> consts[arg >> 8]
+ADD = 20
+SUB = 21
+MUL = 22
+DIV = 23
+MOD = 24
+EQ = 25
+NE = 26
+LT = 27
+LE = 28
+GT = 29
+GE = 30
+BITAND = 31
+BITOR = 32
+BITXOR = 33
+LSHIFT = 34
+RSHIFT = 35
+CAST = 36           # top = top converted to the type named consts[arg]
+
+OPNAMES = {
+    LOAD_CONST: 'LOAD_CONST',
+    LOAD_LOCAL: 'LOAD_LOCAL',
+    STORE_LOCAL: 'STORE_LOCAL',
+    LOAD_GLOBAL: 'LOAD_GLOBAL',
+    STORE_GLOBAL: 'STORE_GLOBAL',
+    POP: 'POP',
+    DUP: 'DUP',
+    JUMP: 'JUMP',
+    JUMP_IF_FALSE: 'JUMP_IF_FALSE',
+    JUMP_IF_TRUE: 'JUMP_IF_TRUE',
+    CALL: 'CALL',
+    RETURN: 'RETURN',
+    FAIL: 'FAIL',
+    INC_LOCAL: 'INC_LOCAL',
+    DEC_LOCAL: 'DEC_LOCAL',
+    NEG: 'NEG',
+    NOT: 'NOT',
+    INVERT: 'INVERT',
+    BINARY_LOCAL: 'BINARY_LOCAL',
+    BINARY_CONST: 'BINARY_CONST',
+    ADD: 'ADD',
+    SUB: 'SUB',
+    MUL: 'MUL',
+    DIV: 'DIV',
+    MOD: 'MOD',
+    EQ: 'EQ',
+    NE: 'NE',
+    LT: 'LT',
+    LE: 'LE',
+    GT: 'GT',
+    GE: 'GE',
+    BITAND: 'BITAND',
+    BITOR: 'BITOR',
+    BITXOR: 'BITXOR',
+    LSHIFT: 'LSHIFT',
+    RSHIFT: 'RSHIFT',
+    CAST: 'CAST',
+}
+
+BINARY_OPCODES = {
+    '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD,
+    '==': EQ, '!=': NE, '<': LT, '<=': LE, '>': GT, '>=': GE,
+    '&': BITAND, '|': BITOR, '^': BITXOR, '<<': LSHIFT, '>>': RSHIFT,
+}
+
+UNARY_OPCODES = {'-': NEG, '!': NOT, '~': INVERT}
+
+# Operator implementations for the fused BINARY_LOCAL/BINARY_CONST forms, indexed by opcode
+BINARY_FUNCS = [None] * 256
+BINARY_FUNCS[ADD] = lambda a, b: a + b
+BINARY_FUNCS[SUB] = lambda a, b: a - b
+BINARY_FUNCS[MUL] = lambda a, b: a * b
+BINARY_FUNCS[DIV] = lambda a, b: a // b
+BINARY_FUNCS[MOD] = lambda a, b: a % b
+BINARY_FUNCS[EQ] = lambda a, b: 1 if a == b else 0
+BINARY_FUNCS[NE] = lambda a, b: 1 if a != b else 0
+BINARY_FUNCS[LT] = lambda a, b: 1 if a < b else 0
+BINARY_FUNCS[LE] = lambda a, b: 1 if a <= b else 0
+BINARY_FUNCS[GT] = lambda a, b: 1 if a > b else 0
+BINARY_FUNCS[GE] = lambda a, b: 1 if a >= b else 0
+BINARY_FUNCS[BITAND] = lambda a, b: a & b
+BINARY_FUNCS[BITOR] = lambda a, b: a | b
+BINARY_FUNCS[BITXOR] = lambda a, b: a ^ b
+BINARY_FUNCS[LSHIFT] = lambda a, b: a << b
+BINARY_FUNCS[RSHIFT] = lambda a, b: a >> b
+
+JUMPS = (JUMP, JUMP_IF_FALSE, JUMP_IF_TRUE)
+
+BYTECODE_FORMAT = 2
+
+
+class Function:
+    """Bytecode for one C function: parallel opcode and operand arrays"""
+
+    def __init__(self, name: str, nparams: int, nlocals: int = 0) -> None:
+        self.name = name
+        self.nparams = nparams
+        self.nlocals = nlocals
+        self.ops = array('B')
+        self.args = array('i')
+
+    def emit(self, op: int, arg: int = 0) -> int:
+        self.ops.append(op)
+        self.args.append(arg)
+        return len(self.ops) - 1
+
+
+class Module:
+    """A compiled program: functions, the constant pool and the global table.
+
+    `init` is a pseudo-function that evaluates the global initializers.
+    """
+
+    def __init__(self) -> None:
+        self.functions: List[Function] = []
+        self.function_index: Dict[str, int] = {}
+        self.consts: list = []
+        self.const_index: dict = {}
+        self.global_names: List[str] = []
+        self.init = Function('<init>', 0)
+
+    def const(self, value) -> int:
+        key = (type(value), value)
+        index = self.const_index.get(key)
+        if index is None:
+            index = len(self.consts)
+            self.const_index[key] = index
+            self.consts.append(value)
+        return index
+
+    def to_bytes(self) -> bytes:
+        functions = [(fn.name, fn.nparams, fn.nlocals, fn.ops.tobytes(), fn.args.tobytes())
+                     for fn in [self.init] + self.functions]
+        return marshal.dumps((BYTECODE_FORMAT, self.consts, self.global_names, functions))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Module':
+        fmt, consts, global_names, functions = marshal.loads(data)
+        if fmt != BYTECODE_FORMAT:
+            raise ValueError(f"Bytecode format {fmt}, expected {BYTECODE_FORMAT}")
+        module = cls()
+        module.consts = consts
+        module.const_index = {(type(value), value): i for i, value in enumerate(consts)}
+        module.global_names = global_names
+        loaded = []
+        for name, nparams, nlocals, ops, args in functions:
+            fn = Function(name, nparams, nlocals)
+            fn.ops.frombytes(ops)
+            fn.args.frombytes(args)
+            loaded.append(fn)
+        module.init = loaded[0]
+        module.functions = loaded[1:]
+        module.function_index = {fn.name: i for i, fn in enumerate(module.functions)}
+        return module
+
+
+class BytecodeCompiler:
+    """Lowers a Program to a Module of stack-machine bytecode"""
+
+    def __init__(self) -> None:
+        self.module = Module()
+        self.fn: Optional[Function] = None
+        self.scope: Optional[FunctionScope] = None
+        self.global_slots: Dict[str, int] = {}
+        self.loops: List[tuple] = []  # (break jump sites, continue jump sites)
+
+    def compile(self, program: Program) -> Module:
+        module = self.module
+        declarations = [decl for decl in program.declarations if isinstance(decl, FunctionDeclaration)]
+        for decl in declarations:
+            module.function_index[decl.name] = len(module.functions)
+            module.functions.append(Function(decl.name, len(decl.parameters)))
+
+        self.fn = module.init
+        for decl in program.declarations:
+            if isinstance(decl, VariableDeclaration):
+                self.global_slots[decl.name] = len(module.global_names)
+                module.global_names.append(decl.name)
+                if decl.initializer:
+                    self.compile_expression(decl.initializer)
+                    self.fn.emit(STORE_GLOBAL, self.global_slots[decl.name])
+        self.fn.emit(LOAD_CONST, module.const(0))
+        self.fn.emit(RETURN)
+
+        for decl in declarations:
+            self.compile_function(decl, module.functions[module.function_index[decl.name]])
+        return module
+
+    def compile_function(self, decl: FunctionDeclaration, fn: Function) -> None:
+        self.fn = fn
+        self.scope = FunctionScope(decl.parameters)
+        self.compile_statement(decl.body)
+        fn.emit(LOAD_CONST, self.module.const(0))
+        fn.emit(RETURN)
+        fn.nlocals = self.scope.size
+        self.scope = None
+
+    def fail(self, message: str) -> None:
+        self.fn.emit(FAIL, self.module.const(message))
+
+    def patch(self, site: int, target: Optional[int] = None) -> None:
+        self.fn.args[site] = len(self.fn.ops) if target is None else target
+
+    # Statements
+
+    def compile_statement(self, stmt) -> None:
+        fn = self.fn
+        if isinstance(stmt, CompoundStatement):
+            self.scope.blocks.append({})
+            for child in stmt.statements:
+                self.compile_statement(child)
+            self.scope.blocks.pop()
+        elif isinstance(stmt, ExpressionStatement):
+            if stmt.expression is not None:
+                self.compile_effect(stmt.expression)
+        elif isinstance(stmt, VariableDeclaration):
+            if stmt.initializer:
+                self.compile_expression(stmt.initializer)
+            else:
+                fn.emit(LOAD_CONST, self.module.const(0))
+            fn.emit(STORE_LOCAL, self.scope.declare(stmt.name))
+        elif isinstance(stmt, IfStatement):
+            self.compile_expression(stmt.condition)
+            skip_then = fn.emit(JUMP_IF_FALSE)
+            self.compile_statement(stmt.then_stmt)
+            if stmt.else_stmt is None:
+                self.patch(skip_then)
+            else:
+                skip_else = fn.emit(JUMP)
+                self.patch(skip_then)
+                self.compile_statement(stmt.else_stmt)
+                self.patch(skip_else)
+        elif isinstance(stmt, WhileStatement):
+            top = len(fn.ops)
+            self.compile_expression(stmt.condition)
+            exit_site = fn.emit(JUMP_IF_FALSE)
+            self.compile_loop_body(stmt.body, continue_target=top)
+            fn.emit(JUMP, top)
+            self.patch(exit_site)
+            self.patch_breaks()
+        elif isinstance(stmt, ForStatement):
+            self.scope.blocks.append({})
+            if stmt.init:
+                self.compile_statement(stmt.init)
+            top = len(fn.ops)
+            exit_site = None
+            if stmt.condition:
+                self.compile_expression(stmt.condition)
+                exit_site = fn.emit(JUMP_IF_FALSE)
+            continues = self.compile_loop_body(stmt.body, continue_target=None)
+            for site in continues:
+                self.patch(site)
+            if stmt.update:
+                self.compile_effect(stmt.update)
+            fn.emit(JUMP, top)
+            if exit_site is not None:
+                self.patch(exit_site)
+            self.patch_breaks()
+            self.scope.blocks.pop()
+        elif isinstance(stmt, ReturnStatement):
+            if stmt.expression:
+                self.compile_expression(stmt.expression)
+            else:
+                fn.emit(LOAD_CONST, self.module.const(0))
+            fn.emit(RETURN)
+        elif isinstance(stmt, BreakStatement):
+            if not self.loops:
+                raise RuntimeError("break outside of a loop")
+            self.loops[-1][0].append(fn.emit(JUMP))
+        elif isinstance(stmt, ContinueStatement):
+            if not self.loops:
+                raise RuntimeError("continue outside of a loop")
+            self.loops[-1][1].append(fn.emit(JUMP))
+        else:
+            raise RuntimeError(f"Unknown statement type: {type(stmt)}")
+
+    def compile_loop_body(self, body, continue_target: Optional[int]) -> List[int]:
+        """Compile a loop body; return continue jump sites still to be patched"""
+        self.loops.append(([], []))
+        self.compile_statement(body)
+        continues = self.loops[-1][1]
+        if continue_target is not None:
+            for site in continues:
+                self.patch(site, continue_target)
+            return []
+        return continues
+
+    def patch_breaks(self) -> None:
+        breaks, _ = self.loops.pop()
+        for site in breaks:
+            self.patch(site)
+
+    # Expressions
+
+    def compile_effect(self, expr) -> None:
+        """Compile an expression whose value is discarded"""
+        fn = self.fn
+        if isinstance(expr, UnaryExpression) and expr.operator in ('++', '--', '++_post', '--_post') \
+                and isinstance(expr.operand, Identifier):
+            slot = self.scope.lookup(expr.operand.name)
+            if slot is not None:
+                fn.emit(INC_LOCAL if expr.operator.startswith('++') else DEC_LOCAL, slot)
+                return
+        if isinstance(expr, AssignmentExpression) and isinstance(expr.left, Identifier):
+            self.compile_assignment(expr, keep_value=False)
+            return
+        self.compile_expression(expr)
+        fn.emit(POP)
+
+    def compile_expression(self, expr) -> None:
+        fn = self.fn
+        if isinstance(expr, Literal):
+            fn.emit(LOAD_CONST, self.module.const(expr.value))
+        elif isinstance(expr, Identifier):
+            self.compile_load(expr.name)
+        elif isinstance(expr, BinaryExpression):
+            self.compile_binary(expr)
+        elif isinstance(expr, UnaryExpression):
+            self.compile_unary(expr)
+        elif isinstance(expr, AssignmentExpression):
+            if not isinstance(expr.left, Identifier):
+                raise RuntimeError("Assignment target must be a variable")
+            self.compile_assignment(expr, keep_value=True)
+        elif isinstance(expr, FunctionCall):
+            self.compile_call(expr)
+        elif isinstance(expr, CastExpression):
+            self.compile_expression(expr.operand)
+            fn.emit(CAST, self.module.const(expr.type_name))
+        else:
+            self.fail(f"Unknown expression type: {type(expr)}")
+
+    def compile_load(self, name: str) -> None:
+        slot = self.scope.lookup(name) if self.scope else None
+        if slot is not None:
+            self.fn.emit(LOAD_LOCAL, slot)
+        elif name in self.global_slots:
+            self.fn.emit(LOAD_GLOBAL, self.global_slots[name])
+        else:
+            self.fail(f"Variable {name} not defined")
+
+    def compile_store(self, name: str) -> None:
+        slot = self.scope.lookup(name) if self.scope else None
+        if slot is not None:
+            self.fn.emit(STORE_LOCAL, slot)
+        elif name in self.global_slots:
+            self.fn.emit(STORE_GLOBAL, self.global_slots[name])
+        else:
+            self.fail(f"Variable {name} not defined")
+
+    def compile_assignment(self, expr: AssignmentExpression, keep_value: bool) -> None:
+        name = expr.left.name
+        if expr.operator != '=':
+            self.compile_load(name)
+        self.compile_expression(expr.right)
+        if expr.operator != '=':
+            self.fn.emit(BINARY_OPCODES[COMPOUND_OPS[expr.operator]])
+        if keep_value:
+            self.fn.emit(DUP)
+        self.compile_store(name)
+
+    def compile_binary(self, expr: BinaryExpression) -> None:
+        fn = self.fn
+        op = expr.operator
+        if op == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+            self.compile_expression(expr.left.left)
+            to_else = fn.emit(JUMP_IF_FALSE)
+            self.compile_expression(expr.left.right)
+            to_end = fn.emit(JUMP)
+            self.patch(to_else)
+            self.compile_expression(expr.right)
+            self.patch(to_end)
+        elif op == '&&' or op == '||':
+            # Short circuit, normalising the result to 0/1
+            short = JUMP_IF_FALSE if op == '&&' else JUMP_IF_TRUE
+            self.compile_expression(expr.left)
+            first = fn.emit(short)
+            self.compile_expression(expr.right)
+            second = fn.emit(short)
+            fn.emit(LOAD_CONST, self.module.const(1 if op == '&&' else 0))
+            to_end = fn.emit(JUMP)
+            self.patch(first)
+            self.patch(second)
+            fn.emit(LOAD_CONST, self.module.const(0 if op == '&&' else 1))
+            self.patch(to_end)
+        elif op in BINARY_OPCODES:
+            self.compile_expression(expr.left)
+            right = expr.right
+            # Fuse a local or constant right operand into the operator instruction
+            if isinstance(right, Literal):
+                fn.emit(BINARY_CONST, self.module.const(right.value) << 8 | BINARY_OPCODES[op])
+                return
+            if isinstance(right, Identifier) and self.scope and self.scope.lookup(right.name) is not None:
+                fn.emit(BINARY_LOCAL, self.scope.lookup(right.name) << 8 | BINARY_OPCODES[op])
+                return
+            self.compile_expression(right)
+            fn.emit(BINARY_OPCODES[op])
+        else:
+            raise RuntimeError(f"Unknown binary operator: {op}")
+
+    def compile_unary(self, expr: UnaryExpression) -> None:
+        fn = self.fn
+        op = expr.operator
+        if op in UNARY_OPCODES:
+            self.compile_expression(expr.operand)
+            fn.emit(UNARY_OPCODES[op])
+            return
+        if op == '+':
+            self.compile_expression(expr.operand)
+            return
+        if not isinstance(expr.operand, Identifier):
+            raise RuntimeError(f"Operand of {op} must be a variable")
+        name = expr.operand.name
+        step = ADD if op.startswith('++') else SUB
+        self.compile_load(name)
+        if op.endswith('_post'):
+            fn.emit(DUP)
+        fn.emit(LOAD_CONST, self.module.const(1))
+        fn.emit(step)
+        if not op.endswith('_post'):
+            fn.emit(DUP)
+        self.compile_store(name)
+
+    def compile_call(self, expr: FunctionCall) -> None:
+        name = expr.function.name
+        index = self.module.function_index.get(name)
+        if index is None:
+            self.fail(f"Function {name} not defined")
+            return
+        callee = self.module.functions[index]
+        if len(expr.arguments) != callee.nparams:
+            self.fail(f"Function {name} expects {callee.nparams} arguments, got {len(expr.arguments)}")
+            return
+        for arg in expr.arguments:
+            self.compile_expression(arg)
+        self.fn.emit(CALL, index)
+
+
+def compile_program(program: Program) -> Module:
+    return BytecodeCompiler().compile(program)
+
+
+# Instruction handlers: (vm, stack, frame, arg, pc) -> next pc
+
+def op_load_const(vm, stack, frame, arg, pc):
+    stack.append(vm.consts[arg])
+    return pc
+
+def op_load_local(vm, stack, frame, arg, pc):
+    stack.append(frame[arg])
+    return pc
+
+def op_store_local(vm, stack, frame, arg, pc):
+    frame[arg] = stack.pop()
+    return pc
+
+def op_load_global(vm, stack, frame, arg, pc):
+    stack.append(vm.globals[arg])
+    return pc
+
+def op_store_global(vm, stack, frame, arg, pc):
+    vm.globals[arg] = stack.pop()
+    return pc
+
+def op_pop(vm, stack, frame, arg, pc):
+    stack.pop()
+    return pc
+
+def op_dup(vm, stack, frame, arg, pc):
+    stack.append(stack[-1])
+    return pc
+
+def op_jump(vm, stack, frame, arg, pc):
+    return arg
+
+def op_jump_if_false(vm, stack, frame, arg, pc):
+    return pc if stack.pop() else arg
+
+def op_jump_if_true(vm, stack, frame, arg, pc):
+    return arg if stack.pop() else pc
+
+def op_fail(vm, stack, frame, arg, pc):
+    raise RuntimeError(vm.consts[arg])
+
+def op_inc_local(vm, stack, frame, arg, pc):
+    frame[arg] += 1
+    return pc
+
+def op_dec_local(vm, stack, frame, arg, pc):
+    frame[arg] -= 1
+    return pc
+
+def op_neg(vm, stack, frame, arg, pc):
+    stack[-1] = -stack[-1]
+    return pc
+
+def op_not(vm, stack, frame, arg, pc):
+    stack[-1] = 0 if stack[-1] else 1
+    return pc
+
+def op_invert(vm, stack, frame, arg, pc):
+    stack[-1] = ~stack[-1]
+    return pc
+
+def op_add(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] + right
+    return pc
+
+def op_sub(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] - right
+    return pc
+
+def op_mul(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] * right
+    return pc
+
+def op_div(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] // right
+    return pc
+
+def op_mod(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] % right
+    return pc
+
+def op_eq(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = 1 if stack[-1] == right else 0
+    return pc
+
+def op_ne(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = 1 if stack[-1] != right else 0
+    return pc
+
+def op_lt(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = 1 if stack[-1] < right else 0
+    return pc
+
+def op_le(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = 1 if stack[-1] <= right else 0
+    return pc
+
+def op_gt(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = 1 if stack[-1] > right else 0
+    return pc
+
+def op_ge(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = 1 if stack[-1] >= right else 0
+    return pc
+
+def op_bitand(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] & right
+    return pc
+
+def op_bitor(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] | right
+    return pc
+
+def op_bitxor(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] ^ right
+    return pc
+
+def op_lshift(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] << right
+    return pc
+
+def op_rshift(vm, stack, frame, arg, pc):
+    right = stack.pop()
+    stack[-1] = stack[-1] >> right
+    return pc
+
+def op_binary_local(vm, stack, frame, arg, pc):
+    stack[-1] = BINARY_FUNCS[arg & 0xFF](stack[-1], frame[arg >> 8])
+    return pc
+
+def op_binary_const(vm, stack, frame, arg, pc):
+    stack[-1] = BINARY_FUNCS[arg & 0xFF](stack[-1], vm.consts[arg >> 8])
+    return pc
+
+def op_cast(vm, stack, frame, arg, pc):
+    stack[-1] = vm.conversion(arg)(stack[-1])
+    return pc
+
+
+HANDLERS = [None] * 256
+for _opcode, _name in OPNAMES.items():
+    if _opcode not in (CALL, RETURN):
+        HANDLERS[_opcode] = globals()['op_' + _name.lower()]
+
+
+class VirtualMachine:
+    """Stack-based VM: the dispatch loop indexes HANDLERS by opcode.
+
+    Calls do not recurse in Python: CALL saves the caller's registers on
+    an explicit frame stack and RETURN restores them, so guest recursion
+    is bounded by max_depth rather than Python's recursion limit."""
+
+    def __init__(self, module: Module, max_depth: int = 1000000) -> None:
+        self.module = module
+        self.consts = module.consts
+        self.functions = module.functions
+        self.globals = [0] * len(module.global_names)
+        self.types = TypeTable()
+        self.conversions = {}       # const index of a type name -> its cast handler
+        self.max_depth = max_depth
+        self.execute(module.init, [])
+
+    def conversion(self, index: int):
+        handler = self.conversions.get(index)
+        if handler is None:
+            handler = self.conversions[index] = cast_handler(self.types.parse(self.consts[index]))
+        return handler
+
+    def execute(self, fn: Function, args: list):
+        frame = [0] * fn.nlocals
+        frame[1:1 + len(args)] = args  # slot 0 is unused, parameters start at 1
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        consts = self.consts
+        functions = self.functions
+        ops = fn.ops
+        opargs = fn.args
+        handlers = HANDLERS
+        binary_funcs = BINARY_FUNCS
+        frames = []                 # (ops, opargs, pc, frame, stack) of each suspended caller
+        max_depth = self.max_depth
+        pc = 0
+        while True:
+            op = ops[pc]
+            arg = opargs[pc]
+            pc += 1
+            # The most frequent instructions are handled inline; the rest go through the table
+            if op == LOAD_LOCAL:
+                push(frame[arg])
+            elif op == LOAD_CONST:
+                push(consts[arg])
+            elif op == STORE_LOCAL:
+                frame[arg] = pop()
+            elif op == BINARY_CONST:
+                stack[-1] = binary_funcs[arg & 0xFF](stack[-1], consts[arg >> 8])
+            elif op == BINARY_LOCAL:
+                stack[-1] = binary_funcs[arg & 0xFF](stack[-1], frame[arg >> 8])
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == CALL:
+                if len(frames) >= max_depth:
+                    raise RuntimeError(f"Stack overflow: more than {max_depth} nested calls")
+                callee = functions[arg]
+                frames.append((ops, opargs, pc, frame, stack))
+                frame = [0] * callee.nlocals
+                n = callee.nparams
+                if n:
+                    frame[1:1 + n] = stack[-n:]
+                    del stack[-n:]
+                stack = []
+                push = stack.append
+                pop = stack.pop
+                ops = callee.ops
+                opargs = callee.args
+                pc = 0
+            elif op == RETURN:
+                result = pop()
+                if not frames:
+                    return result
+                ops, opargs, pc, frame, stack = frames.pop()
+                push = stack.append
+                pop = stack.pop
+                push(result)
+            else:
+                pc = handlers[op](self, stack, frame, arg, pc)
+
+    def run(self, entry: str = 'main'):
+        index = self.module.function_index.get(entry)
+        if index is None:
+            raise RuntimeError("No main function found")
+        return self.execute(self.functions[index], [])
+
+
+def disassemble(module: Module) -> str:
+    """Human-readable listing of every function in module"""
+    lines = []
+    for fn in [module.init] + module.functions:
+        lines.append(f"{fn.name} (params={fn.nparams}, locals={fn.nlocals}):")
+        targets = {arg for op, arg in zip(fn.ops, fn.args) if op in JUMPS}
+        for pc, (op, arg) in enumerate(zip(fn.ops, fn.args)):
+            marker = ">>" if pc in targets else "  "
+            text = f"  {marker} {pc:4d} {OPNAMES[op]:<14}"
+            if op in (LOAD_CONST, FAIL, CAST):
+                text += f"{arg} ({module.consts[arg]!r})"
+            elif op in (LOAD_GLOBAL, STORE_GLOBAL):
+                text += f"{arg} ({module.global_names[arg]})"
+            elif op == CALL:
+                text += f"{arg} ({module.functions[arg].name})"
+            elif op in (LOAD_LOCAL, STORE_LOCAL, INC_LOCAL, DEC_LOCAL) or op in JUMPS:
+                text += str(arg)
+            elif op == BINARY_LOCAL:
+                text += f"{OPNAMES[arg & 0xFF]} local {arg >> 8}"
+            elif op == BINARY_CONST:
+                text += f"{OPNAMES[arg & 0xFF]} {module.consts[arg >> 8]!r}"
+            lines.append(text.rstrip())
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,425 @@
+from typing import Callable, Dict, List
+
+from parser import *
+
+# Completion signals returned by compiled statements; None means "fall through"
+BREAK = 1
+CONTINUE = 2
+RETURN = 3
+
+# Frame slot 0 holds the return value, parameters start at slot 1
+RETURN_SLOT = 0
+
+# Specialised closures for `left op right`, one per operator
+BINARY_OPS = {
+    '+': lambda l, r: lambda f: l(f) + r(f),
+    '-': lambda l, r: lambda f: l(f) - r(f),
+    '*': lambda l, r: lambda f: l(f) * r(f),
+    '/': lambda l, r: lambda f: l(f) // r(f),
+    '%': lambda l, r: lambda f: l(f) % r(f),
+    '==': lambda l, r: lambda f: 1 if l(f) == r(f) else 0,
+    '!=': lambda l, r: lambda f: 1 if l(f) != r(f) else 0,
+    '<': lambda l, r: lambda f: 1 if l(f) < r(f) else 0,
+    '<=': lambda l, r: lambda f: 1 if l(f) <= r(f) else 0,
+    '>': lambda l, r: lambda f: 1 if l(f) > r(f) else 0,
+    '>=': lambda l, r: lambda f: 1 if l(f) >= r(f) else 0,
+    '&&': lambda l, r: lambda f: 1 if l(f) and r(f) else 0,
+    '||': lambda l, r: lambda f: 1 if l(f) or r(f) else 0,
+    '&': lambda l, r: lambda f: l(f) & r(f),
+    '|': lambda l, r: lambda f: l(f) | r(f),
+    '^': lambda l, r: lambda f: l(f) ^ r(f),
+    '<<': lambda l, r: lambda f: l(f) << r(f),
+    '>>': lambda l, r: lambda f: l(f) >> r(f),
+}
+
+# `left op constant`, the common shape of loop bounds and recursion steps
+BINARY_CONST_OPS = {
+    '+': lambda l, c: lambda f: l(f) + c,
+    '-': lambda l, c: lambda f: l(f) - c,
+    '*': lambda l, c: lambda f: l(f) * c,
+    '/': lambda l, c: lambda f: l(f) // c,
+    '%': lambda l, c: lambda f: l(f) % c,
+    '==': lambda l, c: lambda f: 1 if l(f) == c else 0,
+    '!=': lambda l, c: lambda f: 1 if l(f) != c else 0,
+    '<': lambda l, c: lambda f: 1 if l(f) < c else 0,
+    '<=': lambda l, c: lambda f: 1 if l(f) <= c else 0,
+    '>': lambda l, c: lambda f: 1 if l(f) > c else 0,
+    '>=': lambda l, c: lambda f: 1 if l(f) >= c else 0,
+}
+
+# `local op constant`, reading the frame slot directly
+LOCAL_CONST_OPS = {
+    '+': lambda s, c: lambda f: f[s] + c,
+    '-': lambda s, c: lambda f: f[s] - c,
+    '*': lambda s, c: lambda f: f[s] * c,
+    '==': lambda s, c: lambda f: 1 if f[s] == c else 0,
+    '!=': lambda s, c: lambda f: 1 if f[s] != c else 0,
+    '<': lambda s, c: lambda f: 1 if f[s] < c else 0,
+    '<=': lambda s, c: lambda f: 1 if f[s] <= c else 0,
+    '>': lambda s, c: lambda f: 1 if f[s] > c else 0,
+    '>=': lambda s, c: lambda f: 1 if f[s] >= c else 0,
+}
+
+UNARY_OPS = {
+    '-': lambda e: lambda f: -e(f),
+    '+': lambda e: e,
+    '!': lambda e: lambda f: 0 if e(f) else 1,
+    '~': lambda e: lambda f: ~e(f),
+}
+
+# Compound assignment operator -> the binary operator it applies
+COMPOUND_OPS = {'+=': '+', '-=': '-', '*=': '*', '/=': '/', '%=': '%'}
+
+
+class FunctionScope:
+    """Maps a function's parameters and locals to frame slots, honouring block scoping"""
+
+    def __init__(self, parameters: List[Parameter]) -> None:
+        self.size = 1 + len(parameters)
+        self.blocks = [{param.name: i + 1 for i, param in enumerate(parameters)}]
+
+    def declare(self, name: str) -> int:
+        slot = self.size
+        self.size += 1
+        self.blocks[-1][name] = slot
+        return slot
+
+    def lookup(self, name: str):
+        for block in reversed(self.blocks):
+            if name in block:
+                return block[name]
+        return None
+
+
+class ClosureCompiler:
+    """Turns each FunctionDeclaration into a tree of specialised Python closures.
+
+    Every expression node becomes a closure taking the current frame (a
+    list of slots) and returning its value; every statement becomes a
+    closure returning a completion signal (None, BREAK, CONTINUE or
+    RETURN). Node types, operators, variable slots and callees are all
+    resolved once here, so running the program never dispatches on node
+    type or operator text.
+    """
+
+    def __init__(self) -> None:
+        self.functions: Dict[str, Callable] = {}
+        self.declarations: Dict[str, FunctionDeclaration] = {}
+        self.globals: List = []
+        self.global_slots: Dict[str, int] = {}
+        self.scope = None
+
+    def compile(self, program: Program) -> Dict[str, Callable]:
+        """Compile every function and evaluate global initializers; return name -> callable"""
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.declarations[decl.name] = decl
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.functions[decl.name] = self.compile_function(decl)
+            elif isinstance(decl, VariableDeclaration):
+                slot = len(self.globals)
+                self.globals.append(0)
+                self.global_slots[decl.name] = slot
+                if decl.initializer:
+                    self.globals[slot] = self.compile_expression(decl.initializer)([0])
+        return self.functions
+
+    def run(self, program: Program, entry: str = 'main'):
+        functions = self.compile(program)
+        if entry not in functions:
+            raise RuntimeError("No main function found")
+        return functions[entry]()
+
+    def compile_function(self, func: FunctionDeclaration) -> Callable:
+        self.scope = FunctionScope(func.parameters)
+        body = self.compile_statement(func.body)
+        scope, self.scope = self.scope, None
+        nparams = len(func.parameters)
+        padding = (0,) * (scope.size - 1 - nparams)
+        name = func.name
+
+        def call(*args):
+            if len(args) != nparams:
+                raise RuntimeError(f"Function {name} expects {nparams} arguments, got {len(args)}")
+            frame = [0, *args, *padding]
+            if body(frame) == RETURN:
+                return frame[RETURN_SLOT]
+            return 0
+        return call
+
+    # Statements
+
+    def compile_statement(self, stmt) -> Callable:
+        if isinstance(stmt, CompoundStatement):
+            return self.compile_compound(stmt)
+        elif isinstance(stmt, ExpressionStatement):
+            if stmt.expression is None:
+                return lambda f: None
+            expr = self.compile_expression(stmt.expression)
+
+            def run(f):
+                expr(f)
+            return run
+        elif isinstance(stmt, VariableDeclaration):
+            init = self.compile_expression(stmt.initializer) if stmt.initializer else None
+            slot = self.scope.declare(stmt.name)
+            if init is None:
+                def run(f):
+                    f[slot] = 0
+            else:
+                def run(f):
+                    f[slot] = init(f)
+            return run
+        elif isinstance(stmt, IfStatement):
+            return self.compile_if(stmt)
+        elif isinstance(stmt, WhileStatement):
+            return self.compile_while(stmt)
+        elif isinstance(stmt, ForStatement):
+            return self.compile_for(stmt)
+        elif isinstance(stmt, ReturnStatement):
+            if stmt.expression is None:
+                def run(f):
+                    f[RETURN_SLOT] = 0
+                    return RETURN
+                return run
+            value = self.compile_expression(stmt.expression)
+
+            def run(f):
+                f[RETURN_SLOT] = value(f)
+                return RETURN
+            return run
+        elif isinstance(stmt, BreakStatement):
+            return lambda f: BREAK
+        elif isinstance(stmt, ContinueStatement):
+            return lambda f: CONTINUE
+        raise RuntimeError(f"Unknown statement type: {type(stmt)}")
+
+    def compile_compound(self, compound: CompoundStatement) -> Callable:
+        self.scope.blocks.append({})
+        stmts = tuple(self.compile_statement(stmt) for stmt in compound.statements)
+        self.scope.blocks.pop()
+
+        if len(stmts) == 1:
+            return stmts[0]
+        if len(stmts) == 2:
+            first, second = stmts
+
+            def run(f):
+                signal = first(f)
+                if signal is not None:
+                    return signal
+                return second(f)
+            return run
+
+        def run(f):
+            for stmt in stmts:
+                signal = stmt(f)
+                if signal is not None:
+                    return signal
+        return run
+
+    def compile_if(self, stmt: IfStatement) -> Callable:
+        cond = self.compile_expression(stmt.condition)
+        then_stmt = self.compile_statement(stmt.then_stmt)
+        if stmt.else_stmt is None:
+            def run(f):
+                if cond(f):
+                    return then_stmt(f)
+            return run
+        else_stmt = self.compile_statement(stmt.else_stmt)
+
+        def run(f):
+            if cond(f):
+                return then_stmt(f)
+            return else_stmt(f)
+        return run
+
+    def compile_while(self, stmt: WhileStatement) -> Callable:
+        cond = self.compile_expression(stmt.condition)
+        body = self.compile_statement(stmt.body)
+
+        def run(f):
+            while cond(f):
+                signal = body(f)
+                if signal is not None:
+                    if signal == BREAK:
+                        break
+                    if signal == RETURN:
+                        return signal
+        return run
+
+    def compile_for(self, stmt: ForStatement) -> Callable:
+        self.scope.blocks.append({})
+        init = self.compile_statement(stmt.init) if stmt.init else (lambda f: None)
+        cond = self.compile_expression(stmt.condition) if stmt.condition else (lambda f: 1)
+        update = self.compile_expression(stmt.update) if stmt.update else (lambda f: None)
+        body = self.compile_statement(stmt.body)
+        self.scope.blocks.pop()
+
+        def run(f):
+            init(f)
+            while cond(f):
+                signal = body(f)
+                if signal is not None:
+                    if signal == BREAK:
+                        break
+                    if signal == RETURN:
+                        return signal
+                update(f)
+        return run
+
+    # Expressions
+
+    def compile_expression(self, expr) -> Callable:
+        if isinstance(expr, Literal):
+            value = expr.value
+            return lambda f: value
+        elif isinstance(expr, Identifier):
+            return self.compile_load(expr.name)
+        elif isinstance(expr, BinaryExpression):
+            return self.compile_binary(expr)
+        elif isinstance(expr, UnaryExpression):
+            return self.compile_unary(expr)
+        elif isinstance(expr, AssignmentExpression):
+            return self.compile_assignment(expr)
+        elif isinstance(expr, FunctionCall):
+            return self.compile_call(expr)
+        elif isinstance(expr, CastExpression):
+            convert = expr.handler
+            operand = self.compile_expression(expr.operand)
+            return lambda f: convert(operand(f))
+
+        # Arrays, members and pointers have no storage model yet; fail when reached
+        kind = type(expr)
+
+        def run(f):
+            raise RuntimeError(f"Unknown expression type: {kind}")
+        return run
+
+    def compile_load(self, name: str) -> Callable:
+        slot = self.scope.lookup(name) if self.scope else None
+        if slot is not None:
+            return lambda f: f[slot]
+        if name in self.global_slots:
+            values = self.globals
+            index = self.global_slots[name]
+            return lambda f: values[index]
+
+        def run(f):
+            raise RuntimeError(f"Variable {name} not defined")
+        return run
+
+    def compile_store(self, name: str, value: Callable) -> Callable:
+        slot = self.scope.lookup(name) if self.scope else None
+        if slot is not None:
+            def run(f):
+                f[slot] = result = value(f)
+                return result
+            return run
+        if name in self.global_slots:
+            values = self.globals
+            index = self.global_slots[name]
+
+            def run(f):
+                values[index] = result = value(f)
+                return result
+            return run
+
+        def run(f):
+            raise RuntimeError(f"Variable {name} not defined")
+        return run
+
+    def compile_binary(self, expr: BinaryExpression) -> Callable:
+        if expr.operator == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+            cond = self.compile_expression(expr.left.left)
+            then_expr = self.compile_expression(expr.left.right)
+            else_expr = self.compile_expression(expr.right)
+            return lambda f: then_expr(f) if cond(f) else else_expr(f)
+        if expr.operator not in BINARY_OPS:
+            raise RuntimeError(f"Unknown binary operator: {expr.operator}")
+        if expr.handler is not None:
+            return self.compile_typed_binary(expr)
+
+        if isinstance(expr.right, Literal):
+            constant = expr.right.value
+            if isinstance(expr.left, Identifier) and expr.operator in LOCAL_CONST_OPS:
+                slot = self.scope.lookup(expr.left.name) if self.scope else None
+                if slot is not None:
+                    return LOCAL_CONST_OPS[expr.operator](slot, constant)
+            if expr.operator in BINARY_CONST_OPS:
+                return BINARY_CONST_OPS[expr.operator](self.compile_expression(expr.left), constant)
+
+        left = self.compile_expression(expr.left)
+        right = self.compile_expression(expr.right)
+        return BINARY_OPS[expr.operator](left, right)
+
+    def compile_typed_binary(self, expr: BinaryExpression) -> Callable:
+        """Apply the operation semantic analysis chose for the operand types"""
+        operation = expr.handler
+        left = self.compile_expression(expr.left)
+        if isinstance(expr.right, Literal):
+            constant = expr.right.value
+            return lambda f: operation(left(f), constant)
+        right = self.compile_expression(expr.right)
+        return lambda f: operation(left(f), right(f))
+
+    def compile_unary(self, expr: UnaryExpression) -> Callable:
+        op = expr.operator
+        if op in UNARY_OPS:
+            operand = self.compile_expression(expr.operand)
+            if expr.handler is not None:
+                operation = expr.handler
+                return lambda f: operation(operand(f))
+            return UNARY_OPS[op](operand)
+        if not isinstance(expr.operand, Identifier):
+            raise RuntimeError(f"Operand of {op} must be a variable")
+
+        name = expr.operand.name
+        load = self.compile_load(name)
+        if expr.handler is not None:
+            operation = expr.handler
+            store = self.compile_store(name, lambda f: operation(load(f)))
+            if op.endswith('_post'):
+                def run(f):
+                    old = load(f)
+                    store(f)
+                    return old
+                return run
+            return store
+        step = 1 if op.startswith('++') else -1
+        store = self.compile_store(name, lambda f: load(f) + step)
+        if op.endswith('_post'):
+            return lambda f: store(f) - step
+        return store
+
+    def compile_assignment(self, expr: AssignmentExpression) -> Callable:
+        if not isinstance(expr.left, Identifier):
+            raise RuntimeError("Assignment target must be a variable")
+        value = self.compile_expression(expr.right)
+        if expr.handler is not None:
+            operation, load, right = expr.handler, self.compile_load(expr.left.name), value
+            value = lambda f: operation(load(f), right(f))
+        elif expr.operator != '=':
+            value = BINARY_OPS[COMPOUND_OPS[expr.operator]](self.compile_load(expr.left.name), value)
+        return self.compile_store(expr.left.name, value)
+
+    def compile_call(self, expr: FunctionCall) -> Callable:
+        name = expr.function.name
+        args = [self.compile_expression(arg) for arg in expr.arguments]
+        if name not in self.declarations:
+            def run(f):
+                raise RuntimeError(f"Function {name} not defined")
+            return run
+
+        # Callees may be compiled after this call site, so look them up at run time
+        functions = self.functions
+        if len(args) == 0:
+            return lambda f: functions[name]()
+        if len(args) == 1:
+            arg0, = args
+            return lambda f: functions[name](arg0(f))
+        if len(args) == 2:
+            arg0, arg1 = args
+            return lambda f: functions[name](arg0(f), arg1(f))
+        return lambda f: functions[name](*[arg(f) for arg in args])
@@ -0,0 +1,449 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from parser import *
+from lexer import *
+from closure_compiler import COMPOUND_OPS
+from resolver import Resolver
+from optimizer import ConstantFolder
+
+# System V AMD64: the first six integer arguments travel in registers
+ARGUMENT_REGISTERS = ('%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9')
+
+# Binary operators applied as `op %rcx, %rax` (left operand in %rax, right in %rcx)
+ARITHMETIC_INSTRUCTIONS = {'+': 'addq', '-': 'subq', '*': 'imulq',
+                           '&': 'andq', '|': 'orq', '^': 'xorq'}
+SHIFT_INSTRUCTIONS = {'<<': 'salq', '>>': 'sarq'}
+COMPARISON_CONDITIONS = {'==': 'e', '!=': 'ne', '<': 'l', '<=': 'le', '>': 'g', '>=': 'ge'}
+STEP_OPS = {'++', '--', '++_post', '--_post'}
+
+# Entry point for executables linked with plain ld: exit(main())
+START_STUB = """
+    .globl _start
+_start:
+    xorl %ebp, %ebp
+    call main
+    movq %rax, %rdi
+    movl $60, %eax
+    syscall
+"""
+
+
+class CodegenError(Exception):
+    """Raised for constructs the x86-64 back end does not handle"""
+
+
+class X86Generator:
+    """Emits x86-64 System V assembly (AT&T syntax, GNU as) for a Program.
+
+    Every value is a 64-bit signed integer. Expressions leave their result
+    in %rax and spill left operands with push/pop; locals live in the
+    frame at -8*slot(%rbp), using the Resolver's slots. Division
+    truncates toward zero as in C, whereas the interpreters floor, so
+    programs dividing negative numbers may disagree with them.
+
+    Calls to functions the program does not define are emitted as is and
+    resolved by the linker, e.g. putchar from libc when linking with cc.
+    """
+
+    def __init__(self, freestanding: bool = False) -> None:
+        """freestanding adds a _start stub so the output links with `ld` alone"""
+        self.freestanding = freestanding
+        self.lines: List[str] = []
+        self.labels = 0
+        self.depth = 0              # 8-byte values pushed since the prologue
+        self.loops = []             # (continue label, break label) of enclosing loops
+        self.return_label = None
+
+    def generate(self, program: Program) -> str:
+        Resolver().resolve(program)
+        self.emit_data(program)
+        self.lines.append("    .text")
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.emit_function(decl)
+        if self.freestanding:
+            self.lines.append(START_STUB)
+        self.lines.append('    .section .note.GNU-stack,"",@progbits')
+        return "\n".join(self.lines) + "\n"
+
+    def emit(self, instruction: str) -> None:
+        self.lines.append("    " + instruction)
+
+    def label(self) -> str:
+        self.labels += 1
+        return f".L{self.labels}"
+
+    def push(self, register: str = '%rax') -> None:
+        self.emit(f"pushq {register}")
+        self.depth += 1
+
+    def pop(self, register: str) -> None:
+        self.emit(f"popq {register}")
+        self.depth -= 1
+
+    # Declarations
+
+    def emit_data(self, program: Program) -> None:
+        """Globals go in .data, one quad per Resolver slot; initializers must fold to integers"""
+        values = [0] * program.global_count
+        names = [None] * program.global_count
+        for decl in program.declarations:
+            if isinstance(decl, VariableDeclaration):
+                names[decl.slot] = decl.name
+                if decl.initializer:
+                    value = ConstantFolder().fold_expression(decl.initializer)
+                    if not isinstance(value, Literal) or not isinstance(value.value, int):
+                        raise CodegenError(f"Initializer of global {decl.name} is not an integer constant")
+                    values[decl.slot] = value.value
+        if not names:
+            return
+        self.lines.append("    .data")
+        for slot, name in enumerate(names):
+            self.lines.append(f"    .globl {name}")
+            self.lines.append("    .p2align 3")
+            self.lines.append(f"{name}:")
+            self.emit(f".quad {values[slot]}")
+
+    def emit_function(self, func: FunctionDeclaration) -> None:
+        # Slot 0 is the interpreters' return slot; it stays unused here
+        frame = (8 * func.frame_size + 15) // 16 * 16
+        self.return_label = self.label()
+        self.depth = 0
+
+        self.lines.append(f"    .globl {func.name}")
+        self.lines.append(f"    .type {func.name}, @function")
+        self.lines.append(f"{func.name}:")
+        self.emit("pushq %rbp")
+        self.emit("movq %rsp, %rbp")
+        if frame:
+            self.emit(f"subq ${frame}, %rsp")
+        for index in range(len(func.parameters)):
+            if index < len(ARGUMENT_REGISTERS):
+                self.emit(f"movq {ARGUMENT_REGISTERS[index]}, {-8 * (index + 1)}(%rbp)")
+            else:
+                # Stack arguments sit above the return address and saved %rbp
+                self.emit(f"movq {16 + 8 * (index - len(ARGUMENT_REGISTERS))}(%rbp), %rax")
+                self.emit(f"movq %rax, {-8 * (index + 1)}(%rbp)")
+
+        self.emit_statement(func.body)
+        # Falling off the end returns 0, as in the interpreters
+        self.emit("xorl %eax, %eax")
+        self.lines.append(f"{self.return_label}:")
+        self.emit("leave")
+        self.emit("ret")
+        self.lines.append(f"    .size {func.name}, .-{func.name}")
+
+    # Statements
+
+    def emit_statement(self, stmt) -> None:
+        if isinstance(stmt, CompoundStatement):
+            for child in stmt.statements:
+                self.emit_statement(child)
+        elif isinstance(stmt, ExpressionStatement):
+            if stmt.expression:
+                self.emit_expression(stmt.expression)
+        elif isinstance(stmt, VariableDeclaration):
+            if stmt.initializer:
+                self.emit_expression(stmt.initializer)
+            else:
+                self.emit("xorl %eax, %eax")
+            self.emit(f"movq %rax, {-8 * stmt.slot}(%rbp)")
+        elif isinstance(stmt, IfStatement):
+            otherwise, end = self.label(), self.label()
+            self.emit_condition(stmt.condition, otherwise)
+            self.emit_statement(stmt.then_stmt)
+            if stmt.else_stmt:
+                self.emit(f"jmp {end}")
+                self.lines.append(f"{otherwise}:")
+                self.emit_statement(stmt.else_stmt)
+                self.lines.append(f"{end}:")
+            else:
+                self.lines.append(f"{otherwise}:")
+        elif isinstance(stmt, WhileStatement):
+            top, end = self.label(), self.label()
+            self.lines.append(f"{top}:")
+            self.emit_condition(stmt.condition, end)
+            self.emit_loop_body(stmt.body, top, end)
+            self.emit(f"jmp {top}")
+            self.lines.append(f"{end}:")
+        elif isinstance(stmt, ForStatement):
+            top, step, end = self.label(), self.label(), self.label()
+            if stmt.init:
+                self.emit_statement(stmt.init)
+            self.lines.append(f"{top}:")
+            if stmt.condition:
+                self.emit_condition(stmt.condition, end)
+            self.emit_loop_body(stmt.body, step, end)
+            self.lines.append(f"{step}:")
+            if stmt.update:
+                self.emit_expression(stmt.update)
+            self.emit(f"jmp {top}")
+            self.lines.append(f"{end}:")
+        elif isinstance(stmt, ReturnStatement):
+            if stmt.expression:
+                self.emit_expression(stmt.expression)
+            else:
+                self.emit("xorl %eax, %eax")
+            self.emit(f"jmp {self.return_label}")
+        elif isinstance(stmt, BreakStatement):
+            if not self.loops:
+                raise CodegenError("break outside of a loop")
+            self.emit(f"jmp {self.loops[-1][1]}")
+        elif isinstance(stmt, ContinueStatement):
+            if not self.loops:
+                raise CodegenError("continue outside of a loop")
+            self.emit(f"jmp {self.loops[-1][0]}")
+        else:
+            raise CodegenError(f"Unknown statement type: {type(stmt)}")
+
+    def emit_loop_body(self, body, continue_label: str, break_label: str) -> None:
+        self.loops.append((continue_label, break_label))
+        self.emit_statement(body)
+        self.loops.pop()
+
+    def emit_condition(self, condition, false_label: str) -> None:
+        """Jump to false_label when condition is zero, fusing a top-level comparison"""
+        if isinstance(condition, BinaryExpression) and condition.operator in COMPARISON_CONDITIONS:
+            self.emit_operands(condition)
+            self.emit("cmpq %rcx, %rax")
+            self.emit(f"j{negate(COMPARISON_CONDITIONS[condition.operator])} {false_label}")
+            return
+        self.emit_expression(condition)
+        self.emit("testq %rax, %rax")
+        self.emit(f"jz {false_label}")
+
+    # Expressions
+
+    def emit_expression(self, expr) -> None:
+        """Evaluate expr into %rax"""
+        if isinstance(expr, Literal):
+            if not isinstance(expr.value, int):
+                raise CodegenError(f"Unsupported literal: {expr.value!r}")
+            self.load(expr, '%rax')
+        elif isinstance(expr, Identifier):
+            self.load(expr, '%rax')
+        elif isinstance(expr, BinaryExpression):
+            self.emit_binary(expr)
+        elif isinstance(expr, UnaryExpression):
+            self.emit_unary(expr)
+        elif isinstance(expr, AssignmentExpression):
+            self.emit_expression(expr.right)
+            if expr.operator != '=':
+                self.emit("movq %rax, %rcx")
+                self.emit(f"movq {self.location(expr.left)}, %rax")
+                self.emit_operator(COMPOUND_OPS[expr.operator])
+            self.emit(f"movq %rax, {self.location(expr.left)}")
+        elif isinstance(expr, FunctionCall):
+            self.emit_call(expr)
+        else:
+            raise CodegenError(f"Unsupported expression: {type(expr).__name__}")
+
+    def emit_binary(self, expr: BinaryExpression) -> None:
+        op = expr.operator
+        if op == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+            otherwise, end = self.label(), self.label()
+            self.emit_condition(expr.left.left, otherwise)
+            self.emit_expression(expr.left.right)
+            self.emit(f"jmp {end}")
+            self.lines.append(f"{otherwise}:")
+            self.emit_expression(expr.right)
+            self.lines.append(f"{end}:")
+        elif op in ('&&', '||'):
+            # Jump to decided as soon as the left operand settles the result
+            decided, end = self.label(), self.label()
+            jump = 'jz' if op == '&&' else 'jnz'
+            self.emit_expression(expr.left)
+            self.emit("testq %rax, %rax")
+            self.emit(f"{jump} {decided}")
+            self.emit_expression(expr.right)
+            self.emit("testq %rax, %rax")
+            self.emit(f"{jump} {decided}")
+            self.emit(f"movl ${1 if op == '&&' else 0}, %eax")
+            self.emit(f"jmp {end}")
+            self.lines.append(f"{decided}:")
+            self.emit(f"movl ${0 if op == '&&' else 1}, %eax")
+            self.lines.append(f"{end}:")
+        else:
+            self.emit_operands(expr)
+            self.emit_operator(op)
+
+    def emit_operands(self, expr: BinaryExpression) -> None:
+        """Left operand into %rax, right into %rcx, evaluated left to right"""
+        right = expr.right
+        if isinstance(right, Identifier) or (isinstance(right, Literal) and isinstance(right.value, int)):
+            # Simple right operands load straight into %rcx, no spill needed
+            self.emit_expression(expr.left)
+            self.load(right, '%rcx')
+            return
+        self.emit_expression(expr.left)
+        self.push()
+        self.emit_expression(expr.right)
+        self.emit("movq %rax, %rcx")
+        self.pop("%rax")
+
+    def emit_operator(self, op: str) -> None:
+        """%rax = %rax op %rcx"""
+        if op in ARITHMETIC_INSTRUCTIONS:
+            self.emit(f"{ARITHMETIC_INSTRUCTIONS[op]} %rcx, %rax")
+        elif op in ('/', '%'):
+            self.emit("cqto")
+            self.emit("idivq %rcx")
+            if op == '%':
+                self.emit("movq %rdx, %rax")
+        elif op in SHIFT_INSTRUCTIONS:
+            self.emit(f"{SHIFT_INSTRUCTIONS[op]} %cl, %rax")
+        elif op in COMPARISON_CONDITIONS:
+            self.emit("cmpq %rcx, %rax")
+            self.emit(f"set{COMPARISON_CONDITIONS[op]} %al")
+            self.emit("movzbq %al, %rax")
+        else:
+            raise CodegenError(f"Unsupported binary operator: {op}")
+
+    def emit_unary(self, expr: UnaryExpression) -> None:
+        op = expr.operator
+        if op in STEP_OPS:
+            location = self.location(expr.operand)
+            instruction = 'incq' if op.startswith('++') else 'decq'
+            if op.endswith('_post'):
+                self.emit(f"movq {location}, %rax")
+                self.emit(f"{instruction} {location}")
+            else:
+                self.emit(f"{instruction} {location}")
+                self.emit(f"movq {location}, %rax")
+            return
+        self.emit_expression(expr.operand)
+        if op == '-':
+            self.emit("negq %rax")
+        elif op == '~':
+            self.emit("notq %rax")
+        elif op == '!':
+            self.emit("testq %rax, %rax")
+            self.emit("sete %al")
+            self.emit("movzbq %al, %rax")
+        elif op != '+':
+            raise CodegenError(f"Unsupported unary operator: {op}")
+
+    def emit_call(self, expr: FunctionCall) -> None:
+        if not isinstance(expr.function, Identifier):
+            raise CodegenError("Only direct calls are supported")
+        args = expr.arguments
+        count = len(args)
+        on_stack = max(0, count - len(ARGUMENT_REGISTERS))
+        # %rsp must be 16-byte aligned at the call instruction
+        padding = (self.depth + count + on_stack) % 2
+        if padding:
+            self.emit("subq $8, %rsp")
+            self.depth += 1
+
+        for arg in args:
+            self.emit_expression(arg)
+            self.push()
+        # Copy the stack arguments into order, last one first; each push
+        # moves the remaining ones 8 bytes further from %rsp
+        for k in range(on_stack):
+            self.push(f"{16 * k}(%rsp)")
+        for index in range(min(count, len(ARGUMENT_REGISTERS))):
+            offset = 8 * (count - 1 - index + on_stack)
+            self.emit(f"movq {offset}(%rsp), {ARGUMENT_REGISTERS[index]}")
+        self.emit("xorl %eax, %eax")    # no vector registers used, for variadic callees
+        self.emit(f"call {expr.function.name}")
+
+        released = count + on_stack + padding
+        if released:
+            self.emit(f"addq ${8 * released}, %rsp")
+            self.depth -= released
+
+    def location(self, target) -> str:
+        if not isinstance(target, Identifier):
+            raise CodegenError("Assignment target must be a variable")
+        if target.slot is None:
+            raise CodegenError(f"Variable {target.name} not defined")
+        if target.is_global:
+            return f"{target.name}(%rip)"
+        return f"{-8 * target.slot}(%rbp)"
+
+    def load(self, expr, register: str) -> None:
+        """Move an integer literal or a variable into register"""
+        if isinstance(expr, Identifier):
+            self.emit(f"movq {self.location(expr)}, {register}")
+        elif -2 ** 31 <= expr.value < 2 ** 31:
+            self.emit(f"movq ${expr.value}, {register}")
+        else:
+            self.emit(f"movabsq ${expr.value}, {register}")
+
+
+def negate(condition: str) -> str:
+    """The condition code that holds exactly when condition does not"""
+    return {'e': 'ne', 'ne': 'e', 'l': 'ge', 'ge': 'l', 'le': 'g', 'g': 'le'}[condition]
+
+
+def generate_assembly(program: Program, freestanding: bool = False) -> str:
+    return X86Generator(freestanding).generate(program)
+
+
+def build_executable(assembly: str, output: str, linker: str = 'cc') -> str:
+    """Assemble and link assembly into the ELF executable output.
+
+    linker 'cc' links against libc through the system C compiler; 'ld'
+    uses as and ld directly and needs assembly generated freestanding.
+    """
+    source = output + ".s"
+    with open(source, "w") as f:
+        f.write(assembly)
+    if linker == 'cc':
+        commands = [['cc', '-o', output, source]]
+    elif linker == 'ld':
+        commands = [['as', '-o', output + ".o", source], ['ld', '-o', output, output + ".o"]]
+    else:
+        raise ValueError(f"Unknown linker: {linker}")
+    for command in commands:
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise CodegenError(f"{command[0]} failed: {result.stderr.strip()}")
+    return output
+
+
+def compile_source(source: str, output: str, linker: str = 'cc') -> str:
+    """Parse C source and build it into the executable output"""
+    program = CParser(regex_lexer(source, skip_newlines=True)).parse()
+    return build_executable(generate_assembly(program, linker == 'ld'), output, linker)
+
+
+def check_against_interpreter(source: str, linker: str = 'cc'):
+    """Run source compiled and interpreted; return (exit code, interpreter result % 256)"""
+    from benchmark import load_interpreter
+    interpreter = load_interpreter()
+    expected = interpreter.CInterpreter().interpret(CParser(regex_lexer(source, skip_newlines=True)).parse())
+
+    with tempfile.TemporaryDirectory() as directory:
+        executable = compile_source(source, os.path.join(directory, "program"), linker)
+        actual = subprocess.run([executable]).returncode
+    return actual, expected % 256
+
+
+def main():
+    from benchmark import FIBONACCI_SOURCE, LOOP_SOURCE, DEEP_SOURCE
+
+    programs = [
+        ("fibonacci(20)", FIBONACCI_SOURCE % 20),
+        ("primes below 5000", LOOP_SOURCE % 5000),
+        ("sum(50)", DEEP_SOURCE % 50),
+    ]
+    failures = 0
+    for title, source in programs:
+        for linker in ('cc', 'ld'):
+            start = time.perf_counter()
+            actual, expected = check_against_interpreter(source, linker)
+            status = "ok" if actual == expected else "MISMATCH"
+            failures += actual != expected
+            print(f"{title:<20} {linker:<3} exit {actual:>3}  interpreter {expected:>3}  "
+                  f"{time.perf_counter() - start:6.3f}s  {status}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import List, Optional
+
+from lexer import *
+from parser import *
+
+
+class IncrementalDocument:
+    """A parsed source file that is re-parsed incrementally after each edit.
+
+    Alongside the Program, the document records the offset at which every
+    top-level declaration starts. An edit re-lexes and re-parses from the
+    start of the declaration it touches and stops as soon as a freshly
+    parsed declaration starts where an old one did (shifted by the edit),
+    since the lexer and the top-level parser carry no state across a
+    declaration boundary. Every declaration before or after the damaged
+    region is reused as-is, so the work done is proportional to the
+    declarations the edit touched, not to the file.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.symbols = SymbolTable()
+        self.program: Optional[Program] = None
+        self.starts = array('i')
+        self.reparsed = 0  # declarations parsed by the last update
+        self.parse_all()
+
+    def parse_all(self) -> Program:
+        declarations, starts = self.parse_from(0)
+        self.starts = array('i', starts)
+        self.program = Program()
+        self.program.declarations = declarations
+        self.reparsed = len(declarations)
+        return self.program
+
+    def parse_from(self, offset: int, resync=None):
+        """Parse top-level declarations from offset until EOF or until resync(start) is true"""
+        lex = regex_lexer(self.source, self.symbols)
+        lex.cur_pos = offset
+        parser = CParser(lex)
+        declarations: List[Declaration] = []
+        starts: List[int] = []
+        try:
+            while parser.current_token.type != TokenType.EOF:
+                if parser.current_token.type == TokenType.NEWLINE:
+                    parser.advance()
+                    continue
+                start = parser.current_token.pos
+                if resync is not None and resync(start):
+                    break
+                declaration = parser.parse_declaration()
+                if declaration:
+                    declarations.append(declaration)
+                    starts.append(start)
+        except SystemExit:
+            # Leave the document to be parsed from scratch on the next edit
+            self.program = None
+            raise
+        return declarations, starts
+
+    def apply_edit(self, offset: int, removed: int, inserted: str) -> Program:
+        """Replace source[offset:offset + removed] with inserted and return the updated Program"""
+        old_end = offset + removed
+        delta = len(inserted) - removed
+        self.source = self.source[:offset] + inserted + self.source[old_end:]
+        if self.program is None:
+            return self.parse_all()
+
+        old_starts = self.starts
+        old_declarations = self.program.declarations
+        first = max(bisect_right(old_starts, offset) - 1, 0)
+        restart = old_starts[first] if first > 0 else 0
+        damage_end = offset + len(inserted)
+        resume = len(old_starts)
+
+        def resync(start: int) -> bool:
+            nonlocal resume
+            if start < damage_end:
+                return False
+            i = bisect_left(old_starts, start - delta)
+            if i < len(old_starts) and old_starts[i] == start - delta and old_starts[i] >= old_end:
+                resume = i
+                return True
+            return False
+
+        declarations, starts = self.parse_from(restart, resync)
+        self.reparsed = len(declarations)
+
+        tail = old_starts[resume:]
+        self.starts = old_starts[:first] + array('i', starts) + array('i', [start + delta for start in tail])
+        program = Program()
+        program.declarations = old_declarations[:first] + declarations + old_declarations[resume:]
+        self.program = program
+        return program
+
+
+def main():
+    source_code = """
+    int square(int x) {
+        return x * x;
+    }
+
+    int main() {
+        return square(4);
+    }
+    """
+
+    document = IncrementalDocument(source_code)
+    offset = source_code.index("4")
+    program = document.apply_edit(offset, 1, "5")
+    print(f"Re-parsed {document.reparsed} of {len(program.declarations)} declarations")
+
+if __name__ == "__main__":
+    main()
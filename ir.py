@@ -0,0 +1,770 @@
+from typing import Dict, List, Optional
+
+from parser import *
+from lexer import *
+from closure_compiler import COMPOUND_OPS
+from resolver import Resolver
+from stack_eval import BINARY_FUNCTIONS
+
+# Three-address instructions. Operands are SSA names (str) or integer
+# constants; `target` names a function or global, `labels` are block labels.
+#
+#   dest = copy a                  dest = a <op> b     (op in BINARY_FUNCTIONS)
+#   dest = neg a | not a | inv a   dest = param index
+#   dest = call target(args...)    dest = load @target
+#   store @target, a               dest = phi [label: a, ...]
+#   jump label                     branch a, then_label, else_label
+#   ret a
+UNARY_OPS = {'-': 'neg', '!': 'not', '~': 'inv'}
+UNARY_FUNCTIONS = {'neg': lambda a: -a, 'not': lambda a: 0 if a else 1, 'inv': lambda a: ~a}
+TERMINATORS = {'jump', 'branch', 'ret'}
+
+
+class IRError(Exception):
+    """Raised for constructs the IR lowering does not handle"""
+
+
+class Instruction:
+    __slots__ = ('op', 'dest', 'args', 'target', 'labels')
+
+    def __init__(self, op: str, dest: Optional[str] = None, args: List = (),
+                 target: Optional[str] = None, labels: List[str] = ()):
+        self.op = op
+        self.dest = dest
+        self.args = list(args)
+        self.target = target
+        self.labels = list(labels)  # phi: incoming block per arg; jump/branch: successors
+
+    def uses(self) -> List[str]:
+        return [arg for arg in self.args if isinstance(arg, str)]
+
+    def __str__(self) -> str:
+        args = ", ".join(format_operand(arg) for arg in self.args)
+        if self.op == 'phi':
+            text = "phi " + ", ".join(f"[{label}: {format_operand(arg)}]"
+                                      for label, arg in zip(self.labels, self.args))
+        elif self.op in BINARY_FUNCTIONS:
+            text = f"{format_operand(self.args[0])} {self.op} {format_operand(self.args[1])}"
+        elif self.op == 'call':
+            text = f"call {self.target}({args})"
+        elif self.op in ('load', 'store'):
+            text = f"{self.op} @{self.target}" + (f", {args}" if args else "")
+        elif self.op in ('jump', 'branch'):
+            text = f"{self.op} " + ", ".join(([args] if args else []) + self.labels)
+        else:
+            text = f"{self.op} {args}"
+        return f"{format_operand(self.dest)} = {text}" if self.dest else text
+
+
+class BasicBlock:
+    __slots__ = ('label', 'instructions', 'predecessors', 'successors')
+
+    def __init__(self, label: str):
+        self.label = label
+        self.instructions: List[Instruction] = []
+        self.predecessors: List[str] = []
+        self.successors: List[str] = []
+
+    @property
+    def terminator(self) -> Optional[Instruction]:
+        if self.instructions and self.instructions[-1].op in TERMINATORS:
+            return self.instructions[-1]
+        return None
+
+    def phis(self) -> List[Instruction]:
+        return [inst for inst in self.instructions if inst.op == 'phi']
+
+
+class IRFunction:
+    """A function as a list of basic blocks, the entry block first"""
+
+    def __init__(self, name: str, parameters: List[str]):
+        self.name = name
+        self.parameters = parameters
+        self.blocks: List[BasicBlock] = []
+        self.block_map: Dict[str, BasicBlock] = {}
+
+    @property
+    def entry(self) -> BasicBlock:
+        return self.blocks[0]
+
+    def link(self) -> None:
+        """Recompute predecessors/successors and drop blocks unreachable from the entry"""
+        self.block_map = {block.label: block for block in self.blocks}
+        reachable = {self.entry.label}
+        pending = [self.entry]
+        while pending:
+            block = pending.pop()
+            block.successors = list(dict.fromkeys(block.terminator.labels))
+            for label in block.successors:
+                if label not in reachable:
+                    reachable.add(label)
+                    pending.append(self.block_map[label])
+        self.blocks = [block for block in self.blocks if block.label in reachable]
+        self.block_map = {block.label: block for block in self.blocks}
+        for block in self.blocks:
+            block.predecessors = []
+        for block in self.blocks:
+            for label in block.successors:
+                self.block_map[label].predecessors.append(block.label)
+
+    def __str__(self) -> str:
+        lines = [f"function {self.name}({', '.join(self.parameters)}) {{"]
+        for block in self.blocks:
+            lines.append(f"{block.label}:" + (f"    ; preds {', '.join(block.predecessors)}"
+                                             if block.predecessors else ""))
+            lines.extend(f"    {inst}" for inst in block.instructions)
+        lines.append("}")
+        return "\n".join(lines)
+
+
+class IRModule:
+    """The lowered program; `init` stores the global initializers and runs before main"""
+
+    def __init__(self):
+        self.functions: Dict[str, IRFunction] = {}
+        self.globals: List[str] = []
+        self.init: Optional[IRFunction] = None
+
+    def __str__(self) -> str:
+        parts = [f"global @{name}" for name in self.globals]
+        parts.extend(str(function) for function in [self.init, *self.functions.values()] if function)
+        return "\n\n".join(parts)
+
+
+def format_operand(operand) -> str:
+    return f"%{operand}" if isinstance(operand, str) else str(operand)
+
+
+# Lowering
+
+class IRBuilder:
+    """Lowers resolved FunctionDeclarations to IRFunctions, not yet in SSA form.
+
+    Each local is one variable named name.slot (the Resolver's slot keeps
+    shadowed names apart) that may be assigned many times; temporaries t<n>
+    are assigned exactly once. &&, || and ?: become control flow that
+    merges into a variable, so construct_ssa later turns them into phis.
+    """
+
+    def __init__(self) -> None:
+        self.function: Optional[IRFunction] = None
+        self.block: Optional[BasicBlock] = None
+        self.temps = 0
+        self.variables = set()  # names assigned more than once, renamed by construct_ssa
+        self.loops = []         # (continue label, break label)
+
+    def lower_function(self, func: FunctionDeclaration) -> IRFunction:
+        parameters = [f"{param.name}.{index + 1}" for index, param in enumerate(func.parameters)]
+        self.start_function(func.name, parameters)
+        for index, name in enumerate(parameters):
+            self.variables.add(name)
+            self.emit('param', name, [index])
+        self.lower_statement(func.body)
+        return self.finish_function()
+
+    def lower_initializers(self, program: Program) -> IRFunction:
+        """A pseudo-function storing every global initializer, in declaration order"""
+        self.start_function("__init__", [])
+        for decl in program.declarations:
+            if isinstance(decl, VariableDeclaration) and decl.initializer:
+                self.emit('store', args=[self.lower_expression(decl.initializer)], target=decl.name)
+        return self.finish_function()
+
+    def start_function(self, name: str, parameters: List[str]) -> None:
+        self.function = IRFunction(name, parameters)
+        self.temps = 0
+        self.variables = set()
+        self.block = self.new_block("entry")
+
+    def finish_function(self) -> IRFunction:
+        if self.block.terminator is None:
+            self.emit('ret', args=[0])
+        function, self.function = self.function, None
+        function.link()
+        return function
+
+    def new_block(self, hint: str) -> BasicBlock:
+        block = BasicBlock(f"{hint}{len(self.function.blocks)}" if self.function.blocks else hint)
+        self.function.blocks.append(block)
+        return block
+
+    def emit(self, op: str, dest: Optional[str] = None, args: List = (),
+             target: Optional[str] = None, labels: List[str] = ()) -> Optional[str]:
+        if self.block.terminator is not None:
+            # Code after return/break/continue: give it a block nothing jumps to
+            self.block = self.new_block("dead")
+        self.block.instructions.append(Instruction(op, dest, args, target, labels))
+        return dest
+
+    def temp(self) -> str:
+        self.temps += 1
+        return f"t{self.temps}"
+
+    def merge_variable(self) -> str:
+        """A fresh variable assigned on several paths, e.g. the result of ?:"""
+        name = self.temp()
+        self.variables.add(name)
+        return name
+
+    def jump(self, block: BasicBlock) -> None:
+        self.emit('jump', labels=[block.label])
+
+    def branch(self, condition, then_block: BasicBlock, else_block: BasicBlock) -> None:
+        self.emit('branch', args=[condition], labels=[then_block.label, else_block.label])
+
+    # Statements
+
+    def lower_statement(self, stmt) -> None:
+        if isinstance(stmt, CompoundStatement):
+            for child in stmt.statements:
+                self.lower_statement(child)
+        elif isinstance(stmt, ExpressionStatement):
+            if stmt.expression:
+                self.lower_expression(stmt.expression)
+        elif isinstance(stmt, VariableDeclaration):
+            value = self.lower_expression(stmt.initializer) if stmt.initializer else 0
+            name = f"{stmt.name}.{stmt.slot}"
+            self.variables.add(name)
+            self.emit('copy', name, [value])
+        elif isinstance(stmt, IfStatement):
+            condition = self.lower_expression(stmt.condition)
+            then_block, join = self.new_block("then"), self.new_block("endif")
+            else_block = self.new_block("else") if stmt.else_stmt else join
+            self.branch(condition, then_block, else_block)
+            self.block = then_block
+            self.lower_statement(stmt.then_stmt)
+            self.jump(join)
+            if stmt.else_stmt:
+                self.block = else_block
+                self.lower_statement(stmt.else_stmt)
+                self.jump(join)
+            self.block = join
+        elif isinstance(stmt, WhileStatement):
+            header, body, exit = self.new_block("while"), self.new_block("body"), self.new_block("endwhile")
+            self.jump(header)
+            self.block = header
+            self.branch(self.lower_expression(stmt.condition), body, exit)
+            self.block = body
+            self.lower_loop_body(stmt.body, header, exit)
+            self.jump(header)
+            self.block = exit
+        elif isinstance(stmt, ForStatement):
+            if stmt.init:
+                self.lower_statement(stmt.init)
+            header, body = self.new_block("for"), self.new_block("body")
+            step, exit = self.new_block("step"), self.new_block("endfor")
+            self.jump(header)
+            self.block = header
+            if stmt.condition:
+                self.branch(self.lower_expression(stmt.condition), body, exit)
+            else:
+                self.jump(body)
+            self.block = body
+            self.lower_loop_body(stmt.body, step, exit)
+            self.jump(step)
+            self.block = step
+            if stmt.update:
+                self.lower_expression(stmt.update)
+            self.jump(header)
+            self.block = exit
+        elif isinstance(stmt, ReturnStatement):
+            value = self.lower_expression(stmt.expression) if stmt.expression else 0
+            self.emit('ret', args=[value])
+        elif isinstance(stmt, BreakStatement):
+            if not self.loops:
+                raise IRError("break outside of a loop")
+            self.emit('jump', labels=[self.loops[-1][1].label])
+        elif isinstance(stmt, ContinueStatement):
+            if not self.loops:
+                raise IRError("continue outside of a loop")
+            self.emit('jump', labels=[self.loops[-1][0].label])
+        else:
+            raise IRError(f"Unknown statement type: {type(stmt)}")
+
+    def lower_loop_body(self, body, continue_block: BasicBlock, break_block: BasicBlock) -> None:
+        self.loops.append((continue_block, break_block))
+        self.lower_statement(body)
+        self.loops.pop()
+
+    # Expressions
+
+    def lower_expression(self, expr):
+        """Emit the instructions computing expr and return the operand holding its value"""
+        if isinstance(expr, Literal):
+            if not isinstance(expr.value, int):
+                raise IRError(f"Unsupported literal: {expr.value!r}")
+            return expr.value
+        elif isinstance(expr, Identifier):
+            return self.load(expr)
+        elif isinstance(expr, BinaryExpression):
+            op = expr.operator
+            if op == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+                return self.lower_select(self.lower_expression(expr.left.left),
+                                         lambda: self.lower_expression(expr.left.right),
+                                         lambda: self.lower_expression(expr.right))
+            elif op == '&&':
+                return self.lower_select(self.lower_expression(expr.left),
+                                         lambda: self.truth(self.lower_expression(expr.right)),
+                                         lambda: 0)
+            elif op == '||':
+                return self.lower_select(self.lower_expression(expr.left),
+                                         lambda: 1,
+                                         lambda: self.truth(self.lower_expression(expr.right)))
+            if op not in BINARY_FUNCTIONS:
+                raise IRError(f"Unknown binary operator: {op}")
+            left = self.lower_expression(expr.left)
+            right = self.lower_expression(expr.right)
+            return self.emit(op, self.temp(), [left, right])
+        elif isinstance(expr, UnaryExpression):
+            op = expr.operator
+            if op in ('++', '--', '++_post', '--_post'):
+                old = self.emit('copy', self.temp(), [self.load(expr.operand)])
+                new = self.emit('+' if op.startswith('++') else '-', self.temp(), [old, 1])
+                self.store(expr.operand, new)
+                return old if op.endswith('_post') else new
+            operand = self.lower_expression(expr.operand)
+            if op == '+':
+                return operand
+            if op not in UNARY_OPS:
+                raise IRError(f"Unknown unary operator: {op}")
+            return self.emit(UNARY_OPS[op], self.temp(), [operand])
+        elif isinstance(expr, AssignmentExpression):
+            value = self.lower_expression(expr.right)
+            if expr.operator != '=':
+                value = self.emit(COMPOUND_OPS[expr.operator], self.temp(), [self.load(expr.left), value])
+            self.store(expr.left, value)
+            return value
+        elif isinstance(expr, FunctionCall):
+            if not isinstance(expr.function, Identifier):
+                raise IRError("Only direct calls are supported")
+            args = [self.lower_expression(arg) for arg in expr.arguments]
+            return self.emit('call', self.temp(), args, target=expr.function.name)
+        raise IRError(f"Unsupported expression: {type(expr).__name__}")
+
+    def lower_select(self, condition, then_value, else_value) -> str:
+        """condition ? then_value() : else_value(), each arm lowered in its own block"""
+        result = self.merge_variable()
+        then_block, else_block, join = self.new_block("then"), self.new_block("else"), self.new_block("join")
+        self.branch(condition, then_block, else_block)
+        for block, value in ((then_block, then_value), (else_block, else_value)):
+            self.block = block
+            self.emit('copy', result, [value()])
+            self.jump(join)
+        self.block = join
+        return result
+
+    def truth(self, value):
+        """value normalised to 0/1"""
+        return self.emit('!=', self.temp(), [value, 0])
+
+    def load(self, target):
+        if not isinstance(target, Identifier):
+            raise IRError("Assignment target must be a variable")
+        if target.slot is None:
+            raise IRError(f"Variable {target.name} not defined")
+        if target.is_global:
+            return self.emit('load', self.temp(), target=target.name)
+        return f"{target.name}.{target.slot}"
+
+    def store(self, target, value) -> None:
+        if not isinstance(target, Identifier):
+            raise IRError("Assignment target must be a variable")
+        if target.slot is None:
+            raise IRError(f"Variable {target.name} not defined")
+        if target.is_global:
+            self.emit('store', args=[value], target=target.name)
+        else:
+            self.emit('copy', f"{target.name}.{target.slot}", [value])
+
+
+# SSA construction
+
+def reverse_postorder(function: IRFunction) -> List[BasicBlock]:
+    order, seen = [], {function.entry.label}
+    stack = [(function.entry, iter(function.entry.successors))]
+    while stack:
+        block, successors = stack[-1]
+        for label in successors:
+            if label not in seen:
+                seen.add(label)
+                child = function.block_map[label]
+                stack.append((child, iter(child.successors)))
+                break
+        else:
+            stack.pop()
+            order.append(block)
+    order.reverse()
+    return order
+
+
+def dominators(function: IRFunction) -> Dict[str, str]:
+    """Immediate dominator of every block (the entry maps to itself).
+
+    The iterative algorithm of Cooper, Harvey and Kennedy: converges in a
+    couple of reverse-postorder passes on structured control flow.
+    """
+    order = reverse_postorder(function)
+    index = {block.label: i for i, block in enumerate(order)}
+    entry = function.entry.label
+    idom = {entry: entry}
+
+    def intersect(a, b):
+        while a != b:
+            while index[a] > index[b]:
+                a = idom[a]
+            while index[b] > index[a]:
+                b = idom[b]
+        return a
+
+    changed = True
+    while changed:
+        changed = False
+        for block in order[1:]:
+            processed = [p for p in block.predecessors if p in idom]
+            new = processed[0]
+            for pred in processed[1:]:
+                new = intersect(pred, new)
+            if idom.get(block.label) != new:
+                idom[block.label] = new
+                changed = True
+    return idom
+
+
+def dominance_frontiers(function: IRFunction, idom: Dict[str, str]) -> Dict[str, set]:
+    frontiers = {block.label: set() for block in function.blocks}
+    for block in function.blocks:
+        if len(block.predecessors) < 2:
+            continue
+        for pred in block.predecessors:
+            runner = pred
+            while runner != idom[block.label]:
+                frontiers[runner].add(block.label)
+                runner = idom[runner]
+    return frontiers
+
+
+def construct_ssa(function: IRFunction, variables: set) -> IRFunction:
+    """Rename variables into SSA form in place (Cytron et al.).
+
+    Phis go at the iterated dominance frontier of each variable's
+    definitions; a dominator-tree walk then gives every definition a fresh
+    name x.1 -> x.1_0, x.1_1, ... A use reached by no definition reads 0,
+    the value of an uninitialised frame slot in the interpreters. Phis
+    whose result is never used are removed afterwards.
+    """
+    idom = dominators(function)
+    frontiers = dominance_frontiers(function, idom)
+
+    definitions = {name: set() for name in variables}
+    for block in function.blocks:
+        for inst in block.instructions:
+            if inst.dest in definitions:
+                definitions[inst.dest].add(block.label)
+
+    for name, blocks in definitions.items():
+        has_phi = set()
+        pending = list(blocks)
+        while pending:
+            label = pending.pop()
+            for frontier in frontiers[label]:
+                if frontier in has_phi:
+                    continue
+                block = function.block_map[frontier]
+                block.instructions.insert(0, Instruction('phi', name, [name] * len(block.predecessors),
+                                                         labels=block.predecessors))
+                has_phi.add(frontier)
+                if frontier not in blocks:
+                    pending.append(frontier)
+
+    children = {block.label: [] for block in function.blocks}
+    for label, parent in idom.items():
+        if label != parent:
+            children[parent].append(label)
+
+    stacks = {name: [] for name in variables}
+    counters = dict.fromkeys(variables, 0)
+
+    def current(operand):
+        if isinstance(operand, str) and operand in stacks:
+            return stacks[operand][-1] if stacks[operand] else 0
+        return operand
+
+    # Explicit walk: (block label, None) enters a block, (None, names) leaves it
+    work = [(function.entry.label, None)]
+    while work:
+        label, pushed = work.pop()
+        if label is None:
+            for name in pushed:
+                stacks[name].pop()
+            continue
+        block = function.block_map[label]
+        pushed = []
+        for inst in block.instructions:
+            if inst.op != 'phi':
+                inst.args = [current(arg) for arg in inst.args]
+            if inst.dest in stacks:
+                name = inst.dest
+                inst.dest = f"{name}_{counters[name]}"
+                counters[name] += 1
+                stacks[name].append(inst.dest)
+                pushed.append(name)
+        for successor in block.successors:
+            for inst in function.block_map[successor].phis():
+                index = inst.labels.index(label)
+                inst.args[index] = current(inst.args[index])
+        work.append((None, pushed))
+        work.extend((child, None) for child in reversed(children[label]))
+
+    remove_dead_phis(function)
+    return function
+
+
+def remove_dead_phis(function: IRFunction) -> None:
+    """Drop phis nothing reads, repeating as removals free further phis"""
+    changed = True
+    while changed:
+        used = set()
+        for block in function.blocks:
+            for inst in block.instructions:
+                # A phi feeding only itself around a loop does not keep itself alive
+                used.update(name for name in inst.uses() if name != inst.dest)
+        changed = False
+        for block in function.blocks:
+            kept = [inst for inst in block.instructions if inst.op != 'phi' or inst.dest in used]
+            changed |= len(kept) != len(block.instructions)
+            block.instructions = kept
+
+
+def lower_program(program: Program, ssa: bool = True) -> IRModule:
+    """Resolve and lower a Program; ssa=False keeps the multiply-assigned variables"""
+    Resolver().resolve(program)
+    module = IRModule()
+    builder = IRBuilder()
+    for decl in program.declarations:
+        if isinstance(decl, VariableDeclaration):
+            module.globals.append(decl.name)
+    functions = [builder.lower_initializers(program)]
+    variables = [builder.variables]
+    for decl in program.declarations:
+        if isinstance(decl, FunctionDeclaration):
+            function = builder.lower_function(decl)
+            module.functions[decl.name] = function
+            functions.append(function)
+            variables.append(builder.variables)
+    module.init = functions[0]
+    if ssa:
+        for function, names in zip(functions, variables):
+            construct_ssa(function, names)
+    return module
+
+
+# Dataflow
+
+class DataflowProblem:
+    """A monotone dataflow problem over sets, solved per block by solve().
+
+    Subclasses set `forward`, and implement transfer(block, value) giving
+    the value at the far end of the block. edge(source, target, value)
+    adjusts a value crossing an edge, which is where phis come in.
+    """
+    forward = True
+
+    def boundary(self, function: IRFunction) -> frozenset:
+        """Value entering the entry block (forward) or leaving exit blocks (backward)"""
+        return frozenset()
+
+    def initial(self) -> frozenset:
+        return frozenset()
+
+    def meet(self, values) -> frozenset:
+        return frozenset().union(*values)
+
+    def transfer(self, block: BasicBlock, value: frozenset) -> frozenset:
+        raise NotImplementedError
+
+    def edge(self, source: BasicBlock, target: BasicBlock, value: frozenset) -> frozenset:
+        return value
+
+
+def solve(function: IRFunction, problem: DataflowProblem):
+    """Iterate problem to a fixed point with a worklist; returns (before, after) per block label.
+
+    before/after are in execution order: for a backward problem `before`
+    is the value at the block's start (e.g. live-in) and `after` at its end.
+    """
+    order = reverse_postorder(function)
+    if not problem.forward:
+        order.reverse()
+    blocks = function.block_map
+    start = {block.label: problem.initial() for block in order}   # side the transfer reads
+    end = {block.label: problem.initial() for block in order}     # side the transfer writes
+    boundary = problem.boundary(function)
+
+    worklist = list(reversed(order))
+    queued = {block.label for block in order}
+    while worklist:
+        block = worklist.pop()
+        queued.discard(block.label)
+        if problem.forward:
+            sources = [(blocks[p], block) for p in block.predecessors]
+            dependants = block.successors
+        else:
+            sources = [(blocks[s], block) for s in block.successors]
+            dependants = block.predecessors
+        if sources:
+            incoming = problem.meet([problem.edge(*((src, dst) if problem.forward else (dst, src)),
+                                                  end[src.label]) for src, dst in sources])
+        else:
+            incoming = boundary
+        if block is function.entry and problem.forward:
+            incoming = problem.meet([incoming, boundary])
+        start[block.label] = incoming
+        value = problem.transfer(block, incoming)
+        if value != end[block.label]:
+            end[block.label] = value
+            for label in dependants:
+                if label not in queued:
+                    queued.add(label)
+                    worklist.append(blocks[label])
+    if problem.forward:
+        return start, end
+    return end, start
+
+
+class LiveVariables(DataflowProblem):
+    """Names whose current value may still be read. A phi's operand is live
+    at the end of the predecessor it comes from, not in the phi's block."""
+    forward = False
+
+    def transfer(self, block, live):
+        live = set(live)
+        for inst in reversed(block.instructions):
+            if inst.dest:
+                live.discard(inst.dest)
+            if inst.op != 'phi':
+                live.update(inst.uses())
+        return frozenset(live)
+
+    def edge(self, source, target, live):
+        operands = [inst.args[inst.labels.index(source.label)] for inst in target.phis()]
+        return live.union(arg for arg in operands if isinstance(arg, str))
+
+
+class ReachingDefinitions(DataflowProblem):
+    """Definitions (name, block label, index) that may reach each point. In
+    SSA form nothing is ever killed; before it, a definition kills the
+    others of the same variable."""
+
+    def __init__(self, function: IRFunction):
+        self.by_name = {}
+        for block in function.blocks:
+            for index, inst in enumerate(block.instructions):
+                if inst.dest:
+                    self.by_name.setdefault(inst.dest, set()).add((inst.dest, block.label, index))
+
+    def transfer(self, block, reaching):
+        reaching = set(reaching)
+        for index, inst in enumerate(block.instructions):
+            if inst.dest:
+                reaching -= self.by_name[inst.dest]
+                reaching.add((inst.dest, block.label, index))
+        return frozenset(reaching)
+
+
+def liveness(function: IRFunction):
+    return solve(function, LiveVariables())
+
+
+def reaching_definitions(function: IRFunction):
+    return solve(function, ReachingDefinitions(function))
+
+
+# Execution
+
+class IRInterpreter:
+    """Executes an IRModule directly, SSA or not, with the interpreters' semantics"""
+
+    def __init__(self, module: IRModule):
+        self.module = module
+        self.globals = dict.fromkeys(module.globals, 0)
+
+    def run(self, entry: str = 'main'):
+        self.call(self.module.init, [])
+        if entry not in self.module.functions:
+            raise RuntimeError("No main function found")
+        return self.call(self.module.functions[entry], [])
+
+    def call(self, function: IRFunction, args: List):
+        env = {}
+
+        def value(operand):
+            return env[operand] if isinstance(operand, str) else operand
+
+        block, previous = function.entry, None
+        while True:
+            # Phis read their operands together, on entry from previous
+            phis = block.phis()
+            if phis:
+                values = [value(inst.args[inst.labels.index(previous)]) for inst in phis]
+                for inst, result in zip(phis, values):
+                    env[inst.dest] = result
+            for inst in block.instructions[len(phis):]:
+                op = inst.op
+                if op == 'copy':
+                    env[inst.dest] = value(inst.args[0])
+                elif op in BINARY_FUNCTIONS:
+                    env[inst.dest] = BINARY_FUNCTIONS[op](value(inst.args[0]), value(inst.args[1]))
+                elif op in UNARY_FUNCTIONS:
+                    env[inst.dest] = UNARY_FUNCTIONS[op](value(inst.args[0]))
+                elif op == 'param':
+                    index = inst.args[0]
+                    env[inst.dest] = args[index] if index < len(args) else 0
+                elif op == 'call':
+                    callee = self.module.functions.get(inst.target)
+                    if callee is None:
+                        raise RuntimeError(f"Function {inst.target} not defined")
+                    env[inst.dest] = self.call(callee, [value(arg) for arg in inst.args])
+                elif op == 'load':
+                    env[inst.dest] = self.globals[inst.target]
+                elif op == 'store':
+                    self.globals[inst.target] = value(inst.args[0])
+                elif op == 'ret':
+                    return value(inst.args[0])
+                elif op == 'jump':
+                    block, previous = function.block_map[inst.labels[0]], block.label
+                elif op == 'branch':
+                    label = inst.labels[0] if value(inst.args[0]) else inst.labels[1]
+                    block, previous = function.block_map[label], block.label
+                else:
+                    raise RuntimeError(f"Unknown IR instruction: {op}")
+
+
+def main():
+    source_code = """
+    int fibonacci(int n) {
+        int a = 0;
+        int b = 1;
+        for (int i = 0; i < n; i++) {
+            int t = a + b;
+            a = b;
+            b = t;
+        }
+        return n > 0 && a > 0 ? a : -1;
+    }
+
+    int main() {
+        return fibonacci(10);
+    }
+    """
+    module = lower_program(CParser(regex_lexer(source_code, skip_newlines=True)).parse())
+    function = module.functions['fibonacci']
+    print(function)
+    live_in, live_out = liveness(function)
+    print()
+    for block in function.blocks:
+        print(f"{block.label}: live in {{{', '.join(sorted(live_in[block.label]))}}}")
+    print(f"\n{IRInterpreter(module).run()}")
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,51 @@
-import enum
-import sys
-
 
+import codecs
 import enum
+import re
 import sys
-from typing import Union, Optional
+from array import array
+from bisect import bisect_right
+from collections import deque
+from typing import List, Union, Optional
 
 
 class Token:
-    def __init__(self, val: str, type: 'TokenType') -> None:
+    __slots__ = ('val', 'type', 'id', 'pos')
+
+    def __init__(self, val: str, type: 'TokenType', id: int = -1, pos: int = -1) -> None:
         self.val = val
         self.type = type
+        self.id = id  # symbol table id for identifiers, -1 otherwise
+        self.pos = pos  # offset of the first character in the source, -1 if unknown
+
+
+class SymbolTable:
+    """Interns identifier names and hands out a small integer id per distinct name"""
+
+    def __init__(self) -> None:
+        self.ids: dict = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        sym = self.ids.get(name)
+        if sym is None:
+            sym = len(self.names)
+            name = sys.intern(name)
+            self.ids[name] = sym
+            self.names.append(name)
+        return sym
+
+    def name(self, sym: int) -> str:
+        return self.names[sym]
+
+    def __len__(self) -> int:
+        return len(self.names)
 
 
 class lexer:
-    def __init__(self, source: str) -> None:
+    def __init__(self, source: str, symbols: Optional[SymbolTable] = None) -> None:
         self.source = source + "\n"
+        self.symbols = symbols if symbols is not None else SymbolTable()
         self.cur_pos = -1
         self.cur_char = ''
         self.next_char()
@@ -59,6 +89,7 @@ class lexer:
     def get_token(self) -> Token:
         self.skip_whitespace()
         self.skip_comments()
+        start = self.cur_pos
         token: Optional[Token] = None
         
         if self.cur_char == "*":
@@ -265,7 +296,8 @@ class lexer:
             
             keyword = self.checkIfKeyword(word)
             if keyword is False:
-                token = Token(word, TokenType.IDENT)
+                sym = self.symbols.intern(word)
+                token = Token(self.symbols.names[sym], TokenType.IDENT, sym)
             else:
                 token = Token(word, keyword)
         else:
@@ -274,15 +306,11 @@ class lexer:
         if token.type != TokenType.EOF:   
             self.next_char()
         
+        token.pos = start
         return token
     
-    def checkIfKeyword(self, word: str) -> Union[Token, bool]:
-        word_lower = word.lower()
-        for token_type in TokenType:
-            # Check if it's a keyword (values 101-200)
-            if token_type.name.lower() == word_lower and 100 <= token_type.value <= 200:
-                return token_type
-        return False
+    def checkIfKeyword(self, word: str) -> Union['TokenType', bool]:
+        return KEYWORDS.get(word, False)
 
 
 class TokenType(enum.Enum):
@@ -369,3 +397,421 @@ class TokenType(enum.Enum):
     ARROW = 310       # ->
     QUESTION = 311    # ?
     COLON = 312       # :
+
+
+# C keywords are the TokenType members valued 101-200, spelled in lower case
+KEYWORDS = {token_type.name.lower(): token_type
+            for token_type in TokenType if 100 <= token_type.value <= 200}
+
+# Fixed-spelling tokens, longest first so the master regex does maximal munch
+OPERATORS = {
+    "->": TokenType.ARROW, "++": TokenType.INCR, "--": TokenType.DECR,
+    "+=": TokenType.PLUSEQ, "-=": TokenType.MINUSEQ, "*=": TokenType.MULEQ,
+    "/=": TokenType.DIVEQ, "%=": TokenType.MODEQ, "==": TokenType.EQEQ,
+    "!=": TokenType.NOTEQ, "<=": TokenType.LTEQ, ">=": TokenType.GTEQ,
+    "<<": TokenType.LSHIFT, ">>": TokenType.RSHIFT, "&&": TokenType.AND,
+    "||": TokenType.OR,
+    "=": TokenType.EQ, "+": TokenType.PLUS, "-": TokenType.MINUS,
+    "*": TokenType.ASTERISK, "/": TokenType.SLASH, "%": TokenType.PERCENT,
+    "<": TokenType.LT, ">": TokenType.GT, "!": TokenType.NOT,
+    "&": TokenType.BITAND, "|": TokenType.BITOR, "^": TokenType.BITXOR,
+    "~": TokenType.BITNOT, ";": TokenType.SEMICOLON, ",": TokenType.COMMA,
+    "(": TokenType.LPAREN, ")": TokenType.RPAREN, "{": TokenType.LBRACE,
+    "}": TokenType.RBRACE, "[": TokenType.LBRACKET, "]": TokenType.RBRACKET,
+    ".": TokenType.DOT, "?": TokenType.QUESTION, ":": TokenType.COLON,
+}
+
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r'}
+
+TOKEN_RULES = [
+    r"(?P<NEWLINE>\n)",
+    r"(?P<NUMBER>\d+(?:\.\d*)?)",
+    r"(?P<IDENT>[^\W\d]\w*)",
+    r'(?P<STRING>"(?:[^"\\]|\\[\s\S])*")',
+    r"(?P<CHAR>'(?:[^'\\]|\\[\s\S])*')",
+    "(?P<OP>" + "|".join(re.escape(op) for op in OPERATORS) + ")",
+    r"(?P<EOF>\0|\\0)",
+    r"(?P<ERROR>[\s\S])",
+]
+
+COMMENT_RULE = r"#[^\n]*|//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)"
+
+TOKEN_PATTERN = re.compile("|".join([r"(?P<SKIP>[ \t\r]+|" + COMMENT_RULE + ")"] + TOKEN_RULES))
+
+# Variant that treats newlines as whitespace, so no NEWLINE tokens are produced
+TOKEN_PATTERN_NO_NEWLINES = re.compile("|".join([r"(?P<SKIP>[ \t\r\n]+|" + COMMENT_RULE + ")"] + TOKEN_RULES))
+
+ESCAPE_PATTERN = re.compile(r"\\([\s\S])")
+
+
+def unescape(text: str) -> str:
+    """Resolve backslash escapes inside a string or character literal"""
+    if '\\' not in text:
+        return text
+    return ESCAPE_PATTERN.sub(lambda m: ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+def classify(kind: str, text: str) -> 'TokenType':
+    """Map a master-regex group and its text to a TokenType, exiting on malformed input"""
+    if kind == "IDENT":
+        return KEYWORDS.get(text, TokenType.IDENT)
+    if kind == "OP":
+        return OPERATORS[text]
+    if kind == "NUMBER":
+        if text[-1] == ".":
+            sys.exit("Illegal character in number")
+        return TokenType.NUMBER
+    if kind == "NEWLINE":
+        return TokenType.NEWLINE
+    if kind == "STRING" or kind == "CHAR":
+        return TokenType.STRING
+    if kind == "EOF":
+        return TokenType.EOF
+    if text == '"':
+        sys.exit("Unterminated string literal")
+    if text == "'":
+        sys.exit("Unterminated character literal")
+    sys.exit(f"Unknown Token: {text}")
+
+
+def token_value(token_type: 'TokenType', text: str) -> str:
+    """Token.val for a non-identifier token whose source spelling is text"""
+    if token_type is TokenType.STRING:
+        return unescape(text[1:-1])
+    if token_type is TokenType.NEWLINE:
+        return "NEWLINE"
+    if token_type is TokenType.EOF:
+        return "EOF"
+    return text
+
+
+def line_starts(source: str) -> array:
+    """Offsets at which each line of source begins"""
+    starts = array('i', [0])
+    starts.extend(match.end() for match in re.finditer("\n", source))
+    return starts
+
+
+def location(starts: array, offset: int) -> tuple:
+    """1-based (line, column) of offset, given the table from line_starts"""
+    line = bisect_right(starts, offset)
+    return line, offset - starts[line - 1] + 1
+
+
+TOKEN_TYPES = {token_type.value: token_type for token_type in TokenType}
+
+
+class TokenBuffer:
+    """Columnar token stream for a whole translation unit.
+
+    Tokens are kept as three parallel int arrays (TokenType value, start
+    offset, length) rather than Token objects; a Token is only built when
+    one is asked for. Line/column positions come from a line-start table
+    that is built the first time a location is needed.
+    """
+
+    def __init__(self, source: str, symbols: Optional[SymbolTable] = None) -> None:
+        self.source = source
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.types = array('i')
+        self.starts = array('i')
+        self.lengths = array('i')
+        self.lines: Optional[array] = None
+        self.index = 0
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def append(self, token_type: 'TokenType', start: int, length: int) -> None:
+        self.types.append(token_type.value)
+        self.starts.append(start)
+        self.lengths.append(length)
+
+    def token(self, i: int) -> Token:
+        token_type = TOKEN_TYPES[self.types[i]]
+        start = self.starts[i]
+        text = self.source[start:start + self.lengths[i]]
+        if token_type is TokenType.IDENT:
+            sym = self.symbols.intern(text)
+            return Token(self.symbols.names[sym], token_type, sym, start)
+        return Token(token_value(token_type, text), token_type, -1, start)
+
+    def get_token(self) -> Token:
+        """Return the token under the cursor and advance, staying on the final EOF"""
+        i = self.index
+        if i < len(self.types) - 1:
+            self.index = i + 1
+        return self.token(i)
+
+    def peek(self, n: int = 1) -> Token:
+        """The n-th token get_token would return from here, without consuming anything"""
+        return self.token(min(self.index + n - 1, len(self.types) - 1))
+
+    def location(self, offset: int) -> tuple:
+        if self.lines is None:
+            self.lines = line_starts(self.source)
+        return location(self.lines, offset)
+
+
+class TokenStream:
+    """k-token lookahead over any lexer, for CParser.
+
+    Tokens are pulled from the lexer in batches into a deque, so peek(n)
+    is an index into already-lexed tokens and the parser never calls the
+    lexer per token. A lexer error (SystemExit) ends the stream with EOF,
+    as CParser.advance used to do for each token. NEWLINE tokens are
+    dropped unless skip_newlines is False. batch=None pre-lexes the whole
+    input on the first request.
+    """
+
+    def __init__(self, source_lexer, batch: Optional[int] = 256, skip_newlines: bool = True) -> None:
+        self.lexer = source_lexer
+        self.batch = batch
+        self.skip_newlines = skip_newlines
+        self.pending: deque = deque()
+        self.done = False
+
+    def fill(self, count: Optional[int]) -> None:
+        """Lex until count tokens are pending (all remaining tokens if count is None)"""
+        pending = self.pending
+        get_token = self.lexer.get_token
+        skip_newlines = self.skip_newlines
+        try:
+            while count is None or len(pending) < count:
+                token = get_token()
+                if token.type is TokenType.NEWLINE and skip_newlines:
+                    continue
+                pending.append(token)
+                if token.type is TokenType.EOF:
+                    self.done = True
+                    return
+        except SystemExit:
+            pending.append(Token("EOF", TokenType.EOF))
+            self.done = True
+
+    def get_token(self) -> Token:
+        pending = self.pending
+        if not pending:
+            self.fill(self.batch)
+        if self.done and len(pending) == 1:
+            return pending[0]  # stay on EOF
+        return pending.popleft()
+
+    def peek(self, n: int = 1) -> Token:
+        """The n-th token get_token would return from here, without consuming anything"""
+        pending = self.pending
+        if len(pending) < n and not self.done:
+            self.fill(n if self.batch is None else max(n, self.batch))
+        return pending[n - 1] if n <= len(pending) else pending[-1]
+
+    def location(self, offset: int) -> Optional[tuple]:
+        location = getattr(self.lexer, 'location', None)
+        return location(offset) if location is not None else None
+
+
+class regex_lexer:
+    """Table-driven lexer: one compiled master regex, token text sliced from the source.
+
+    Produces the same Token/TokenType stream as `lexer`, including the
+    trailing NEWLINE before EOF, without copying or walking the source
+    one character at a time. With skip_newlines=True line breaks are
+    treated as whitespace and no NEWLINE token is ever emitted.
+    """
+
+    def __init__(self, source: str, symbols: Optional[SymbolTable] = None,
+                 skip_newlines: bool = False) -> None:
+        self.source = source
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.cur_pos = 0
+        self.at_end = skip_newlines
+        self.scan = (TOKEN_PATTERN_NO_NEWLINES if skip_newlines else TOKEN_PATTERN).match
+        self.lines: Optional[array] = None
+
+    checkIfKeyword = lexer.checkIfKeyword
+
+    def get_token(self) -> Token:
+        source = self.source
+        scan = self.scan
+        while True:
+            match = scan(source, self.cur_pos)
+            if match is None:
+                # Mirror the newline the reference lexer appends to its input
+                if self.at_end:
+                    return Token("EOF", TokenType.EOF, -1, self.cur_pos)
+                self.at_end = True
+                return Token("NEWLINE", TokenType.NEWLINE, -1, self.cur_pos)
+            kind = match.lastgroup
+            if kind != "SKIP":
+                break
+            self.cur_pos = match.end()
+
+        text = match.group()
+        start = self.cur_pos
+        if kind == "IDENT":
+            self.cur_pos = match.end()
+            keyword = KEYWORDS.get(text)
+            if keyword is not None:
+                return Token(text, keyword, -1, start)
+            sym = self.symbols.intern(text)
+            return Token(self.symbols.names[sym], TokenType.IDENT, sym, start)
+        if kind == "OP":
+            self.cur_pos = match.end()
+            return Token(text, OPERATORS[text], -1, start)
+
+        token_type = classify(kind, text)
+        if token_type is TokenType.EOF:
+            # Stay on the terminator so every later call also returns EOF
+            return Token("EOF", token_type, -1, start)
+        self.cur_pos = match.end()
+        return Token(token_value(token_type, text), token_type, -1, start)
+
+    def tokenize(self) -> TokenBuffer:
+        """Lex the rest of the source into a TokenBuffer. Like TokenStream, the
+        buffer is parser input, so line breaks are whitespace: no NEWLINE tokens."""
+        source = self.source
+        scan = TOKEN_PATTERN_NO_NEWLINES.match
+        buffer = TokenBuffer(source, self.symbols)
+        types = buffer.types.append
+        starts = buffer.starts.append
+        lengths = buffer.lengths.append
+        pos = self.cur_pos
+        ident = TokenType.IDENT.value
+        while True:
+            match = scan(source, pos)
+            if match is None:
+                self.at_end = True
+                break
+            kind = match.lastgroup
+            end = match.end()
+            if kind == "SKIP":
+                pos = end
+                continue
+            start = match.start()
+            if kind == "IDENT":
+                text = match.group()
+                types(KEYWORDS[text].value if text in KEYWORDS else ident)
+            elif kind == "OP":
+                types(OPERATORS[match.group()].value)
+            else:
+                token_type = classify(kind, match.group())
+                if token_type is TokenType.EOF:
+                    break
+                types(token_type.value)
+            starts(start)
+            lengths(end - start)
+            pos = end
+        self.cur_pos = pos
+        buffer.append(TokenType.EOF, pos, 0)
+        return buffer
+
+    def location(self, offset: int) -> tuple:
+        if self.lines is None:
+            self.lines = line_starts(self.source)
+        return location(self.lines, offset)
+
+
+class file_lexer(regex_lexer):
+    """regex_lexer over a file of any size, read through a bounded window.
+
+    The file is read in fixed-size binary chunks and decoded incrementally,
+    so a multi-byte character split across chunks is handled by the
+    decoder. Text that has been lexed is dropped from the window on every
+    refill, and a match that runs into the end of the window is retried
+    after the next chunk arrives, so tokens and comments straddling a
+    chunk boundary come out whole. Token.pos is the character offset in
+    the whole file.
+
+    The file is closed at EOF or by close(); use the lexer as a context
+    manager so that a parse abandoned part-way closes it too. tokenize()
+    returns a TokenStream rather than a TokenBuffer, which would hold the
+    whole file.
+    """
+
+    def __init__(self, path: str, symbols: Optional[SymbolTable] = None,
+                 chunk_size: int = 1 << 20, encoding: str = 'utf-8',
+                 skip_newlines: bool = False) -> None:
+        super().__init__("", symbols, skip_newlines)
+        self.file = open(path, 'rb')
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.chunk_size = chunk_size
+        self.base = 0  # file offset of source[0]
+        self.base_line = 1  # line number of source[0]
+        self.line_start = 0  # file offset of the line containing source[0]
+        self.exhausted = False
+
+    def fill(self) -> None:
+        """Drop the lexed prefix of the window and append the next chunk"""
+        data = self.file.read(self.chunk_size)
+        text = self.decoder.decode(data, final=not data)
+        if not data:
+            self.exhausted = True
+            self.file.close()
+        newline = self.source.rfind("\n", 0, self.cur_pos)
+        if newline >= 0:
+            self.line_start = self.base + newline + 1
+        self.base_line += self.source.count("\n", 0, self.cur_pos)
+        self.base += self.cur_pos
+        self.source = self.source[self.cur_pos:] + text
+        self.cur_pos = 0
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> 'file_lexer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_token(self) -> Token:
+        scan = self.scan
+        while True:
+            source = self.source
+            match = scan(source, self.cur_pos)
+            if not self.exhausted and (match is None or match.end() == len(source)
+                                       or (match.lastgroup == "ERROR" and match.group() in "\"'")):
+                # The token may continue in the next chunk
+                self.fill()
+                continue
+            if match is None:
+                if self.at_end:
+                    return Token("EOF", TokenType.EOF, -1, self.base + self.cur_pos)
+                self.at_end = True
+                return Token("NEWLINE", TokenType.NEWLINE, -1, self.base + self.cur_pos)
+            kind = match.lastgroup
+            if kind != "SKIP":
+                break
+            self.cur_pos = match.end()
+
+        text = match.group()
+        start = self.base + self.cur_pos
+        if kind == "IDENT":
+            self.cur_pos = match.end()
+            keyword = KEYWORDS.get(text)
+            if keyword is not None:
+                return Token(text, keyword, -1, start)
+            sym = self.symbols.intern(text)
+            return Token(self.symbols.names[sym], TokenType.IDENT, sym, start)
+        if kind == "OP":
+            self.cur_pos = match.end()
+            return Token(text, OPERATORS[text], -1, start)
+
+        token_type = classify(kind, text)
+        if token_type is TokenType.EOF:
+            return Token("EOF", token_type, -1, start)
+        self.cur_pos = match.end()
+        return Token(token_value(token_type, text), token_type, -1, start)
+
+    def tokenize(self) -> TokenStream:
+        """The rest of the file as a token stream with lookahead, lexed batch by batch on demand"""
+        return TokenStream(self)
+
+    def location(self, offset: int) -> Optional[tuple]:
+        """Line/column of an offset still inside the window, None once it has been dropped"""
+        index = offset - self.base
+        if index < 0:
+            return None
+        line = self.base_line + self.source.count("\n", 0, index)
+        newline = self.source.rfind("\n", 0, index)
+        line_start = self.base + newline + 1 if newline >= 0 else self.line_start
+        return line, offset - line_start + 1
@@ -0,0 +1,741 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from parser import *
+from lexer import *
+from closure_compiler import COMPOUND_OPS
+from optimizer import iter_nodes
+from semantic import (CType, SemanticError, INT, LONG, DOUBLE, FLOAT, VOID, STRING,
+                      common_type, ctype_of, to_float32, wrapper)
+
+
+class LayoutError(Exception):
+    """Raised for programs whose data cannot be laid out in memory"""
+
+
+class PointerType(CType):
+    __slots__ = ('target',)
+
+    def __init__(self, target: CType):
+        super().__init__(f"{target.name} *", 'pointer', 8, False)
+        self.target = target
+
+
+class ArrayType(CType):
+    """An array variable; length is None when its size is only known at run time"""
+    __slots__ = ('element', 'length')
+
+    def __init__(self, element: CType, length: Optional[int]):
+        super().__init__(f"{element.name}[]", 'array', element.size * (length or 0))
+        self.element = element
+        self.length = length
+
+
+class StructType(CType):
+    """A struct tag. Incomplete until define() lays out its members"""
+    __slots__ = ('fields', 'align', 'complete')
+
+    def __init__(self, tag: str):
+        super().__init__(f"struct {tag}", 'struct')
+        self.fields: Dict[str, Tuple[CType, int]] = {}     # member -> (type, byte offset)
+        self.align = 1
+        self.complete = False
+
+    def define(self, members: List[Tuple[str, CType]]) -> None:
+        """Give each member the next offset aligned for its type; pad the size to the struct's alignment"""
+        if self.complete:
+            raise LayoutError(f"Redefinition of {self.name}")
+        offset = 0
+        for name, ctype in members:
+            if name in self.fields:
+                raise LayoutError(f"Duplicate member {name} in {self.name}")
+            if ctype.size == 0:
+                raise LayoutError(f"Member {name} of {self.name} has incomplete type {ctype}")
+            align = alignment(ctype)
+            offset = -(-offset // align) * align
+            self.fields[name] = (ctype, offset)
+            offset += ctype.size
+            self.align = max(self.align, align)
+        self.size = -(-offset // self.align) * self.align
+        self.complete = True
+
+
+def alignment(ctype: CType) -> int:
+    if isinstance(ctype, StructType):
+        return ctype.align
+    if isinstance(ctype, ArrayType):
+        return alignment(ctype.element)
+    return ctype.size or 1
+
+
+INTEGER_FORMATS = {
+    (1, True): 'b', (1, False): 'B', (2, True): 'h', (2, False): 'H',
+    (4, True): 'i', (4, False): 'I', (8, True): 'q', (8, False): 'Q',
+}
+
+
+def format_of(ctype: CType) -> Optional[str]:
+    """struct/memoryview format code of a scalar type; None for structs and arrays"""
+    if ctype.kind == 'int':
+        return INTEGER_FORMATS[ctype.size, ctype.signed]
+    if ctype.kind == 'float':
+        return 'f' if ctype.size == 4 else 'd'
+    if ctype.kind == 'pointer':
+        return 'Q'
+    return None
+
+
+def decay(ctype: CType) -> CType:
+    """An array used as a value is a pointer to its first element"""
+    if isinstance(ctype, ArrayType):
+        return PointerType(ctype.element)
+    return ctype
+
+
+class TypeTable:
+    """CTypes by type name: 'int', 'unsigned char', 'struct node', 'struct node **'.
+
+    A struct tag names the same StructType wherever it appears, so a
+    pointer to a struct may be declared before the struct is defined.
+    """
+
+    def __init__(self) -> None:
+        self.types: Dict[str, CType] = {}
+        self.structs: Dict[str, StructType] = {}
+
+    def parse(self, type_name: str) -> CType:
+        ctype = self.types.get(type_name)
+        if ctype is None:
+            ctype = self.types[type_name] = self.build(type_name)
+        return ctype
+
+    def build(self, type_name: str) -> CType:
+        words = type_name.split()
+        if words and words[-1].startswith('*'):
+            ctype = self.parse(" ".join(words[:-1]))
+            for _ in words[-1]:
+                ctype = PointerType(ctype)
+            return ctype
+        if words[:1] == ['struct']:
+            if len(words) != 2:
+                raise LayoutError(f"Invalid type: {type_name}")
+            return self.struct(words[1])
+        if words[:1] == ['union']:
+            raise LayoutError(f"Unions are not supported: {type_name}")
+        if words[:1] == ['enum']:
+            return INT
+        try:
+            return ctype_of(type_name)
+        except SemanticError as error:
+            raise LayoutError(str(error)) from None
+
+    def struct(self, tag: str) -> StructType:
+        if tag not in self.structs:
+            self.structs[tag] = StructType(tag)
+        return self.structs[tag]
+
+
+class Aggregate:
+    """What Memory.locate returns for a struct: reading yields the object's
+    address (as for an array), storing copies a whole struct into it"""
+    __slots__ = ('data', 'size')
+
+    def __init__(self, data: bytearray, size: int):
+        self.data = data
+        self.size = size
+
+    def __getitem__(self, address: int) -> int:
+        return address
+
+    def __setitem__(self, address: int, source: int) -> None:
+        self.data[address:address + self.size] = self.data[source:source + self.size]
+
+
+# Address space: [0, NULL_GUARD) is never mapped, so NULL and small offsets from
+# it fault; static data follows, then the stack and the heap.
+NULL_GUARD = 4096
+HEAP_ALIGN = 16
+# Memory grows in whole pages
+PAGE_SIZE = 4096
+# Source for growing and clearing memory without building a zeroed copy of the range
+ZEROS = memoryview(bytes(1 << 20))
+
+
+class Memory:
+    """Flat, byte-addressed memory for one program run.
+
+    Everything lives in a single bytearray, grown (by an eighth, or to what
+    is needed) only as far as addresses have been handed out and never
+    beyond `limit` bytes. Typed loads and stores go through memoryview casts
+    of it, one per format, so a million ints take 4 MB and reading one is
+    an index into the int view.
+
+    `static` hands out storage for globals. While the program has not
+    started, that is right above the NULL guard and moves the stack up;
+    later it comes from the heap. The stack holds arrays, structs and
+    address-taken locals: `push` allocates zeroed space and callers restore
+    `stack_pointer` to free it. Above the stack's `stack_size` bytes,
+    `malloc` / `free` manage the heap: blocks are rounded up to HEAP_ALIGN
+    bytes, freed blocks go on a free list per size for reuse, and everything
+    else comes from bumping `heap_top`.
+    """
+
+    def __init__(self, limit: int = 64 * 1024 * 1024, stack_size: int = 8 * 1024 * 1024) -> None:
+        self.limit = limit - limit % 8     # every format's view must tile the buffer
+        self.data = bytearray()
+        self.views: Dict[str, memoryview] = {}
+        self.containers: Dict[CType, object] = {}   # type -> its view, or an Aggregate
+        self.stack_size = stack_size
+        self.stack_base = self.stack_pointer = NULL_GUARD
+        self.stack_limit = NULL_GUARD + stack_size
+        self.heap_top = self.stack_limit
+        self.heap_peak = self.heap_top
+        self.blocks: Dict[int, int] = {}            # live heap block address -> size
+        self.free_lists: Dict[int, List[int]] = {}  # size -> addresses of freed blocks
+
+    def ensure(self, end: int) -> None:
+        """Make addresses below end backed by data"""
+        size = len(self.data)
+        if end <= size:
+            return
+        if end > self.limit:
+            raise RuntimeError(f"Out of memory: {end} bytes exceeds the limit of {self.limit} bytes")
+        size = max(end, size + size // 8)
+        size = min(-(-size // PAGE_SIZE) * PAGE_SIZE, self.limit)
+        # A bytearray can't be resized while memoryviews of it exist
+        self.containers.clear()
+        for view in self.views.values():
+            view.release()
+        self.views.clear()
+        while len(self.data) < size:
+            self.data += ZEROS[:size - len(self.data)]
+
+    def clear(self, address: int, end: int) -> None:
+        while address < end:
+            chunk = ZEROS[:end - address]
+            self.data[address:address + len(chunk)] = chunk
+            address += len(chunk)
+
+    def view(self, fmt: str) -> memoryview:
+        view = self.views.get(fmt)
+        if view is None:
+            with memoryview(self.data) as raw:
+                view = self.views[fmt] = raw.cast(fmt)
+        return view
+
+    # Allocation
+
+    def push(self, nbytes: int, align: int) -> int:
+        """Zeroed stack space for an object; freed when the caller restores stack_pointer"""
+        address = -(-self.stack_pointer // align) * align
+        end = address + nbytes
+        if end > self.stack_limit:
+            raise RuntimeError(f"Stack overflow: {end - self.stack_base} bytes of stack in use")
+        self.ensure(end)
+        self.clear(address, end)
+        self.stack_pointer = end
+        return address
+
+    def static(self, nbytes: int, align: int) -> int:
+        """Zeroed storage for a global, never freed"""
+        if self.stack_pointer == self.stack_base and self.heap_top == self.heap_peak == self.stack_limit:
+            # Nothing has run yet: place it below the stack
+            address = -(-self.stack_base // align) * align
+            self.ensure(address + nbytes)
+            self.stack_base = self.stack_pointer = address + nbytes
+            self.stack_limit = self.heap_top = self.heap_peak = self.stack_base + self.stack_size
+            return address
+        address = -(-self.heap_top // align) * align
+        self.ensure(address + nbytes)
+        self.heap_top = address + nbytes
+        return address
+
+    def malloc(self, size: int) -> int:
+        """Address of a zeroed block of at least size bytes, or 0 (NULL) if memory is exhausted"""
+        if size < 0:
+            return 0
+        size = max(HEAP_ALIGN, -(-size // HEAP_ALIGN) * HEAP_ALIGN)
+        reusable = self.free_lists.get(size)
+        if reusable:
+            address = reusable.pop()
+            self.clear(address, address + size)
+        else:
+            address = -(-self.heap_top // HEAP_ALIGN) * HEAP_ALIGN
+            if address + size > self.limit:
+                return 0
+            self.ensure(address + size)
+            self.heap_top = address + size
+            self.heap_peak = max(self.heap_peak, self.heap_top)
+        self.blocks[address] = size
+        return address
+
+    def free(self, address: int) -> None:
+        if address == 0:
+            return
+        size = self.blocks.pop(address, None)
+        if size is None:
+            raise RuntimeError(f"free(): invalid pointer {address:#x}")
+        if address + size == self.heap_top:
+            self.heap_top = address
+        else:
+            self.free_lists.setdefault(size, []).append(address)
+
+    # Access
+
+    def locate(self, ctype: CType, address: int):
+        """(container, key) through which the object of type ctype at address is read and written"""
+        size = ctype.size
+        if address < NULL_GUARD or address + size > len(self.data):
+            raise RuntimeError(f"Segmentation fault: address {address:#x}")
+        container = self.containers.get(ctype)
+        if container is None:
+            container = self.containers[ctype] = self.container(ctype)
+        if container.__class__ is Aggregate:
+            return container, address
+        if address % size:
+            raise RuntimeError(f"Misaligned {ctype} access at address {address:#x}")
+        return container, address // size
+
+    def container(self, ctype: CType):
+        fmt = format_of(ctype)
+        if fmt is not None:
+            return self.view(fmt)
+        if ctype.size == 0:
+            raise RuntimeError(f"Access to an object of incomplete type {ctype}")
+        return Aggregate(self.data, ctype.size)
+
+    def store(self, ctype: CType, address: int, value):
+        container, key = self.locate(ctype, address)
+        try:
+            container[key] = value
+        except (TypeError, ValueError):
+            value = convert_store(container, key, value)
+        return value
+
+
+def convert_store(view: memoryview, index: int, value):
+    """Store a value the typed view rejected (out of range, or a float into an integer
+    element) the way C converts on assignment; return the value stored"""
+    if view.format in ('f', 'd'):
+        value = float(value)
+    else:
+        bits = 8 * view.itemsize
+        value = int(value) & ((1 << bits) - 1)     # truncates toward zero, then wraps
+        if view.format.islower() and value >> (bits - 1):
+            value -= 1 << bits
+    view[index] = value
+    return value
+
+
+def cast_handler(target: CType):
+    """Conversion a cast to target applies to an (untyped) value"""
+    if target.kind == 'int':
+        wrap = wrapper(target)
+        return lambda v: wrap(int(v))   # truncates toward zero, as C does
+    if target is FLOAT:
+        return to_float32
+    if target is DOUBLE:
+        return float
+    if target.kind in ('pointer', 'void'):
+        return lambda v: v
+    raise LayoutError(f"Cannot cast to {target}")
+
+
+def pointer_arithmetic(operator: str, size: int, pointer_left: bool):
+    """handler(left, right) for pointer +/- integer, integer + pointer and pointer - pointer"""
+    size = size or 1    # arithmetic on void * steps by bytes
+    if operator == '+':
+        if pointer_left:
+            return lambda a, b: a + b * size
+        return lambda a, b: a * size + b
+    return lambda a, b: a - b * size
+
+
+BUILTIN_FUNCTIONS = {'malloc': 'void *', 'free': 'void'}
+
+
+class MemoryLayout:
+    """Prepares an untyped, unresolved program to keep its data in a Memory.
+
+    Struct definitions are laid out once, in declaration order, and each
+    MemberAccess gets the byte `offset` of its member. Variables that must
+    live in memory (arrays, structs and scalars whose address is taken)
+    get `VariableDeclaration.ctype`: the element type of an array, else the
+    variable's type. Such a variable's slot holds its address; uses of
+    structs and address-taken scalars are rewritten to `*x`, while an
+    array's address is its value. An address-taken parameter is copied into
+    a local of the same name on entry.
+
+    ArrayAccess, MemberAccess and unary `*` nodes get `ctype`, the type of
+    the object they designate. Pointer arithmetic (`p + n`, `p - q`, `+=`,
+    `++`, ...) gets handlers that scale by the pointee size, casts get
+    converting handlers and sizeof(type) folds to a literal. Functions
+    using any of this are listed in `memory_functions` and loops whose
+    body allocates stack space in `scoped_loops`.
+    """
+
+    def __init__(self) -> None:
+        self.types = TypeTable()
+        self.globals: Dict[str, Tuple[CType, bool]] = {}     # name -> (type, read through *)
+        self.scopes: List[Dict[str, Tuple[CType, bool]]] = []
+        self.return_types: Dict[str, CType] = {}
+        self.address_taken: Set[str] = set()
+        self.memory_functions: Set[str] = set()
+        self.scoped_loops: Set = set()
+        self.function: Optional[str] = None
+        self.loops: List = []
+
+    def run(self, program: Program) -> Program:
+        for node in iter_nodes_of(program):
+            if isinstance(node, UnaryExpression) and node.operator == '&' and isinstance(node.operand, Identifier):
+                self.address_taken.add(node.operand.name)
+        for name, return_type in BUILTIN_FUNCTIONS.items():
+            self.return_types[name] = self.types.parse(return_type)
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                return_type = self.types.parse(decl.return_type)
+                if isinstance(return_type, StructType):
+                    raise LayoutError(f"Function {decl.name} returns a struct; return a pointer instead")
+                self.return_types[decl.name] = return_type
+
+        for decl in program.declarations:
+            if isinstance(decl, StructDeclaration):
+                self.types.struct(decl.name).define(
+                    [(member.name, self.member_type(member)) for member in decl.members])
+            elif isinstance(decl, FunctionDeclaration):
+                self.layout_function(decl)
+            elif isinstance(decl, VariableDeclaration):
+                self.globals[decl.name] = self.layout_declaration(decl)
+        return program
+
+    def member_type(self, member: VariableDeclaration) -> CType:
+        ctype = self.types.parse(member.type_name)
+        if member.size is None:
+            return ctype
+        if not isinstance(member.size, Literal) or type(member.size.value) is not int or member.size.value <= 0:
+            raise LayoutError(f"Array member {member.name} needs a positive constant size")
+        return ArrayType(ctype, member.size.value)
+
+    def uses_memory(self) -> None:
+        if self.function is not None:
+            self.memory_functions.add(self.function)
+
+    def lookup(self, name: str) -> Tuple[Optional[CType], bool]:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return self.globals.get(name, (None, False))
+
+    # Declarations and statements
+
+    def layout_function(self, func: FunctionDeclaration) -> None:
+        self.function = func.name
+        parameters = {}
+        shadows = []
+        for param in func.parameters:
+            ctype = self.types.parse(param.type_name)
+            if isinstance(ctype, StructType):
+                raise LayoutError(f"Struct parameter {param.name} of {func.name}; pass a pointer instead")
+            parameters[param.name] = (ctype, False)
+            if param.name in self.address_taken:
+                # Copy the argument into memory: `int x = x;` reads the parameter
+                shadows.append(VariableDeclaration(param.type_name, param.name, Identifier(param.name)))
+        func.body.statements[:0] = shadows
+        self.scopes = [parameters]
+        self.layout_statement(func.body)
+        self.scopes = []
+        self.function = None
+
+    def layout_declaration(self, decl: VariableDeclaration) -> Tuple[CType, bool]:
+        """Annotate decl and lay out its size and initializer; return (type, read through *) for its scope"""
+        ctype = self.types.parse(decl.type_name)
+        if ctype is VOID:
+            raise LayoutError(f"Variable {decl.name} has type void")
+        if decl.size is not None:
+            decl.size = self.layout_expression(decl.size)
+            decl.ctype = ctype
+            self.uses_memory()
+            length = decl.size.value if isinstance(decl.size, Literal) else None
+            return ArrayType(ctype, length), False
+        if decl.initializer:
+            decl.initializer = self.layout_expression(decl.initializer)
+            if isinstance(ctype, StructType) and not isinstance(decl.initializer.ctype, StructType):
+                raise LayoutError(f"Struct {decl.name} initialised with a {decl.initializer.ctype}")
+        if isinstance(ctype, StructType) or decl.name in self.address_taken:
+            if ctype.size == 0:
+                raise LayoutError(f"Variable {decl.name} has incomplete type {ctype}")
+            decl.ctype = ctype
+            self.uses_memory()
+            return ctype, True
+        return ctype, False
+
+    def layout_statement(self, stmt) -> None:
+        if isinstance(stmt, CompoundStatement):
+            self.scopes.append({})
+            for child in stmt.statements:
+                self.layout_statement(child)
+            self.scopes.pop()
+        elif isinstance(stmt, VariableDeclaration):
+            # The initializer can't see the variable it initialises
+            self.scopes[-1][stmt.name] = self.layout_declaration(stmt)
+            if stmt.ctype is not None and self.loops:
+                self.scoped_loops.add(self.loops[-1])
+        elif isinstance(stmt, (ExpressionStatement, ReturnStatement)):
+            if stmt.expression:
+                stmt.expression = self.layout_expression(stmt.expression)
+                if isinstance(stmt, ReturnStatement) and isinstance(stmt.expression.ctype, StructType):
+                    raise LayoutError("Returning a struct; return a pointer instead")
+        elif isinstance(stmt, IfStatement):
+            stmt.condition = self.layout_expression(stmt.condition)
+            self.layout_statement(stmt.then_stmt)
+            if stmt.else_stmt:
+                self.layout_statement(stmt.else_stmt)
+        elif isinstance(stmt, WhileStatement):
+            stmt.condition = self.layout_expression(stmt.condition)
+            self.loops.append(stmt)
+            self.layout_statement(stmt.body)
+            self.loops.pop()
+        elif isinstance(stmt, ForStatement):
+            self.scopes.append({})
+            if stmt.init:
+                self.layout_statement(stmt.init)
+            if stmt.condition:
+                stmt.condition = self.layout_expression(stmt.condition)
+            if stmt.update:
+                stmt.update = self.layout_expression(stmt.update)
+            self.loops.append(stmt)
+            self.layout_statement(stmt.body)
+            self.loops.pop()
+            self.scopes.pop()
+
+    # Expressions
+
+    def layout_expression(self, expr):
+        """Annotate expr and its subtree, setting ctype on each node; return the node to use in its place"""
+        # A work list rather than recursion, so arbitrarily deep expressions lay out.
+        # Operands are laid out first and their replacements collected on `results`.
+        results = []
+        pending = [(expr, None)]
+        while pending:
+            expr, operands = pending.pop()
+            if operands is None:
+                operands = self.operands(expr)
+                pending.append((expr, operands))
+                pending.extend((operand, None) for operand in reversed(operands))
+                continue
+            if operands:
+                laid_out = results[-len(operands):]
+                del results[-len(operands):]
+                self.replace_operands(expr, laid_out)
+            results.append(self.layout_node(expr))
+        return results[0]
+
+    @staticmethod
+    def operands(expr) -> List:
+        """The subexpressions of expr that are laid out, in evaluation order"""
+        if isinstance(expr, BinaryExpression):
+            if expr.operator == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+                return [expr.left.left, expr.left.right, expr.right]
+            return [expr.left, expr.right]
+        if isinstance(expr, AssignmentExpression):
+            return [expr.left, expr.right]
+        if isinstance(expr, (UnaryExpression, CastExpression)):
+            return [expr.operand]
+        if isinstance(expr, FunctionCall):
+            return list(expr.arguments)
+        if isinstance(expr, ArrayAccess):
+            return [expr.array, expr.index]
+        if isinstance(expr, MemberAccess):
+            return [expr.object]
+        return []
+
+    @staticmethod
+    def replace_operands(expr, operands: List) -> None:
+        if isinstance(expr, BinaryExpression) and len(operands) == 3:
+            expr.left.left, expr.left.right, expr.right = operands
+        elif isinstance(expr, (BinaryExpression, AssignmentExpression)):
+            expr.left, expr.right = operands
+        elif isinstance(expr, (UnaryExpression, CastExpression)):
+            expr.operand, = operands
+        elif isinstance(expr, FunctionCall):
+            expr.arguments = operands
+        elif isinstance(expr, ArrayAccess):
+            expr.array, expr.index = operands
+        elif isinstance(expr, MemberAccess):
+            expr.object, = operands
+
+    def layout_node(self, expr):
+        """Annotate expr, whose operands are already laid out; return the node to use in its place"""
+        if isinstance(expr, Literal):
+            value = expr.value
+            expr.ctype = DOUBLE if isinstance(value, float) else STRING if isinstance(value, str) else INT
+        elif isinstance(expr, Identifier):
+            ctype, indirect = self.lookup(expr.name)
+            expr.ctype = ctype or INT   # undefined names fail when evaluated
+            if indirect:
+                self.uses_memory()
+                expr.ctype = PointerType(ctype)
+                deref = UnaryExpression('*', expr)
+                deref.ctype = ctype
+                return deref
+        elif isinstance(expr, SizeofExpression):
+            ctype = self.types.parse(expr.type_name)
+            if ctype.size == 0:
+                raise LayoutError(f"sizeof applied to incomplete type {ctype}")
+            literal = Literal(ctype.size)
+            literal.ctype = LONG
+            return literal
+        elif isinstance(expr, CastExpression):
+            expr.ctype = self.types.parse(expr.type_name)
+            if isinstance(expr.ctype, StructType):
+                raise LayoutError(f"Cast to {expr.ctype}")
+            expr.handler = cast_handler(expr.ctype)
+        elif isinstance(expr, BinaryExpression):
+            self.layout_binary(expr)
+        elif isinstance(expr, UnaryExpression):
+            self.layout_unary(expr)
+        elif isinstance(expr, AssignmentExpression):
+            self.layout_assignment(expr)
+        elif isinstance(expr, FunctionCall):
+            for arg in expr.arguments:
+                if isinstance(arg.ctype, StructType):
+                    raise LayoutError("Passing a struct by value; pass a pointer instead")
+            name = expr.function.name if isinstance(expr.function, Identifier) else None
+            if name in BUILTIN_FUNCTIONS:
+                self.uses_memory()
+            expr.ctype = self.return_types.get(name, INT)
+        elif isinstance(expr, ArrayAccess):
+            expr.ctype = self.pointee(expr.array.ctype, "Subscripted value")
+        elif isinstance(expr, MemberAccess):
+            struct = expr.object.ctype
+            if expr.is_arrow:
+                struct = self.pointee(struct, f"Left operand of ->{expr.member}")
+            if not isinstance(struct, StructType):
+                raise LayoutError(f"Member {expr.member} requested from a {struct}")
+            if expr.member not in struct.fields:
+                raise LayoutError(f"{struct} has no member {expr.member}")
+            expr.ctype, expr.offset = struct.fields[expr.member]
+            self.uses_memory()
+        else:
+            raise LayoutError(f"Unsupported expression: {type(expr).__name__}")
+        return expr
+
+    def pointee(self, ctype: CType, what: str) -> CType:
+        ctype = decay(ctype)
+        if not isinstance(ctype, PointerType):
+            raise LayoutError(f"{what} is not a pointer or array")
+        if ctype.target.size == 0:
+            raise LayoutError(f"Dereferencing a pointer to incomplete type {ctype.target}")
+        self.uses_memory()
+        return ctype.target
+
+    def layout_binary(self, expr: BinaryExpression) -> None:
+        if expr.operator == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+            question = expr.left
+            expr.ctype = question.ctype = decay(question.right.ctype)
+            return
+        left, right = decay(expr.left.ctype), decay(expr.right.ctype)
+        left_pointer, right_pointer = isinstance(left, PointerType), isinstance(right, PointerType)
+        if not (left_pointer or right_pointer):
+            if left.is_arithmetic and right.is_arithmetic and expr.operator not in ('&&', '||', '==', '!=', '<',
+                                                                                  '<=', '>', '>='):
+                expr.ctype = common_type(left, right)
+            else:
+                expr.ctype = INT
+            return
+        self.uses_memory()
+        if expr.operator == '-' and left_pointer and right_pointer:
+            size = left.target.size or 1
+            expr.handler = lambda a, b: (a - b) // size
+            expr.ctype = LONG
+        elif expr.operator in ('+', '-') and not right_pointer:
+            expr.handler = pointer_arithmetic(expr.operator, left.target.size, True)
+            expr.ctype = left
+        elif expr.operator == '+' and not left_pointer:
+            expr.handler = pointer_arithmetic('+', right.target.size, False)
+            expr.ctype = right
+        elif expr.operator in ('==', '!=', '<', '<=', '>', '>=', '&&', '||'):
+            expr.ctype = INT
+        else:
+            raise LayoutError(f"Invalid operands to {expr.operator}: {left} and {right}")
+
+    def layout_unary(self, expr: UnaryExpression) -> None:
+        op = expr.operator
+        operand = expr.operand
+        if op == '&':
+            if not isinstance(operand, (ArrayAccess, MemberAccess, UnaryExpression, Identifier)) or (
+                    isinstance(operand, UnaryExpression) and operand.operator != '*'):
+                raise LayoutError("Cannot take the address of an rvalue")
+            if isinstance(operand, Identifier) and not isinstance(operand.ctype, ArrayType):
+                raise LayoutError(f"Cannot take the address of {operand.name}")
+            self.uses_memory()
+            expr.ctype = PointerType(operand.ctype)
+        elif op == '*':
+            expr.ctype = self.pointee(operand.ctype, "Operand of unary *")
+        elif op in ('++', '--', '++_post', '--_post'):
+            ctype = operand.ctype
+            if isinstance(ctype, PointerType):
+                self.uses_memory()
+                step = ctype.target.size or 1
+                expr.handler = (lambda old: old + step) if op.startswith('++') else (lambda old: old - step)
+            elif not ctype.is_arithmetic:
+                raise LayoutError(f"Operand of {op} has type {ctype}")
+            expr.ctype = ctype
+        elif op == '!':
+            expr.ctype = INT
+        else:
+            expr.ctype = operand.ctype
+
+    def layout_assignment(self, expr: AssignmentExpression) -> None:
+        target = expr.left.ctype
+        if isinstance(target, ArrayType):
+            raise LayoutError("Assignment to an array")
+        if isinstance(target, StructType) and (expr.operator != '=' or expr.right.ctype is not target):
+            raise LayoutError(f"Invalid assignment to {target}")
+        if isinstance(target, PointerType) and expr.operator in ('+=', '-='):
+            self.uses_memory()
+            expr.handler = pointer_arithmetic(COMPOUND_OPS[expr.operator], target.target.size, True)
+        expr.ctype = target
+
+
+def iter_nodes_of(program: Program):
+    """Every node below the program's functions and global initializers"""
+    for decl in program.declarations:
+        if isinstance(decl, (FunctionDeclaration, VariableDeclaration)):
+            yield from iter_nodes(decl)
+
+
+def main():
+    source_code = """
+    struct node {
+        int value;
+        struct node *next;
+    };
+
+    int main() {
+        struct node *head = 0;
+        for (int i = 1; i <= 10; i++) {
+            struct node *n = malloc(sizeof(struct node));
+            n->value = i;
+            n->next = head;
+            head = n;
+        }
+        int sum = 0;
+        while (head) {
+            struct node *next = head->next;
+            sum += head->value;
+            free(head);
+            head = next;
+        }
+        return sum;
+    }
+    """
+    program = CParser(regex_lexer(source_code, skip_newlines=True)).parse()
+    layout = MemoryLayout()
+    layout.run(program)
+    for struct in layout.types.structs.values():
+        members = ", ".join(f"{name} {ctype} @{offset}" for name, (ctype, offset) in struct.fields.items())
+        print(f"{struct}: {struct.size} bytes, align {struct.align}: {members}")
+    print(f"functions using memory: {sorted(layout.memory_functions)}")
+
+if __name__ == "__main__":
+    main()
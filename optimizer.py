@@ -0,0 +1,714 @@
+import copy
+from typing import List, Optional
+
+from parser import *
+
+# Default size limit (AST nodes in the callee body) and rounds for the Inliner
+INLINE_BUDGET = 40
+INLINE_DEPTH = 3
+
+# Operators folded over integer constants. `/` and `%` are only folded when
+# both operands are non-negative, where truncating (C) and flooring
+# (engine) division agree, and never for a zero divisor.
+FOLD_OPS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a // b,
+    '%': lambda a, b: a % b,
+    '==': lambda a, b: 1 if a == b else 0,
+    '!=': lambda a, b: 1 if a != b else 0,
+    '<': lambda a, b: 1 if a < b else 0,
+    '<=': lambda a, b: 1 if a <= b else 0,
+    '>': lambda a, b: 1 if a > b else 0,
+    '>=': lambda a, b: 1 if a >= b else 0,
+    '&&': lambda a, b: 1 if a and b else 0,
+    '||': lambda a, b: 1 if a or b else 0,
+    '&': lambda a, b: a & b,
+    '|': lambda a, b: a | b,
+    '^': lambda a, b: a ^ b,
+    '<<': lambda a, b: a << b,
+    '>>': lambda a, b: a >> b,
+}
+
+FOLD_UNARY_OPS = {
+    '-': lambda a: -a,
+    '+': lambda a: a,
+    '!': lambda a: 0 if a else 1,
+    '~': lambda a: ~a,
+}
+
+# `x op identity` -> x (not `x / 1`: the engines floor, which would change a float x)
+RIGHT_IDENTITIES = {'+': 0, '-': 0, '*': 1, '|': 0, '^': 0, '<<': 0, '>>': 0}
+# `identity op x` -> x
+LEFT_IDENTITIES = {'+': 0, '*': 1, '|': 0, '^': 0}
+# `(x op c1) op c2` -> `x op (c1 op c2)`; exact because ints don't overflow here
+ASSOCIATIVE_OPS = {'+', '*', '&', '|', '^'}
+# `x op annihilator` and `annihilator op x` -> annihilator, when x has no side effects
+ANNIHILATORS = {'*': 0, '&': 0}
+# Typed programs wrap at their C types, so only int-sized constants fold there
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def is_constant(expr) -> bool:
+    """Integer literal (floats and strings are left to run time)"""
+    return isinstance(expr, Literal) and type(expr.value) is int
+
+
+def is_pure(expr) -> bool:
+    """True if evaluating expr has no side effects, so it may be dropped"""
+    if isinstance(expr, (Literal, Identifier)):
+        return True
+    if isinstance(expr, BinaryExpression):
+        return is_pure(expr.left) and is_pure(expr.right)
+    if isinstance(expr, UnaryExpression):
+        return expr.operator in FOLD_UNARY_OPS and is_pure(expr.operand)
+    if isinstance(expr, CastExpression):
+        return is_pure(expr.operand)
+    return False
+
+
+def is_ternary(expr) -> bool:
+    return (isinstance(expr, BinaryExpression) and expr.operator == ':'
+            and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?')
+
+
+class ConstantFolder:
+    """Folds constant subtrees and applies algebraic simplifications in place.
+
+    Counts what it did per run: `folded` nodes replaced by a literal,
+    `simplified` identity/annihilator rewrites and `branches` constant
+    conditions (if statements and ?:) replaced by the branch they select.
+
+    With typed, the program is about to run with C semantics: constants only
+    fold while they and the result fit an int, and neither `(x op c1) op c2`
+    regrouping nor annihilators apply, since a wider literal or an int 0 in
+    place of a float would change the expression's type.
+    """
+
+    def __init__(self, typed: bool = False) -> None:
+        self.typed = typed
+        self.folded = 0
+        self.simplified = 0
+        self.branches = 0
+
+    def run(self, program: Program) -> Program:
+        self.folded = self.simplified = self.branches = 0
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.fold_statement(decl.body)
+            elif isinstance(decl, VariableDeclaration) and decl.initializer:
+                decl.initializer = self.fold_expression(decl.initializer)
+        return program
+
+    def report(self) -> str:
+        return (f"constant folding: {self.folded} folded, {self.simplified} simplified, "
+                f"{self.branches} branches resolved")
+
+    # Statements
+
+    def fold_statement(self, stmt) -> Optional[Statement]:
+        """Fold stmt in place; returns its replacement (None if it disappears)"""
+        if isinstance(stmt, CompoundStatement):
+            statements = []
+            for child in stmt.statements:
+                child = self.fold_statement(child)
+                if child is not None:
+                    statements.append(child)
+            stmt.statements = statements
+        elif isinstance(stmt, (ExpressionStatement, ReturnStatement)):
+            if stmt.expression:
+                stmt.expression = self.fold_expression(stmt.expression)
+        elif isinstance(stmt, VariableDeclaration):
+            if stmt.size:
+                stmt.size = self.fold_expression(stmt.size)
+            if stmt.initializer:
+                stmt.initializer = self.fold_expression(stmt.initializer)
+        elif isinstance(stmt, IfStatement):
+            stmt.condition = self.fold_expression(stmt.condition)
+            if is_constant(stmt.condition):
+                self.branches += 1
+                taken = stmt.then_stmt if stmt.condition.value else stmt.else_stmt
+                return self.fold_statement(self.as_block(taken)) if taken else None
+            stmt.then_stmt = self.fold_statement(stmt.then_stmt) or CompoundStatement([])
+            if stmt.else_stmt:
+                stmt.else_stmt = self.fold_statement(stmt.else_stmt)
+        elif isinstance(stmt, WhileStatement):
+            stmt.condition = self.fold_expression(stmt.condition)
+            stmt.body = self.fold_statement(stmt.body) or CompoundStatement([])
+        elif isinstance(stmt, ForStatement):
+            if stmt.init:
+                stmt.init = self.fold_statement(stmt.init)
+            if stmt.condition:
+                stmt.condition = self.fold_expression(stmt.condition)
+            if stmt.update:
+                stmt.update = self.fold_expression(stmt.update)
+            stmt.body = self.fold_statement(stmt.body) or CompoundStatement([])
+        return stmt
+
+    def as_block(self, stmt) -> Statement:
+        """A branch promoted out of an if keeps its own scope"""
+        return stmt if isinstance(stmt, CompoundStatement) else CompoundStatement([stmt])
+
+    # Expressions
+
+    def fold_expression(self, expr):
+        if isinstance(expr, BinaryExpression):
+            if is_ternary(expr):
+                return self.fold_ternary(expr)
+            expr.left = self.fold_expression(expr.left)
+            # && and || never evaluate their right operand when the left decides
+            if expr.operator in ('&&', '||') and is_constant(expr.left):
+                if bool(expr.left.value) == (expr.operator == '||'):
+                    self.folded += 1
+                    return Literal(1 if expr.operator == '||' else 0)
+            expr.right = self.fold_expression(expr.right)
+            return self.fold_binary(expr)
+        elif isinstance(expr, UnaryExpression):
+            expr.operand = self.fold_expression(expr.operand)
+            if expr.operator in FOLD_UNARY_OPS and is_constant(expr.operand):
+                value = FOLD_UNARY_OPS[expr.operator](expr.operand.value)
+                if self.fits(expr.operand.value, value):
+                    self.folded += 1
+                    return Literal(value)
+        elif isinstance(expr, AssignmentExpression):
+            expr.right = self.fold_expression(expr.right)
+        elif isinstance(expr, FunctionCall):
+            expr.arguments = [self.fold_expression(arg) for arg in expr.arguments]
+        elif isinstance(expr, ArrayAccess):
+            expr.array = self.fold_expression(expr.array)
+            expr.index = self.fold_expression(expr.index)
+        elif isinstance(expr, MemberAccess):
+            expr.object = self.fold_expression(expr.object)
+        return expr
+
+    def fold_ternary(self, expr: BinaryExpression):
+        question = expr.left
+        question.left = self.fold_expression(question.left)
+        question.right = self.fold_expression(question.right)
+        expr.right = self.fold_expression(expr.right)
+        if is_constant(question.left):
+            self.branches += 1
+            return question.right if question.left.value else expr.right
+        return expr
+
+    def fold_binary(self, expr: BinaryExpression):
+        op, left, right = expr.operator, expr.left, expr.right
+        if is_constant(left) and is_constant(right) and op in FOLD_OPS and self.foldable(op, left.value, right.value):
+            value = FOLD_OPS[op](left.value, right.value)
+            if self.fits(left.value, right.value, value):
+                self.folded += 1
+                return Literal(value)
+        if (op in ASSOCIATIVE_OPS and not self.typed and is_constant(right) and isinstance(left, BinaryExpression)
+                and left.operator == op and is_constant(left.right)):
+            self.folded += 1
+            left.right = Literal(FOLD_OPS[op](left.right.value, right.value))
+            return self.fold_binary(left)
+
+        if is_constant(right) and RIGHT_IDENTITIES.get(op) == right.value:
+            self.simplified += 1
+            return left
+        if is_constant(left) and LEFT_IDENTITIES.get(op) == left.value:
+            self.simplified += 1
+            return right
+        if op in ANNIHILATORS and not self.typed:
+            zero = ANNIHILATORS[op]
+            if is_constant(right) and right.value == zero and is_pure(left):
+                self.simplified += 1
+                return right
+            if is_constant(left) and left.value == zero and is_pure(right):
+                self.simplified += 1
+                return left
+        return expr
+
+    def fits(self, *values: int) -> bool:
+        return not self.typed or all(INT_MIN <= value <= INT_MAX for value in values)
+
+    def foldable(self, op: str, a: int, b: int) -> bool:
+        if op in ('/', '%'):
+            return b > 0 and a >= 0
+        if op in ('<<', '>>'):
+            return 0 <= b < 64
+        return True
+
+
+def children(node) -> list:
+    """Direct child nodes of node, in evaluation order"""
+    if isinstance(node, CompoundStatement):
+        return list(node.statements)
+    if isinstance(node, FunctionDeclaration):
+        return [node.body]
+    if isinstance(node, VariableDeclaration):
+        return [n for n in (node.size, node.initializer) if n]
+    if isinstance(node, (ExpressionStatement, ReturnStatement)):
+        return [node.expression] if node.expression else []
+    if isinstance(node, IfStatement):
+        return [n for n in (node.condition, node.then_stmt, node.else_stmt) if n]
+    if isinstance(node, WhileStatement):
+        return [node.condition, node.body]
+    if isinstance(node, ForStatement):
+        return [n for n in (node.init, node.condition, node.update, node.body) if n]
+    if isinstance(node, (BinaryExpression, AssignmentExpression)):
+        return [node.left, node.right]
+    if isinstance(node, (UnaryExpression, CastExpression)):
+        return [node.operand]
+    if isinstance(node, FunctionCall):
+        return [node.function, *node.arguments]
+    if isinstance(node, ArrayAccess):
+        return [node.array, node.index]
+    if isinstance(node, MemberAccess):
+        return [node.object]
+    return []
+
+
+def iter_nodes(node):
+    """node and every node below it"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(children(node)))
+
+
+def called_functions(node) -> set:
+    return {n.function.name for n in iter_nodes(node)
+            if isinstance(n, FunctionCall) and isinstance(n.function, Identifier)}
+
+
+class DeadCodeEliminator:
+    """Removes code that can never run or whose result is never used.
+
+    - statements following a return, break or continue (or an if whose
+      branches all end in one) in the same block, and `while (0)` loops;
+    - functions not reachable in the call graph rooted at main (and at
+      global initializers). Nothing is removed if there is no main;
+    - locals that are never read. Their declarations and the statement
+      level assignments to them go, keeping any initializer or assigned
+      value that has side effects as an expression statement.
+    """
+
+    def __init__(self) -> None:
+        self.functions = 0
+        self.statements = 0
+        self.locals = 0
+
+    def run(self, program: Program) -> Program:
+        self.functions = self.statements = self.locals = 0
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.prune_statement(decl.body)
+        self.remove_uncalled(program)
+        global_names = {decl.name for decl in program.declarations if isinstance(decl, VariableDeclaration)}
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.remove_unread_locals(decl, global_names)
+        return program
+
+    def report(self) -> str:
+        return (f"dead code: {self.functions} functions, {self.statements} unreachable statements, "
+                f"{self.locals} unused locals removed")
+
+    # Unreachable statements
+
+    def prune_statement(self, stmt):
+        if isinstance(stmt, CompoundStatement):
+            statements = []
+            for i, child in enumerate(stmt.statements):
+                if self.is_dead_loop(child):
+                    self.statements += 1
+                    continue
+                self.prune_statement(child)
+                statements.append(child)
+                if self.terminates(child):
+                    self.statements += len(stmt.statements) - i - 1
+                    break
+            stmt.statements = statements
+        elif isinstance(stmt, IfStatement):
+            self.prune_statement(stmt.then_stmt)
+            if stmt.else_stmt:
+                self.prune_statement(stmt.else_stmt)
+        elif isinstance(stmt, (WhileStatement, ForStatement)):
+            self.prune_statement(stmt.body)
+
+    def is_dead_loop(self, stmt) -> bool:
+        return isinstance(stmt, WhileStatement) and is_constant(stmt.condition) and not stmt.condition.value
+
+    def terminates(self, stmt) -> bool:
+        """True if control never falls out of the end of stmt"""
+        if isinstance(stmt, (ReturnStatement, BreakStatement, ContinueStatement)):
+            return True
+        if isinstance(stmt, CompoundStatement):
+            return bool(stmt.statements) and self.terminates(stmt.statements[-1])
+        if isinstance(stmt, IfStatement):
+            return stmt.else_stmt is not None and self.terminates(stmt.then_stmt) and self.terminates(stmt.else_stmt)
+        return False
+
+    # Call graph
+
+    def remove_uncalled(self, program: Program):
+        functions = {decl.name: decl for decl in program.declarations if isinstance(decl, FunctionDeclaration)}
+        if 'main' not in functions:
+            return
+        live = set()
+        pending = ['main']
+        for decl in program.declarations:
+            if isinstance(decl, VariableDeclaration) and decl.initializer:
+                pending.extend(called_functions(decl.initializer))
+        while pending:
+            name = pending.pop()
+            if name in live or name not in functions:
+                continue
+            live.add(name)
+            pending.extend(called_functions(functions[name].body))
+
+        declarations = []
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration) and decl.name not in live:
+                self.functions += 1
+            else:
+                declarations.append(decl)
+        program.declarations = declarations
+
+    # Unread locals
+
+    def remove_unread_locals(self, func: FunctionDeclaration, global_names: set):
+        """Repeat until nothing changes: dropping one local can leave another unread"""
+        while True:
+            dead = self.unread_locals(func, global_names)
+            if not dead:
+                return
+            self.locals += len(dead)
+            self.drop_locals(func.body, dead)
+
+    def unread_locals(self, func: FunctionDeclaration, global_names: set) -> set:
+        declared = {}
+        for node in iter_nodes(func.body):
+            if isinstance(node, VariableDeclaration):
+                declared[node.name] = declared.get(node.name, 0) + 1
+        # Only names declared once and shadowing no parameter or global are
+        # considered, so every use of the name refers to that one local
+        candidates = {name for name, count in declared.items() if count == 1}
+        candidates -= {param.name for param in func.parameters}
+        candidates -= global_names
+
+        stores = set()
+        for node in iter_nodes(func.body):
+            if isinstance(node, ExpressionStatement) and self.dead_store_target(node) in candidates:
+                stores.add(id(node.expression.left))
+        for node in iter_nodes(func.body):
+            if isinstance(node, Identifier) and node.name in candidates and id(node) not in stores:
+                candidates.discard(node.name)
+        return candidates
+
+    def dead_store_target(self, stmt: ExpressionStatement) -> Optional[str]:
+        """Name assigned by a statement of the form `name = value;`"""
+        expr = stmt.expression
+        if isinstance(expr, AssignmentExpression) and expr.operator == '=' and isinstance(expr.left, Identifier):
+            return expr.left.name
+        return None
+
+    def drop_locals(self, stmt, dead: set):
+        if isinstance(stmt, CompoundStatement):
+            statements = []
+            for child in stmt.statements:
+                if isinstance(child, VariableDeclaration) and child.name in dead:
+                    child = self.side_effects(child.initializer or child.size)
+                elif isinstance(child, ExpressionStatement) and self.dead_store_target(child) in dead:
+                    child = self.side_effects(child.expression.right)
+                if child is not None:
+                    self.drop_locals(child, dead)
+                    statements.append(child)
+            stmt.statements = statements
+        elif isinstance(stmt, IfStatement):
+            stmt.then_stmt = self.drop_single(stmt.then_stmt, dead)
+            if stmt.else_stmt:
+                stmt.else_stmt = self.drop_single(stmt.else_stmt, dead)
+        elif isinstance(stmt, (WhileStatement, ForStatement)):
+            stmt.body = self.drop_single(stmt.body, dead)
+            if isinstance(stmt, ForStatement) and stmt.init is not None:
+                stmt.init = self.drop_single(stmt.init, dead)
+                if isinstance(stmt.init, CompoundStatement) and not stmt.init.statements:
+                    stmt.init = None
+
+    def side_effects(self, expr) -> Optional[Statement]:
+        """What remains of a removed store: its value, if computing it does anything"""
+        if expr is None or is_pure(expr):
+            return None
+        return ExpressionStatement(expr)
+
+    def drop_single(self, stmt, dead: set):
+        """drop_locals for a statement that isn't in a block"""
+        block = CompoundStatement([stmt])
+        self.drop_locals(block, dead)
+        if len(block.statements) == 1:
+            return block.statements[0]
+        return block if block.statements else CompoundStatement([])
+
+
+class Inliner:
+    """Replaces calls to small, non-recursive functions with a copy of the callee.
+
+    A callee qualifies if its body has at most `budget` nodes, it cannot
+    reach itself through the call graph, and its only return (if any) is
+    the body's last statement. Two forms are used:
+
+    - a body that is just `return expr;` with side-effect free expr is
+      substituted into the calling expression, parameters replaced by the
+      arguments, when every argument is a literal or a variable;
+    - otherwise a call forming a whole statement (`f(..);`, `x = f(..);`,
+      `int x = f(..);` or `return f(..);`) is replaced by a block that
+      binds the arguments to fresh locals, runs the body and delivers the
+      returned value to the caller.
+
+    Parameters and locals of the copy are renamed `__inl<n>_<name>`. A call
+    is left alone if the callee reads a global that the caller shadows with
+    a local of the same name. Calls exposed by inlining are considered
+    again, up to `max_depth` rounds.
+
+    With typed, substituted arguments and returned values are wrapped in
+    casts to the parameter and return types, keeping the conversions the
+    call would have made.
+    """
+
+    def __init__(self, budget: int = INLINE_BUDGET, max_depth: int = INLINE_DEPTH, typed: bool = False) -> None:
+        self.budget = budget
+        self.max_depth = max_depth
+        self.typed = typed
+        self.functions = {}
+        self.candidates = {}
+        self.caller_names = set()
+        self.copies = 0
+        self.expressions = 0
+        self.statements = 0
+
+    def run(self, program: Program) -> Program:
+        self.copies = self.expressions = self.statements = 0
+        self.functions = {decl.name: decl for decl in program.declarations if isinstance(decl, FunctionDeclaration)}
+        for _ in range(self.max_depth):
+            # Candidates are rechecked and copied each round: bodies are rewritten in place,
+            # and a block inlined into a candidate may hold a return that is no longer last
+            self.candidates = self.find_candidates()
+            inlined = self.expressions + self.statements
+            for func in self.functions.values():
+                self.caller_names = {param.name for param in func.parameters}
+                self.caller_names.update(node.name for node in iter_nodes(func.body) if isinstance(node, VariableDeclaration))
+                func.body = self.inline_statement(func.body)
+            if self.expressions + self.statements == inlined:
+                break
+        return program
+
+    def report(self) -> str:
+        return (f"inlining: {self.expressions + self.statements} calls inlined "
+                f"({self.expressions} as expressions, {self.statements} as blocks)")
+
+    def find_candidates(self) -> dict:
+        calls = {name: called_functions(func.body) for name, func in self.functions.items()}
+        candidates = {}
+        for name, func in self.functions.items():
+            if name == 'main' or sum(1 for _ in iter_nodes(func.body)) > self.budget:
+                continue
+            if self.reaches(name, name, calls) or not self.single_exit(func.body):
+                continue
+            candidates[name] = copy.deepcopy(func)
+        return candidates
+
+    def reaches(self, start: str, target: str, calls: dict) -> bool:
+        seen = set()
+        pending = list(calls[start])
+        while pending:
+            name = pending.pop()
+            if name == target:
+                return True
+            if name in seen or name not in calls:
+                continue
+            seen.add(name)
+            pending.extend(calls[name])
+        return False
+
+    def single_exit(self, body: CompoundStatement) -> bool:
+        returns = [node for node in iter_nodes(body) if isinstance(node, ReturnStatement)]
+        if not returns:
+            return True
+        return len(returns) == 1 and bool(body.statements) and body.statements[-1] is returns[0]
+
+    def callee_for(self, expr):
+        """The candidate called by expr, if expr is an inlinable call"""
+        if not isinstance(expr, FunctionCall) or not isinstance(expr.function, Identifier):
+            return None
+        callee = self.candidates.get(expr.function.name)
+        if callee is None or len(callee.parameters) != len(expr.arguments):
+            return None
+        # A global the callee reads must not be captured by a caller local
+        declared = {param.name for param in callee.parameters}
+        declared.update(node.name for node in iter_nodes(callee.body) if isinstance(node, VariableDeclaration))
+        for node in iter_nodes(callee.body):
+            if isinstance(node, Identifier) and node.name not in declared and node.name in self.caller_names:
+                return None
+        return callee
+
+    # Statement-level inlining
+
+    def inline_statement(self, stmt):
+        if isinstance(stmt, CompoundStatement):
+            statements = []
+            for child in stmt.statements:
+                statements.extend(self.inline_block_statement(child))
+            stmt.statements = statements
+        elif isinstance(stmt, (ExpressionStatement, ReturnStatement)):
+            if stmt.expression:
+                stmt.expression = self.inline_expression(stmt.expression)
+        elif isinstance(stmt, VariableDeclaration):
+            if stmt.size:
+                stmt.size = self.inline_expression(stmt.size)
+            if stmt.initializer:
+                stmt.initializer = self.inline_expression(stmt.initializer)
+        elif isinstance(stmt, IfStatement):
+            stmt.condition = self.inline_expression(stmt.condition)
+            stmt.then_stmt = self.inline_statement(stmt.then_stmt)
+            if stmt.else_stmt:
+                stmt.else_stmt = self.inline_statement(stmt.else_stmt)
+        elif isinstance(stmt, WhileStatement):
+            stmt.condition = self.inline_expression(stmt.condition)
+            stmt.body = self.inline_statement(stmt.body)
+        elif isinstance(stmt, ForStatement):
+            if stmt.init:
+                stmt.init = self.inline_statement(stmt.init)
+            if stmt.condition:
+                stmt.condition = self.inline_expression(stmt.condition)
+            if stmt.update:
+                stmt.update = self.inline_expression(stmt.update)
+            stmt.body = self.inline_statement(stmt.body)
+        return stmt
+
+    def inline_block_statement(self, stmt) -> List[Statement]:
+        """Inline stmt as a member of a block, where it may expand to several statements"""
+        call, deliver = None, None
+        if isinstance(stmt, ExpressionStatement) and stmt.expression is not None:
+            expr = stmt.expression
+            if isinstance(expr, AssignmentExpression) and expr.operator == '=' and isinstance(expr.left, Identifier):
+                call, deliver = expr.right, lambda value: ExpressionStatement(AssignmentExpression(expr.left, '=', value))
+            else:
+                call, deliver = expr, lambda value: None if is_pure(value) else ExpressionStatement(value)
+        elif isinstance(stmt, ReturnStatement) and stmt.expression is not None:
+            call, deliver = stmt.expression, ReturnStatement
+        elif isinstance(stmt, VariableDeclaration) and stmt.initializer is not None:
+            if not any(isinstance(node, Identifier) and node.name == stmt.name for node in iter_nodes(stmt.initializer)):
+                call = stmt.initializer
+                deliver = lambda value: ExpressionStatement(AssignmentExpression(Identifier(stmt.name), '=', value))
+
+        callee = self.callee_for(call) if call is not None else None
+        if callee is None or self.substitutable(call, callee):
+            return [self.inline_statement(stmt)]
+
+        block = self.expand(call, callee, deliver)
+        self.statements += 1
+        if isinstance(stmt, VariableDeclaration):
+            stmt.initializer = None
+            return [stmt, block]
+        return [block]
+
+    def expand(self, call: FunctionCall, callee: FunctionDeclaration, deliver) -> CompoundStatement:
+        """Block running a renamed copy of callee with call's arguments"""
+        self.copies += 1
+        prefix = f"__inl{self.copies}_"
+        body = copy.deepcopy(callee.body)
+        renamed = {param.name for param in callee.parameters}
+        renamed.update(node.name for node in iter_nodes(body) if isinstance(node, VariableDeclaration))
+        for node in iter_nodes(body):
+            if isinstance(node, (Identifier, VariableDeclaration)) and node.name in renamed:
+                node.name = prefix + node.name
+
+        statements = [VariableDeclaration(param.type_name, prefix + param.name, self.inline_expression(arg))
+                      for param, arg in zip(callee.parameters, call.arguments)]
+        statements.extend(body.statements)
+        value = Literal(0)
+        if statements and isinstance(statements[-1], ReturnStatement):
+            returned = statements.pop().expression
+            if returned:
+                value = self.convert(returned, callee.return_type)
+        delivered = deliver(value)
+        if delivered is not None:
+            statements.append(delivered)
+        return CompoundStatement(statements)
+
+    # Expression substitution
+
+    def substitutable(self, call: FunctionCall, callee: FunctionDeclaration) -> bool:
+        statements = callee.body.statements
+        return (len(statements) == 1 and isinstance(statements[0], ReturnStatement)
+                and statements[0].expression is not None and is_pure(statements[0].expression)
+                and all(isinstance(arg, (Literal, Identifier)) for arg in call.arguments))
+
+    def inline_expression(self, expr):
+        if isinstance(expr, (BinaryExpression, AssignmentExpression)):
+            expr.left = self.inline_expression(expr.left)
+            expr.right = self.inline_expression(expr.right)
+        elif isinstance(expr, UnaryExpression):
+            expr.operand = self.inline_expression(expr.operand)
+        elif isinstance(expr, FunctionCall):
+            expr.arguments = [self.inline_expression(arg) for arg in expr.arguments]
+            callee = self.callee_for(expr)
+            if callee is not None and self.substitutable(expr, callee):
+                self.expressions += 1
+                return self.substitute(callee, expr.arguments)
+        elif isinstance(expr, ArrayAccess):
+            expr.array = self.inline_expression(expr.array)
+            expr.index = self.inline_expression(expr.index)
+        elif isinstance(expr, MemberAccess):
+            expr.object = self.inline_expression(expr.object)
+        return expr
+
+    def substitute(self, callee: FunctionDeclaration, arguments: list):
+        bindings = {param.name: self.convert(arg, param.type_name) for param, arg in zip(callee.parameters, arguments)}
+        body = copy.deepcopy(callee.body.statements[0].expression)
+        if isinstance(body, Identifier) and body.name in bindings:
+            return self.convert(copy.deepcopy(bindings[body.name]), callee.return_type)
+        for node in list(iter_nodes(body)):
+            for field in ('left', 'right', 'operand'):
+                child = getattr(node, field, None)
+                if isinstance(child, Identifier) and child.name in bindings:
+                    setattr(node, field, copy.deepcopy(bindings[child.name]))
+        return self.convert(body, callee.return_type)
+
+    def convert(self, expr, type_name: str):
+        return CastExpression(type_name, expr) if self.typed else expr
+
+
+def optimize(program: Program, inline_budget: int = INLINE_BUDGET, inline_depth: int = INLINE_DEPTH,
+             typed: bool = False) -> List[str]:
+    """Run the optimisation passes over program in place; return one report line per pass.
+    typed keeps the rewrites exact under C semantics, for programs run with typed=True"""
+    passes = [Inliner(inline_budget, inline_depth, typed), ConstantFolder(typed), DeadCodeEliminator()]
+    for optimization in passes:
+        optimization.run(program)
+    return [optimization.report() for optimization in passes]
+
+
+def main():
+    source_code = """
+    int seconds(int hours) {
+        return hours * 60 * 60 + 0;
+    }
+
+    int minutes(int hours) {
+        return hours * 60;
+    }
+
+    int main() {
+        int day = 24 * 60 * 60;
+        int unused = seconds(1);
+        if (day > 80000) {
+            return seconds(2) * 1 - day / 1000;
+        } else {
+            return 0;
+        }
+        return minutes(day);
+    }
+    """
+
+    program = CParser(regex_lexer(source_code, skip_newlines=True)).parse()
+    for line in optimize(program):
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -4,56 +4,87 @@ from typing import List, Optional, Union
 
 # AST Node Classes
 class ASTNode:
-    pass
+    __slots__ = ()
 
 class Program(ASTNode):
+    __slots__ = ('declarations', 'global_count')
+
     def __init__(self):
         self.declarations: List[ASTNode] = []
+        self.global_count = 0  # set by the resolver
 
 class Declaration(ASTNode):
-    pass
+    __slots__ = ()
 
 class FunctionDeclaration(Declaration):
+    __slots__ = ('return_type', 'name', 'parameters', 'body', 'frame_size')
+
     def __init__(self, return_type: str, name: str, parameters: List, body: 'CompoundStatement'):
         self.return_type = return_type
         self.name = name
         self.parameters = parameters
         self.body = body
+        self.frame_size = 0  # set by the resolver
 
 class VariableDeclaration(Declaration):
-    def __init__(self, type_name: str, name: str, initializer=None):
+    __slots__ = ('type_name', 'name', 'initializer', 'size', 'slot', 'is_global', 'ctype')
+
+    def __init__(self, type_name: str, name: str, initializer=None, size=None):
         self.type_name = type_name
         self.name = name
         self.initializer = initializer
+        self.size = size  # element count expression of an array, else None
+        self.slot = None  # set by the resolver
+        self.is_global = False
+        self.ctype = None  # set by MemoryLayout for variables that live in memory
+
+class StructDeclaration(Declaration):
+    __slots__ = ('name', 'members')
+
+    def __init__(self, name: str, members: List[VariableDeclaration]):
+        self.name = name
+        self.members = members
 
 class Parameter(ASTNode):
+    __slots__ = ('type_name', 'name')
+
     def __init__(self, type_name: str, name: str):
         self.type_name = type_name
         self.name = name
 
 class Statement(ASTNode):
-    pass
+    __slots__ = ()
 
 class CompoundStatement(Statement):
+    __slots__ = ('statements',)
+
     def __init__(self, statements: List[Statement]):
         self.statements = statements
 
 class ExpressionStatement(Statement):
+    __slots__ = ('expression',)
+
     def __init__(self, expression: Optional['Expression']):
         self.expression = expression
 
 class IfStatement(Statement):
+    __slots__ = ('condition', 'then_stmt', 'else_stmt')
+
     def __init__(self, condition: 'Expression', then_stmt: Statement, else_stmt: Optional[Statement] = None):
         self.condition = condition
         self.then_stmt = then_stmt
         self.else_stmt = else_stmt
 
 class WhileStatement(Statement):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition: 'Expression', body: Statement):
         self.condition = condition
         self.body = body
 
 class ForStatement(Statement):
+    __slots__ = ('init', 'condition', 'update', 'body')
+
     def __init__(self, init: Optional[Statement], condition: Optional['Expression'], 
                  update: Optional['Expression'], body: Statement):
         self.init = init
@@ -62,71 +93,177 @@ class ForStatement(Statement):
         self.body = body
 
 class ReturnStatement(Statement):
+    __slots__ = ('expression',)
+
     def __init__(self, expression: Optional['Expression'] = None):
         self.expression = expression
 
 class BreakStatement(Statement):
-    pass
+    __slots__ = ()
 
 class ContinueStatement(Statement):
-    pass
+    __slots__ = ()
 
 class Expression(ASTNode):
-    pass
+    # Set by semantic analysis (semantic.py): the C type of the value and the
+    # precomputed operation that produces it; None on an unanalysed tree
+    __slots__ = ('ctype', 'handler')
 
 class BinaryExpression(Expression):
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, left: Expression, operator: str, right: Expression):
         self.left = left
         self.operator = operator
         self.right = right
+        self.ctype = None
+        self.handler = None
 
 class UnaryExpression(Expression):
+    __slots__ = ('operator', 'operand')
+
     def __init__(self, operator: str, operand: Expression):
         self.operator = operator
         self.operand = operand
+        self.ctype = None
+        self.handler = None
 
 class AssignmentExpression(Expression):
+    __slots__ = ('left', 'operator', 'right')
+
     def __init__(self, left: Expression, operator: str, right: Expression):
         self.left = left
         self.operator = operator
         self.right = right
+        self.ctype = None
+        self.handler = None
 
 class FunctionCall(Expression):
+    __slots__ = ('function', 'arguments')
+
     def __init__(self, function: Expression, arguments: List[Expression]):
         self.function = function
         self.arguments = arguments
+        self.ctype = None
+        self.handler = None
 
 class Identifier(Expression):
+    __slots__ = ('name', 'slot', 'is_global')
+
     def __init__(self, name: str):
         self.name = name
+        self.slot = None  # set by the resolver; None if the name is undeclared
+        self.is_global = False
+        self.ctype = None
+        self.handler = None
 
 class Literal(Expression):
+    __slots__ = ('value',)
+
     def __init__(self, value: Union[int, float, str]):
         self.value = value
+        self.ctype = None
+        self.handler = None
 
 class ArrayAccess(Expression):
+    __slots__ = ('array', 'index')
+
     def __init__(self, array: Expression, index: Expression):
         self.array = array
         self.index = index
+        self.ctype = None
+        self.handler = None
 
 class MemberAccess(Expression):
+    __slots__ = ('object', 'member', 'is_arrow', 'offset')
+
     def __init__(self, object_expr: Expression, member: str, is_arrow: bool = False):
         self.object = object_expr
         self.member = member
         self.is_arrow = is_arrow
+        self.offset = None  # set by MemoryLayout: the member's byte offset in its struct
+        self.ctype = None
+        self.handler = None
+
+class CastExpression(Expression):
+    """Conversion of operand to type_name; semantic analysis inserts these for implicit conversions"""
+    __slots__ = ('type_name', 'operand')
+
+    def __init__(self, type_name: str, operand: Expression):
+        self.type_name = type_name
+        self.operand = operand
+        self.ctype = None
+        self.handler = None
+
+class SizeofExpression(Expression):
+    __slots__ = ('type_name',)
+
+    def __init__(self, type_name: str):
+        self.type_name = type_name
+        self.ctype = None
+        self.handler = None
+
+# Binding powers for the precedence-climbing expression engine, loosest first
+ASSIGNMENT_PRECEDENCE = 1
+TERNARY_PRECEDENCE = 2
+
+BINARY_PRECEDENCE = {
+    TokenType.EQ: ASSIGNMENT_PRECEDENCE, TokenType.PLUSEQ: ASSIGNMENT_PRECEDENCE,
+    TokenType.MINUSEQ: ASSIGNMENT_PRECEDENCE, TokenType.MULEQ: ASSIGNMENT_PRECEDENCE,
+    TokenType.DIVEQ: ASSIGNMENT_PRECEDENCE, TokenType.MODEQ: ASSIGNMENT_PRECEDENCE,
+    TokenType.QUESTION: TERNARY_PRECEDENCE,
+    TokenType.OR: 3,
+    TokenType.AND: 4,
+    TokenType.BITOR: 5,
+    TokenType.BITXOR: 6,
+    TokenType.BITAND: 7,
+    TokenType.EQEQ: 8, TokenType.NOTEQ: 8,
+    TokenType.LT: 9, TokenType.LTEQ: 9, TokenType.GT: 9, TokenType.GTEQ: 9,
+    TokenType.LSHIFT: 10, TokenType.RSHIFT: 10,
+    TokenType.PLUS: 11, TokenType.MINUS: 11,
+    TokenType.ASTERISK: 12, TokenType.SLASH: 12, TokenType.PERCENT: 12,
+}
+
+PREFIX_OPERATORS = {TokenType.PLUS, TokenType.MINUS, TokenType.NOT, TokenType.BITNOT,
+                    TokenType.INCR, TokenType.DECR, TokenType.ASTERISK, TokenType.BITAND}
+
+TYPE_TOKENS = {
+    TokenType.VOID, TokenType.CHAR, TokenType.SHORT, TokenType.INT,
+    TokenType.LONG, TokenType.FLOAT, TokenType.DOUBLE, TokenType.SIGNED,
+    TokenType.UNSIGNED, TokenType.STRUCT, TokenType.UNION, TokenType.ENUM
+}
+TAGGED_TYPE_TOKENS = {TokenType.STRUCT, TokenType.UNION, TokenType.ENUM}
+
+# Pending work of the explicit-stack expression engine (parse_expression_stack)
+PENDING_BINARY = 0      # (kind, left, operator token, enclosing min precedence)
+PENDING_THEN = 1        # (kind, condition, enclosing min precedence)
+PENDING_ELSE = 2        # (kind, condition, then_expr, enclosing min precedence)
+PENDING_PAREN = 3       # (kind, prefix operators, enclosing min precedence)
+PENDING_ARGUMENT = 4    # (kind, callee, arguments so far, prefix operators, enclosing min precedence)
+PENDING_INDEX = 5       # (kind, array, prefix operators, enclosing min precedence)
 
 # C Parser Class
 class CParser:
-    def __init__(self, lexer):
+    EXPRESSION_ENGINES = ('recursive', 'pratt', 'stack')
+    
+    def __init__(self, lexer, expression_engine: str = 'recursive'):
+        """expression_engine is 'recursive' (one method per precedence level), 'pratt'
+        or 'stack' (no host recursion, for arbitrarily deep nesting)"""
+        if expression_engine not in self.EXPRESSION_ENGINES:
+            raise ValueError(f"Unknown expression engine: {expression_engine}")
+        if not hasattr(lexer, 'peek'):
+            lexer = TokenStream(lexer)
         self.lexer = lexer
+        self.expression_engine = expression_engine
         self.current_token = None
         self.advance()
     
     def advance(self):
-        try:
-            self.current_token = self.lexer.get_token()
-        except SystemExit:
-            self.current_token = Token("EOF", TokenType.EOF)
+        self.current_token = self.lexer.get_token()
+    
+    def peek(self, n: int = 1) -> Token:
+        """Look n tokens past current_token without consuming anything"""
+        return self.lexer.peek(n)
     
     def eat(self, expected_type):
         if self.current_token.type == expected_type:
@@ -136,6 +273,11 @@ class CParser:
     
     def abort(self, message):
         """Abort parsing with error message"""
+        location = getattr(self.lexer, 'location', None)
+        where = location(self.current_token.pos) if location and self.current_token.pos >= 0 else None
+        if where is not None:
+            line, column = where
+            sys.exit(f"Parse Error at line {line}, column {column}: {message}")
         sys.exit(f"Parse Error: {message}")
     
     def parse(self) -> Program:
@@ -159,8 +301,14 @@ class CParser:
         if not self.is_type():
             self.abort(f"Expected type specifier, got {self.current_token.type}")
         
-        type_name = self.current_token.val
-        self.advance()
+        type_name = self.parse_type_name()
+        
+        if type_name.startswith("struct ") and self.current_token.type == TokenType.LBRACE:
+            return self.parse_struct_declaration(type_name[len("struct "):])
+        if type_name.startswith("struct ") and self.current_token.type == TokenType.SEMICOLON:
+            # Forward declaration: a tag is known from its first mention anyway
+            self.advance()
+            return None
         
         if self.current_token.type != TokenType.IDENT:
             self.abort("Expected identifier")
@@ -173,6 +321,26 @@ class CParser:
         else:
             return self.parse_variable_declaration(type_name, name)
     
+    def parse_struct_declaration(self, name: str) -> StructDeclaration:
+        """Parse the member list of `struct name { ... };`"""
+        self.eat(TokenType.LBRACE)
+        members = []
+        while self.current_token.type != TokenType.RBRACE:
+            if self.current_token.type == TokenType.NEWLINE:
+                self.advance()
+                continue
+            if not self.is_type():
+                self.abort("Expected member type")
+            member_type = self.parse_type_name()
+            if self.current_token.type != TokenType.IDENT:
+                self.abort("Expected member name")
+            member_name = self.current_token.val
+            self.advance()
+            members.append(self.parse_variable_declaration(member_type, member_name))
+        self.eat(TokenType.RBRACE)
+        self.eat(TokenType.SEMICOLON)
+        return StructDeclaration(name, members)
+    
     def parse_function_declaration(self, return_type: str, name: str) -> FunctionDeclaration:
         """Parse function declaration"""
         self.eat(TokenType.LPAREN)
@@ -192,14 +360,14 @@ class CParser:
         
         # First parameter
         if self.is_type():
-            param_type = self.current_token.val
-            self.advance()
+            param_type = self.parse_type_name()
             
             if self.current_token.type != TokenType.IDENT:
                 self.abort("Expected parameter name")
             
             param_name = self.current_token.val
             self.advance()
+            param_type = self.parse_array_suffix(param_type)
             
             parameters.append(Parameter(param_type, param_name))
             
@@ -210,29 +378,43 @@ class CParser:
                 if not self.is_type():
                     self.abort("Expected parameter type")
                 
-                param_type = self.current_token.val
-                self.advance()
+                param_type = self.parse_type_name()
                 
                 if self.current_token.type != TokenType.IDENT:
                     self.abort("Expected parameter name")
                 
                 param_name = self.current_token.val
                 self.advance()
+                param_type = self.parse_array_suffix(param_type)
                 
                 parameters.append(Parameter(param_type, param_name))
         
         return parameters
     
+    def parse_array_suffix(self, param_type: str) -> str:
+        """An array parameter `int a[]` is a pointer to its first element"""
+        if self.current_token.type != TokenType.LBRACKET:
+            return param_type
+        self.advance()
+        self.eat(TokenType.RBRACKET)
+        return param_type + " *"
+    
     def parse_variable_declaration(self, type_name: str, name: str) -> VariableDeclaration:
         """Parse variable declaration"""
         initializer = None
+        size = None
         
-        if self.current_token.type == TokenType.EQ:
+        if self.current_token.type == TokenType.LBRACKET:
+            # Array: int a[n];
+            self.advance()
+            size = self.parse_expression()
+            self.eat(TokenType.RBRACKET)
+        elif self.current_token.type == TokenType.EQ:
             self.advance()
             initializer = self.parse_expression()
         
         self.eat(TokenType.SEMICOLON)
-        return VariableDeclaration(type_name, name, initializer)
+        return VariableDeclaration(type_name, name, initializer, size)
     
     def parse_compound_statement(self) -> CompoundStatement:
         """Parse compound statement { ... }"""
@@ -273,8 +455,7 @@ class CParser:
             return self.parse_compound_statement()
         elif self.is_type():
             # Variable declaration inside function
-            type_name = self.current_token.val
-            self.advance()
+            type_name = self.parse_type_name()
             name = self.current_token.val
             self.advance()
             return self.parse_variable_declaration(type_name, name)
@@ -319,8 +500,7 @@ class CParser:
         init = None
         if self.current_token.type != TokenType.SEMICOLON:
             if self.is_type():
-                type_name = self.current_token.val
-                self.advance()
+                type_name = self.parse_type_name()
                 name = self.current_token.val
                 self.advance()
                 init = self.parse_variable_declaration(type_name, name)
@@ -360,8 +540,154 @@ class CParser:
     
     def parse_expression(self) -> Expression:
         """Parse expressions with proper precedence"""
+        if self.expression_engine == 'pratt':
+            return self.parse_precedence(0)
+        if self.expression_engine == 'stack':
+            return self.parse_expression_stack()
         return self.parse_assignment()
     
+    def parse_expression_stack(self) -> Expression:
+        """Precedence climbing like parse_precedence, but every construct that would
+        recurse (right operands, parentheses, arguments, indices, ?:) pushes its
+        pending state on a list instead, so nesting depth is bounded by memory only"""
+        pending = []
+        min_precedence = 0
+        
+        while True:
+            # An operand: prefix operators, then a primary
+            prefixes = []
+            while True:
+                if self.current_token.type in PREFIX_OPERATORS:
+                    prefixes.append(self.current_token.val)
+                    self.advance()
+                elif self.current_token.type == TokenType.LPAREN and self.peek().type in TYPE_TOKENS:
+                    # A cast, applied with the prefix operators
+                    self.advance()
+                    prefixes.append(CastExpression(self.parse_type_name(), None))
+                    self.eat(TokenType.RPAREN)
+                else:
+                    break
+            if self.current_token.type == TokenType.LPAREN:
+                self.advance()
+                pending.append((PENDING_PAREN, prefixes, min_precedence))
+                min_precedence = 0
+                continue
+            expr = self.parse_primary()
+            postfix = True
+            
+            # Extend expr until a nested operand is needed
+            while True:
+                if postfix:
+                    opened = False
+                    while True:
+                        token_type = self.current_token.type
+                        if token_type == TokenType.LPAREN:
+                            self.advance()
+                            if self.current_token.type == TokenType.RPAREN:
+                                self.advance()
+                                expr = FunctionCall(expr, [])
+                                continue
+                            pending.append((PENDING_ARGUMENT, expr, [], prefixes, min_precedence))
+                            opened = True
+                        elif token_type == TokenType.LBRACKET:
+                            self.advance()
+                            pending.append((PENDING_INDEX, expr, prefixes, min_precedence))
+                            opened = True
+                        elif token_type in (TokenType.DOT, TokenType.ARROW):
+                            self.advance()
+                            if self.current_token.type != TokenType.IDENT:
+                                self.abort("Expected member name")
+                            expr = MemberAccess(expr, self.current_token.val, token_type == TokenType.ARROW)
+                            self.advance()
+                            continue
+                        elif token_type in (TokenType.INCR, TokenType.DECR):
+                            expr = UnaryExpression(self.current_token.val + "_post", expr)
+                            self.advance()
+                            continue
+                        break
+                    if opened:
+                        min_precedence = 0
+                        break
+                    for op in reversed(prefixes):
+                        if isinstance(op, CastExpression):
+                            op.operand, expr = expr, op
+                        else:
+                            expr = UnaryExpression(op, expr)
+                
+                token = self.current_token
+                precedence = BINARY_PRECEDENCE.get(token.type)
+                if precedence is not None and precedence >= min_precedence:
+                    self.advance()
+                    if precedence == TERNARY_PRECEDENCE:
+                        pending.append((PENDING_THEN, expr, min_precedence))
+                        min_precedence = 0
+                    else:
+                        pending.append((PENDING_BINARY, expr, token, min_precedence))
+                        # Assignment is right associative
+                        min_precedence = precedence + (precedence != ASSIGNMENT_PRECEDENCE)
+                    break
+                
+                # expr is complete at this level: hand it to whatever was waiting for it
+                if not pending:
+                    return expr
+                state = pending.pop()
+                kind = state[0]
+                postfix = kind >= PENDING_PAREN
+                if kind == PENDING_BINARY:
+                    _, left, op_token, min_precedence = state
+                    if BINARY_PRECEDENCE[op_token.type] == ASSIGNMENT_PRECEDENCE:
+                        expr = AssignmentExpression(left, op_token.val, expr)
+                    else:
+                        expr = BinaryExpression(left, op_token.val, expr)
+                elif kind == PENDING_THEN:
+                    _, condition, enclosing = state
+                    self.eat(TokenType.COLON)
+                    pending.append((PENDING_ELSE, condition, expr, enclosing))
+                    min_precedence = TERNARY_PRECEDENCE
+                    break
+                elif kind == PENDING_ELSE:
+                    _, condition, then_expr, min_precedence = state
+                    expr = BinaryExpression(BinaryExpression(condition, "?", then_expr), ":", expr)
+                elif kind == PENDING_PAREN:
+                    _, prefixes, min_precedence = state
+                    self.eat(TokenType.RPAREN)
+                elif kind == PENDING_ARGUMENT:
+                    _, callee, args, prefixes, min_precedence = state
+                    args.append(expr)
+                    if self.current_token.type == TokenType.COMMA:
+                        self.advance()
+                        pending.append(state)
+                        min_precedence = 0
+                        break
+                    self.eat(TokenType.RPAREN)
+                    expr = FunctionCall(callee, args)
+                else:
+                    _, array, prefixes, min_precedence = state
+                    self.eat(TokenType.RBRACKET)
+                    expr = ArrayAccess(array, expr)
+    
+    def parse_precedence(self, min_precedence: int) -> Expression:
+        """Precedence climbing over BINARY_PRECEDENCE; builds the same tree as parse_assignment"""
+        expr = self.parse_unary()
+        
+        while True:
+            token = self.current_token
+            precedence = BINARY_PRECEDENCE.get(token.type)
+            if precedence is None or precedence < min_precedence:
+                return expr
+            self.advance()
+            
+            if precedence == ASSIGNMENT_PRECEDENCE:
+                # Right associative
+                expr = AssignmentExpression(expr, token.val, self.parse_precedence(ASSIGNMENT_PRECEDENCE))
+            elif precedence == TERNARY_PRECEDENCE:
+                then_expr = self.parse_precedence(0)
+                self.eat(TokenType.COLON)
+                else_expr = self.parse_precedence(TERNARY_PRECEDENCE)
+                expr = BinaryExpression(BinaryExpression(expr, "?", then_expr), ":", else_expr)
+            else:
+                expr = BinaryExpression(expr, token.val, self.parse_precedence(precedence + 1))
+    
     def parse_assignment(self) -> Expression:
         """Parse assignment expressions"""
         expr = self.parse_ternary()
@@ -504,8 +830,7 @@ class CParser:
         return expr
     
     def parse_unary(self) -> Expression:
-        if self.current_token.type in [TokenType.PLUS, TokenType.MINUS, TokenType.NOT, 
-                                      TokenType.BITNOT, TokenType.INCR, TokenType.DECR]:
+        if self.current_token.type in PREFIX_OPERATORS:
             op = self.current_token.val
             self.advance()
             expr = self.parse_unary()
@@ -574,20 +899,59 @@ class CParser:
             name = self.current_token.val
             self.advance()
             return Identifier(name)
+        elif self.current_token.type == TokenType.SIZEOF:
+            return self.parse_sizeof()
         elif self.current_token.type == TokenType.LPAREN:
             self.advance()
+            if self.is_type():
+                # Cast: binds like a prefix operator
+                type_name = self.parse_type_name()
+                self.eat(TokenType.RPAREN)
+                return CastExpression(type_name, self.parse_unary())
             expr = self.parse_expression()
             self.eat(TokenType.RPAREN)
             return expr
         else:
             self.abort(f"Unexpected token in expression: {self.current_token.type}")
     
+    def parse_sizeof(self) -> SizeofExpression:
+        """sizeof(type-name); sizeof applied to an expression is not supported"""
+        self.eat(TokenType.SIZEOF)
+        self.eat(TokenType.LPAREN)
+        if not self.is_type():
+            self.abort("sizeof expects a type name")
+        type_name = self.parse_type_name()
+        self.eat(TokenType.RPAREN)
+        return SizeofExpression(type_name)
+    
+    def parse_type_name(self) -> str:
+        """Consume a run of type specifiers such as `unsigned long int` or `struct node`, then
+        any `*`s; return the words space-separated with the stars last (`struct node **`)"""
+        words = []
+        while self.is_type():
+            tagged = self.current_token.type in TAGGED_TYPE_TOKENS
+            words.append(self.current_token.val)
+            self.advance()
+            if tagged and self.current_token.type == TokenType.IDENT:
+                words.append(self.current_token.val)
+                self.advance()
+        stars = ""
+        while self.current_token.type == TokenType.ASTERISK:
+            stars += "*"
+            self.advance()
+        if stars:
+            words.append(stars)
+        return " ".join(words)
+    
     def is_type(self) -> bool:
-        return self.current_token.type in [
-            TokenType.VOID, TokenType.CHAR, TokenType.SHORT, TokenType.INT, 
-            TokenType.LONG, TokenType.FLOAT, TokenType.DOUBLE, TokenType.SIGNED, 
-            TokenType.UNSIGNED, TokenType.STRUCT, TokenType.UNION, TokenType.ENUM
-        ]
+        return self.current_token.type in TYPE_TOKENS
+
+
+def parse_file(path: str, expression_engine: str = 'recursive') -> Program:
+    """Parse a C file of any size, lexing it through file_lexer's bounded window"""
+    with file_lexer(path, skip_newlines=True) as source:
+        return CParser(source, expression_engine).parse()
+
 
 # Usage Example
 def main():
@@ -0,0 +1,72 @@
+from typing import Dict
+
+from parser import *
+from optimizer import iter_nodes
+
+
+def written_globals(program: Program) -> set:
+    """Slots of globals assigned anywhere in a resolved program"""
+    written = set()
+    for decl in program.declarations:
+        if not isinstance(decl, FunctionDeclaration):
+            continue
+        for node in iter_nodes(decl.body):
+            if isinstance(node, AssignmentExpression):
+                target = node.left
+            elif isinstance(node, UnaryExpression) and node.operator in ('++', '--', '++_post', '--_post'):
+                target = node.operand
+            else:
+                continue
+            if isinstance(target, Identifier) and target.is_global:
+                written.add(target.slot)
+    return written
+
+
+def pure_functions(program: Program) -> set:
+    """Names of functions whose result depends only on their arguments.
+
+    The program must have been through the Resolver. A function is pure if
+    it writes no global, reads only globals that nothing ever writes, uses
+    no arrays, members or pointers, and calls only pure functions.
+    Recursion is fine: every function starts out pure and loses the status
+    when it, or something it calls, turns out not to be.
+    """
+    written = written_globals(program)
+    functions: Dict[str, FunctionDeclaration] = {
+        decl.name: decl for decl in program.declarations if isinstance(decl, FunctionDeclaration)}
+
+    calls = {}
+    pure = set()
+    for name, func in functions.items():
+        callees = set()
+        ok = True
+        for node in iter_nodes(func.body):
+            if isinstance(node, FunctionCall):
+                if not isinstance(node.function, Identifier) or node.function.name not in functions:
+                    ok = False
+                    break
+                callees.add(node.function.name)
+            elif isinstance(node, Identifier) and node.is_global and node.slot in written:
+                # Covers writes to variables too. Every other target (element,
+                # member, `*p`) is rejected below, and MemoryLayout has turned
+                # reads of globals whose address is taken into `*g`
+                ok = False
+                break
+            elif isinstance(node, (ArrayAccess, MemberAccess)):
+                ok = False
+                break
+            elif isinstance(node, UnaryExpression) and node.operator in ('&', '*'):
+                ok = False
+                break
+        if ok:
+            pure.add(name)
+            calls[name] = callees
+
+    changed = True
+    while changed:
+        changed = False
+        for name in list(pure):
+            if not calls[name] <= pure:
+                pure.discard(name)
+                changed = True
+    return pure
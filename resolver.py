@@ -0,0 +1,110 @@
+from parser import *
+from closure_compiler import FunctionScope
+
+
+class Resolver:
+    """Binds every variable reference to a storage location before execution.
+
+    Locals and parameters get a slot in their function's frame (slot 0 is
+    reserved for the return value, parameters start at 1, see
+    FunctionScope), globals an index into the global table. Results are
+    written onto the nodes:
+
+        Identifier.slot / .is_global           where the name lives
+        VariableDeclaration.slot / .is_global  where it stores its value
+        FunctionDeclaration.frame_size         slots a call's frame needs
+        Program.global_count                   size of the global table
+
+    Names follow C block scoping and a global is only visible after its
+    declaration. An undeclared name keeps slot None so the error surfaces
+    when (and only if) the reference is evaluated.
+    """
+
+    def __init__(self) -> None:
+        self.globals = {}
+        self.scope = None
+
+    def resolve(self, program: Program) -> Program:
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.resolve_function(decl)
+            elif isinstance(decl, VariableDeclaration):
+                if decl.initializer:
+                    self.resolve_expression(decl.initializer)
+                if decl.size:
+                    self.resolve_expression(decl.size)
+                decl.slot = self.globals.setdefault(decl.name, len(self.globals))
+                decl.is_global = True
+        program.global_count = len(self.globals)
+        return program
+
+    def resolve_function(self, func: FunctionDeclaration):
+        self.scope = FunctionScope(func.parameters)
+        self.resolve_statement(func.body)
+        func.frame_size = self.scope.size
+        self.scope = None
+
+    def resolve_statement(self, stmt):
+        if isinstance(stmt, CompoundStatement):
+            self.scope.blocks.append({})
+            for child in stmt.statements:
+                self.resolve_statement(child)
+            self.scope.blocks.pop()
+        elif isinstance(stmt, VariableDeclaration):
+            if stmt.initializer:
+                self.resolve_expression(stmt.initializer)
+            if stmt.size:
+                self.resolve_expression(stmt.size)
+            stmt.slot = self.scope.declare(stmt.name)
+            stmt.is_global = False
+        elif isinstance(stmt, (ExpressionStatement, ReturnStatement)):
+            if stmt.expression:
+                self.resolve_expression(stmt.expression)
+        elif isinstance(stmt, IfStatement):
+            self.resolve_expression(stmt.condition)
+            self.resolve_statement(stmt.then_stmt)
+            if stmt.else_stmt:
+                self.resolve_statement(stmt.else_stmt)
+        elif isinstance(stmt, WhileStatement):
+            self.resolve_expression(stmt.condition)
+            self.resolve_statement(stmt.body)
+        elif isinstance(stmt, ForStatement):
+            # Variables declared in the init clause are scoped to the loop
+            self.scope.blocks.append({})
+            if stmt.init:
+                self.resolve_statement(stmt.init)
+            if stmt.condition:
+                self.resolve_expression(stmt.condition)
+            if stmt.update:
+                self.resolve_expression(stmt.update)
+            self.resolve_statement(stmt.body)
+            self.scope.blocks.pop()
+
+    def resolve_expression(self, expr):
+        # A work list rather than recursion, so arbitrarily deep expressions resolve
+        pending = [expr]
+        while pending:
+            expr = pending.pop()
+            if isinstance(expr, Identifier):
+                slot = self.scope.lookup(expr.name) if self.scope else None
+                if slot is not None:
+                    expr.slot, expr.is_global = slot, False
+                elif expr.name in self.globals:
+                    expr.slot, expr.is_global = self.globals[expr.name], True
+                else:
+                    expr.slot, expr.is_global = None, False
+            elif isinstance(expr, (BinaryExpression, AssignmentExpression)):
+                pending.append(expr.right)
+                pending.append(expr.left)
+            elif isinstance(expr, (UnaryExpression, CastExpression)):
+                pending.append(expr.operand)
+            elif isinstance(expr, FunctionCall):
+                # The callee is looked up by name among functions, not variables
+                if not isinstance(expr.function, Identifier):
+                    pending.append(expr.function)
+                pending.extend(expr.arguments)
+            elif isinstance(expr, ArrayAccess):
+                pending.append(expr.index)
+                pending.append(expr.array)
+            elif isinstance(expr, MemberAccess):
+                pending.append(expr.object)
@@ -0,0 +1,560 @@
+import math
+import struct
+from typing import Callable, Dict, List, Optional
+
+from parser import *
+from lexer import *
+from closure_compiler import COMPOUND_OPS
+
+
+class SemanticError(Exception):
+    """Raised for programs that are not well-typed C"""
+
+
+class CType:
+    """A C type. kind is 'int', 'float', 'void' or 'pointer'; rank orders the
+    integer types for the usual arithmetic conversions"""
+    __slots__ = ('name', 'kind', 'size', 'signed', 'rank')
+
+    def __init__(self, name: str, kind: str, size: int = 0, signed: bool = True, rank: int = 0):
+        self.name = name
+        self.kind = kind
+        self.size = size
+        self.signed = signed
+        self.rank = rank
+
+    @property
+    def is_integer(self) -> bool:
+        return self.kind == 'int'
+
+    @property
+    def is_arithmetic(self) -> bool:
+        return self.kind in ('int', 'float')
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+VOID = CType('void', 'void')
+CHAR = CType('char', 'int', 1, True, 1)
+UNSIGNED_CHAR = CType('unsigned char', 'int', 1, False, 1)
+SHORT = CType('short', 'int', 2, True, 2)
+UNSIGNED_SHORT = CType('unsigned short', 'int', 2, False, 2)
+INT = CType('int', 'int', 4, True, 3)
+UNSIGNED_INT = CType('unsigned int', 'int', 4, False, 3)
+LONG = CType('long', 'int', 8, True, 4)
+UNSIGNED_LONG = CType('unsigned long', 'int', 8, False, 4)
+LONG_LONG = CType('long long', 'int', 8, True, 5)
+UNSIGNED_LONG_LONG = CType('unsigned long long', 'int', 8, False, 5)
+FLOAT = CType('float', 'float', 4)
+DOUBLE = CType('double', 'float', 8)
+STRING = CType('char *', 'pointer', 8, False)
+
+INTEGER_TYPES = [CHAR, UNSIGNED_CHAR, SHORT, UNSIGNED_SHORT, INT, UNSIGNED_INT,
+                 LONG, UNSIGNED_LONG, LONG_LONG, UNSIGNED_LONG_LONG]
+ARITHMETIC_TYPES = INTEGER_TYPES + [FLOAT, DOUBLE]
+UNSIGNED_VERSIONS = {INT: UNSIGNED_INT, LONG: UNSIGNED_LONG, LONG_LONG: UNSIGNED_LONG_LONG}
+TYPES_BY_NAME = {ctype.name: ctype for ctype in ARITHMETIC_TYPES + [VOID]}
+
+COMPARISON_OPS = {'==', '!=', '<', '<=', '>', '>='}
+INTEGER_OPS = {'%', '&', '|', '^', '<<', '>>'}
+
+
+def ctype_of(type_name: str) -> CType:
+    """The CType a run of specifiers names, e.g. 'unsigned long int' -> unsigned long"""
+    words = type_name.split()
+    unsigned = 'unsigned' in words
+    longs = words.count('long')
+    base = [word for word in words if word not in ('signed', 'unsigned', 'int', 'long')]
+    if len(base) > 1 or longs > 2 or unsigned and 'signed' in words:
+        raise SemanticError(f"Invalid type: {type_name}")
+    if not base:
+        name = ('int', 'long', 'long long')[longs]
+    else:
+        name = base[0]
+        if words == ['long', 'double']:
+            return DOUBLE
+        if name == 'enum':
+            return INT
+        if longs or name in ('void', 'float', 'double') and len(words) > 1:
+            raise SemanticError(f"Invalid type: {type_name}")
+    key = ('unsigned ' if unsigned else '') + name
+    if key not in TYPES_BY_NAME:
+        raise SemanticError(f"Unsupported type: {type_name}")
+    return TYPES_BY_NAME[key]
+
+
+def promote(ctype: CType) -> CType:
+    """Integer promotion: types narrower than int compute as int"""
+    if ctype.is_integer and ctype.rank < INT.rank:
+        return INT
+    return ctype
+
+
+def common_type(a: CType, b: CType) -> CType:
+    """The usual arithmetic conversions: the type both operands convert to"""
+    if DOUBLE in (a, b):
+        return DOUBLE
+    if FLOAT in (a, b):
+        return FLOAT
+    a, b = promote(a), promote(b)
+    if a is b:
+        return a
+    if a.signed == b.signed:
+        return a if a.rank > b.rank else b
+    signed, unsigned = (a, b) if a.signed else (b, a)
+    if unsigned.rank >= signed.rank:
+        return unsigned
+    if signed.size > unsigned.size:
+        return signed
+    return UNSIGNED_VERSIONS[signed]
+
+
+# Value representations: integers are Python ints kept in their type's
+# range, float and double are Python floats (float rounded to single).
+
+def to_float32(value) -> float:
+    try:
+        return struct.unpack('f', struct.pack('f', value))[0]
+    except OverflowError:
+        return math.copysign(math.inf, value)
+
+
+def wrapper(ctype: CType) -> Callable:
+    """Reduce any Python int into the range of integer type ctype"""
+    bits = 8 * ctype.size
+    mask = (1 << bits) - 1
+    if not ctype.signed:
+        return lambda v: v & mask
+    half = 1 << (bits - 1)
+    return lambda v: ((v + half) & mask) - half
+
+
+def converter(source: CType, target: CType) -> Callable:
+    """Function converting a value of type source into one of type target"""
+    if target.is_integer:
+        if source.is_integer and (source.signed == target.signed and source.size <= target.size
+                                  or target.signed and source.size < target.size):
+            return lambda v: v
+        wrap = wrapper(target)
+        if source.kind == 'float':
+            return lambda v: wrap(int(v))  # truncates toward zero, as C does
+        return wrap
+    if target is DOUBLE:
+        return float
+    if target is FLOAT:
+        return to_float32
+    raise SemanticError(f"Cannot convert {source} to {target}")
+
+
+def truncating_divide(a: int, b: int) -> int:
+    """C integer division: the quotient rounds toward zero"""
+    q = a // b
+    if q < 0 and q * b != a:
+        q += 1
+    return q
+
+
+def float_divide(a, b) -> float:
+    """IEEE division, including by zero"""
+    if b:
+        return a / b
+    if a == 0 or a != a:
+        return math.nan
+    return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+def integer_operations(ctype: CType) -> Dict[str, Callable]:
+    bits = 8 * ctype.size
+    mask = (1 << bits) - 1
+    if ctype.signed:
+        half = 1 << (bits - 1)
+        operations = {
+            '+': lambda a, b: ((a + b + half) & mask) - half,
+            '-': lambda a, b: ((a - b + half) & mask) - half,
+            '*': lambda a, b: ((a * b + half) & mask) - half,
+            '/': lambda a, b: ((truncating_divide(a, b) + half) & mask) - half,
+            '%': lambda a, b: a - b * truncating_divide(a, b),
+            '<<': lambda a, b: (((a << b) + half) & mask) - half,
+            '-unary': lambda a: ((half - a) & mask) - half,
+            '~unary': lambda a: ~a,
+        }
+    else:
+        # Operands are already in range, so they are non-negative
+        operations = {
+            '+': lambda a, b: (a + b) & mask,
+            '-': lambda a, b: (a - b) & mask,
+            '*': lambda a, b: (a * b) & mask,
+            '/': lambda a, b: a // b,
+            '%': lambda a, b: a % b,
+            '<<': lambda a, b: (a << b) & mask,
+            '-unary': lambda a: -a & mask,
+            '~unary': lambda a: ~a & mask,
+        }
+    operations.update({
+        '>>': lambda a, b: a >> b,
+        '&': lambda a, b: a & b,
+        '|': lambda a, b: a | b,
+        '^': lambda a, b: a ^ b,
+    })
+    return operations
+
+
+def float_operations(ctype: CType) -> Dict[str, Callable]:
+    if ctype is DOUBLE:
+        return {
+            '+': lambda a, b: a + b,
+            '-': lambda a, b: a - b,
+            '*': lambda a, b: a * b,
+            '/': float_divide,
+            '-unary': lambda a: -a,
+        }
+    return {
+        '+': lambda a, b: to_float32(a + b),
+        '-': lambda a, b: to_float32(a - b),
+        '*': lambda a, b: to_float32(a * b),
+        '/': lambda a, b: to_float32(float_divide(a, b)),
+        '-unary': lambda a: -a,
+    }
+
+
+COMPARISONS = {
+    '==': lambda a, b: 1 if a == b else 0,
+    '!=': lambda a, b: 1 if a != b else 0,
+    '<': lambda a, b: 1 if a < b else 0,
+    '<=': lambda a, b: 1 if a <= b else 0,
+    '>': lambda a, b: 1 if a > b else 0,
+    '>=': lambda a, b: 1 if a >= b else 0,
+}
+IDENTITY = lambda a: a
+LOGICAL_NOT = lambda a: 0 if a else 1
+
+# Handler tables, built once: OPERATIONS[type][op] for every type arithmetic
+# happens in (after promotion), CONVERSIONS[source, target] and
+# STEPS[type] = (increment, decrement) for every arithmetic type
+OPERATIONS = {}
+for _ctype in (INT, UNSIGNED_INT, LONG, UNSIGNED_LONG, LONG_LONG, UNSIGNED_LONG_LONG, FLOAT, DOUBLE):
+    OPERATIONS[_ctype] = integer_operations(_ctype) if _ctype.is_integer else float_operations(_ctype)
+    OPERATIONS[_ctype].update(COMPARISONS)
+    OPERATIONS[_ctype]['+unary'] = IDENTITY
+
+CONVERSIONS = {(source, target): converter(source, target)
+               for source in ARITHMETIC_TYPES for target in ARITHMETIC_TYPES}
+
+
+def step_handlers(ctype: CType):
+    if ctype.is_integer:
+        wrap = wrapper(ctype)
+        return (lambda v: wrap(v + 1)), (lambda v: wrap(v - 1))
+    if ctype is FLOAT:
+        return (lambda v: to_float32(v + 1)), (lambda v: to_float32(v - 1))
+    return (lambda v: v + 1), (lambda v: v - 1)
+
+
+STEPS = {ctype: step_handlers(ctype) for ctype in ARITHMETIC_TYPES}
+
+
+class SemanticAnalyzer:
+    """Type-checks a Program and annotates every expression for typed execution.
+
+    Each expression gets `ctype`, its C type, and `handler`, the
+    precomputed function from the tables above that computes it:
+    handler(left, right) for binary operators, handler(operand) for unary
+    operators and casts, handler(old) -> new for ++/--, and
+    handler(current, right) -> stored value for compound assignments.
+    Implicit conversions (usual arithmetic conversions, assignment,
+    arguments, return values) become CastExpression nodes, folded away for
+    literals, so the handler of an operator always receives operands of
+    the type it was chosen for. Nothing is inspected at run time.
+
+    Calls to undeclared functions are assumed to return int and get the
+    default argument promotions. Arrays, members and pointers are
+    rejected.
+    """
+
+    def __init__(self) -> None:
+        self.globals: Dict[str, CType] = {}
+        self.functions: Dict[str, FunctionDeclaration] = {}
+        self.scopes: List[Dict[str, CType]] = []
+        self.return_type: Optional[CType] = None
+        self.casts = 0
+
+    def analyze(self, program: Program) -> Program:
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.functions[decl.name] = decl
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.analyze_function(decl)
+            elif isinstance(decl, VariableDeclaration):
+                ctype = self.declaration_type(decl)
+                if decl.initializer:
+                    decl.initializer = self.convert(self.analyze_expression(decl.initializer), ctype)
+                self.globals[decl.name] = ctype
+        return program
+
+    def report(self) -> str:
+        return f"semantic analysis: {self.casts} implicit conversions"
+
+    def variable_type(self, type_name: str, name: str) -> CType:
+        ctype = ctype_of(type_name)
+        if not ctype.is_arithmetic:
+            raise SemanticError(f"Variable {name} has type {ctype}")
+        return ctype
+
+    def declaration_type(self, decl: VariableDeclaration) -> CType:
+        if decl.size is not None:
+            raise SemanticError(f"Array {decl.name} is not supported")
+        return self.variable_type(decl.type_name, decl.name)
+
+    def lookup(self, name: str) -> CType:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        if name in self.globals:
+            return self.globals[name]
+        raise SemanticError(f"Variable {name} not defined")
+
+    # Statements
+
+    def analyze_function(self, func: FunctionDeclaration) -> None:
+        self.return_type = ctype_of(func.return_type)
+        self.scopes = [{param.name: self.variable_type(param.type_name, param.name)
+                        for param in func.parameters}]
+        self.analyze_statement(func.body)
+        self.scopes = []
+
+    def analyze_statement(self, stmt) -> None:
+        if isinstance(stmt, CompoundStatement):
+            self.scopes.append({})
+            for child in stmt.statements:
+                self.analyze_statement(child)
+            self.scopes.pop()
+        elif isinstance(stmt, ExpressionStatement):
+            if stmt.expression:
+                stmt.expression = self.analyze_expression(stmt.expression)
+        elif isinstance(stmt, VariableDeclaration):
+            ctype = self.declaration_type(stmt)
+            if stmt.initializer:
+                stmt.initializer = self.convert(self.analyze_expression(stmt.initializer), ctype)
+            self.scopes[-1][stmt.name] = ctype
+        elif isinstance(stmt, IfStatement):
+            stmt.condition = self.analyze_scalar(stmt.condition)
+            self.analyze_statement(stmt.then_stmt)
+            if stmt.else_stmt:
+                self.analyze_statement(stmt.else_stmt)
+        elif isinstance(stmt, WhileStatement):
+            stmt.condition = self.analyze_scalar(stmt.condition)
+            self.analyze_statement(stmt.body)
+        elif isinstance(stmt, ForStatement):
+            self.scopes.append({})
+            if stmt.init:
+                self.analyze_statement(stmt.init)
+            if stmt.condition:
+                stmt.condition = self.analyze_scalar(stmt.condition)
+            if stmt.update:
+                stmt.update = self.analyze_expression(stmt.update)
+            self.analyze_statement(stmt.body)
+            self.scopes.pop()
+        elif isinstance(stmt, ReturnStatement):
+            if stmt.expression:
+                if self.return_type is VOID:
+                    raise SemanticError("Returning a value from a void function")
+                stmt.expression = self.convert(self.analyze_expression(stmt.expression), self.return_type)
+
+    # Expressions
+
+    def analyze_expression(self, expr):
+        """Annotate expr and its subtree; return the node to use in its place"""
+        if isinstance(expr, Literal):
+            expr.ctype = self.literal_type(expr.value)
+        elif isinstance(expr, Identifier):
+            expr.ctype = self.lookup(expr.name)
+        elif isinstance(expr, CastExpression):
+            expr.operand = self.analyze_expression(expr.operand)
+            expr.ctype = ctype_of(expr.type_name)
+            expr.handler = self.conversion(expr.operand.ctype, expr.ctype)
+        elif isinstance(expr, BinaryExpression):
+            self.analyze_binary(expr)
+        elif isinstance(expr, UnaryExpression):
+            self.analyze_unary(expr)
+        elif isinstance(expr, AssignmentExpression):
+            self.analyze_assignment(expr)
+        elif isinstance(expr, FunctionCall):
+            self.analyze_call(expr)
+        else:
+            raise SemanticError(f"Unsupported expression: {type(expr).__name__}")
+        return expr
+
+    def literal_type(self, value) -> CType:
+        if isinstance(value, float):
+            return DOUBLE
+        if isinstance(value, str):
+            return STRING
+        for ctype in (INT, LONG, UNSIGNED_LONG):
+            if value < 1 << (8 * ctype.size - ctype.signed):
+                return ctype
+        raise SemanticError(f"Integer constant is too large: {value}")
+
+    def analyze_scalar(self, expr):
+        """A condition: any arithmetic value, compared against zero"""
+        expr = self.analyze_expression(expr)
+        if not expr.ctype.is_arithmetic:
+            raise SemanticError(f"Condition has type {expr.ctype}")
+        return expr
+
+    def analyze_binary(self, expr: BinaryExpression) -> None:
+        op = expr.operator
+        if op == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+            question = expr.left
+            question.left = self.analyze_scalar(question.left)
+            then_expr = self.analyze_arithmetic(question.right, op)
+            else_expr = self.analyze_arithmetic(expr.right, op)
+            ctype = common_type(then_expr.ctype, else_expr.ctype)
+            question.right = self.convert(then_expr, ctype)
+            expr.right = self.convert(else_expr, ctype)
+            question.ctype = expr.ctype = ctype
+            return
+        if op in ('&&', '||'):
+            expr.left = self.analyze_scalar(expr.left)
+            expr.right = self.analyze_scalar(expr.right)
+            expr.ctype = INT
+            return
+
+        left = self.analyze_arithmetic(expr.left, op)
+        right = self.analyze_arithmetic(expr.right, op)
+        if op in ('<<', '>>'):
+            ctype = promote(left.ctype)
+            expr.right = self.convert(right, promote(right.ctype))
+        else:
+            ctype = common_type(left.ctype, right.ctype)
+            expr.right = self.convert(right, ctype)
+        expr.left = self.convert(left, ctype)
+        expr.handler = self.operation(ctype, op)
+        expr.ctype = INT if op in COMPARISON_OPS else ctype
+
+    def analyze_unary(self, expr: UnaryExpression) -> None:
+        op = expr.operator
+        if op in ('++', '--', '++_post', '--_post'):
+            operand = self.analyze_lvalue(expr.operand)
+            if not operand.ctype.is_arithmetic:
+                raise SemanticError(f"Operand of {op} has type {operand.ctype}")
+            expr.handler = STEPS[operand.ctype][0 if op.startswith('++') else 1]
+            expr.ctype = operand.ctype
+        elif op == '!':
+            expr.operand = self.analyze_scalar(expr.operand)
+            expr.handler = LOGICAL_NOT
+            expr.ctype = INT
+        elif op in ('-', '+', '~'):
+            operand = self.analyze_arithmetic(expr.operand, op)
+            if op == '~' and not operand.ctype.is_integer:
+                raise SemanticError(f"Operand of ~ has type {operand.ctype}")
+            ctype = promote(operand.ctype)
+            expr.operand = self.convert(operand, ctype)
+            expr.handler = OPERATIONS[ctype][op + 'unary']
+            expr.ctype = ctype
+        else:
+            raise SemanticError(f"Unsupported unary operator: {op}")
+
+    def analyze_assignment(self, expr: AssignmentExpression) -> None:
+        target = self.analyze_lvalue(expr.left).ctype
+        if expr.operator == '=':
+            expr.right = self.convert(self.analyze_expression(expr.right), target)
+            expr.ctype = target
+            return
+
+        op = COMPOUND_OPS[expr.operator]
+        if not target.is_arithmetic:
+            raise SemanticError(f"Operand of {expr.operator} has type {target}")
+        right = self.analyze_arithmetic(expr.right, op)
+        ctype = promote(target) if op in ('<<', '>>') else common_type(target, right.ctype)
+        if op in INTEGER_OPS and not (target.is_integer and right.ctype.is_integer):
+            raise SemanticError(f"Operands of {expr.operator} must be integers")
+        expr.right = self.convert(right, promote(right.ctype) if op in ('<<', '>>') else ctype)
+        # current value -> operation type, apply, result -> variable type
+        to_operation = self.conversion(target, ctype)
+        operation = self.operation(ctype, op)
+        back = self.conversion(ctype, target)
+        expr.handler = lambda current, value: back(operation(to_operation(current), value))
+        expr.ctype = target
+
+    def analyze_call(self, expr: FunctionCall) -> None:
+        if not isinstance(expr.function, Identifier):
+            raise SemanticError("Only direct calls are supported")
+        name = expr.function.name
+        args = [self.analyze_expression(arg) for arg in expr.arguments]
+        func = self.functions.get(name)
+        if func is None:
+            # Implicit declaration: int result, default argument promotions
+            expr.arguments = [self.convert(arg, DOUBLE if arg.ctype is FLOAT else promote(arg.ctype))
+                              if arg.ctype.is_arithmetic else arg for arg in args]
+            expr.ctype = INT
+            return
+        if len(args) != len(func.parameters):
+            raise SemanticError(f"Function {name} expects {len(func.parameters)} arguments, got {len(args)}")
+        expr.arguments = [self.convert(arg, ctype_of(param.type_name))
+                          for arg, param in zip(args, func.parameters)]
+        expr.ctype = ctype_of(func.return_type)
+
+    def analyze_arithmetic(self, expr, op: str):
+        expr = self.analyze_expression(expr)
+        if not expr.ctype.is_arithmetic:
+            raise SemanticError(f"Operand of {op} has type {expr.ctype}")
+        if op in INTEGER_OPS and not expr.ctype.is_integer:
+            raise SemanticError(f"Operand of {op} must be an integer, not {expr.ctype}")
+        return expr
+
+    def analyze_lvalue(self, expr):
+        if not isinstance(expr, Identifier):
+            raise SemanticError("Assignment target must be a variable")
+        return self.analyze_expression(expr)
+
+    def operation(self, ctype: CType, op: str) -> Callable:
+        if op not in OPERATIONS[ctype]:
+            raise SemanticError(f"Operator {op} does not apply to {ctype}")
+        return OPERATIONS[ctype][op]
+
+    def conversion(self, source: CType, target: CType) -> Callable:
+        if (source, target) not in CONVERSIONS:
+            raise SemanticError(f"Cannot convert {source} to {target}")
+        return CONVERSIONS[source, target]
+
+    def convert(self, expr, ctype: CType):
+        """expr as a value of ctype: expr itself, a folded literal or a new CastExpression"""
+        if expr.ctype is ctype:
+            return expr
+        handler = self.conversion(expr.ctype, ctype)
+        if isinstance(expr, Literal):
+            literal = Literal(handler(expr.value))
+            literal.ctype = ctype
+            return literal
+        self.casts += 1
+        cast = CastExpression(ctype.name, expr)
+        cast.ctype = ctype
+        cast.handler = handler
+        return cast
+
+
+def main():
+    source_code = """
+    unsigned int hash(unsigned int h, int c) {
+        return h * 31 + c;
+    }
+
+    int main() {
+        unsigned int h = 0;
+        for (int i = 0; i < 100; i++) {
+            h = hash(h, i);
+        }
+        double ratio = 7 / 2 + 7.0 / 2;
+        int negative = -7 / 2 + -7 % 2;
+        return h % 1000 + ratio + negative;
+    }
+    """
+    program = CParser(regex_lexer(source_code, skip_newlines=True)).parse()
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(program)
+    print(analyzer.report())
+
+if __name__ == "__main__":
+    main()
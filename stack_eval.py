@@ -0,0 +1,355 @@
+from typing import Dict, List
+
+from parser import *
+from closure_compiler import RETURN_SLOT, COMPOUND_OPS
+from resolver import Resolver
+
+# Work items are (opcode, payload) tuples on StackEvaluator.tasks
+EVAL = 0            # evaluate expression payload, push its value
+EXEC = 1            # execute statement payload
+BINOP = 2           # pop right, left; push payload(left, right)
+DISCARD = 3         # pop and drop an expression statement's value
+STORE = 4           # store the top value (left in place) into variable payload
+IF = 5              # pop condition, queue a branch of IfStatement payload
+LOOP_TEST = 6       # queue the condition of loop payload
+LOOP_DECIDE = 7     # pop condition, queue the body (and a LOOP_NEXT) or leave the loop
+LOOP_NEXT = 8       # end of an iteration: run the update, then LOOP_TEST; break/continue target
+CALL = 9            # pop the arguments of FunctionCall payload, enter the callee
+CALL_EXIT = 10      # leave a call: push its result, restore caller frame payload; return target
+RETURN_VALUE = 11   # pop the value of a return statement and unwind to CALL_EXIT
+AND = 12            # pop left operand of && payload, short-circuit or queue the right
+OR = 13             # same for ||
+TERNARY = 14        # pop condition, queue one arm of ?: payload
+UNARY = 15          # pop operand, push unary operator payload applied to it
+STEP = 16           # pop operand of ++/-- payload, store and push the result
+COMPOUND = 17       # pop right, left of compound assignment payload, store and push
+DECLARE = 18        # pop initializer into local slot payload
+TRUTH = 19          # pop, push 1 if true else 0
+APPLY = 20          # replace the top value v with payload(v): typed unary operators and casts
+
+BINARY_FUNCTIONS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a // b,
+    '%': lambda a, b: a % b,
+    '==': lambda a, b: 1 if a == b else 0,
+    '!=': lambda a, b: 1 if a != b else 0,
+    '<': lambda a, b: 1 if a < b else 0,
+    '<=': lambda a, b: 1 if a <= b else 0,
+    '>': lambda a, b: 1 if a > b else 0,
+    '>=': lambda a, b: 1 if a >= b else 0,
+    '&': lambda a, b: a & b,
+    '|': lambda a, b: a | b,
+    '^': lambda a, b: a ^ b,
+    '<<': lambda a, b: a << b,
+    '>>': lambda a, b: a >> b,
+}
+
+STEP_OPERATORS = {'++': (1, False), '--': (-1, False), '++_post': (1, True), '--_post': (-1, True)}
+
+# Rough CPython sizes used to charge the memory budget
+TASK_BYTES = 64     # a work item tuple plus its pointer in the task list
+FRAME_BYTES = 56    # a frame list's header
+SLOT_BYTES = 8      # a frame slot or value stack entry
+
+
+class StackEvaluator:
+    """Runs a program without using the Python call stack.
+
+    Pending work lives in a heap-allocated task list and intermediate
+    values on a separate value stack, so neither deep guest recursion nor
+    deeply nested expressions touch Python's recursion limit. Instead the
+    estimated size of tasks, values and live frames is checked against
+    memory_budget (bytes) on every call and exceeding it is a guest stack
+    overflow.
+
+    break and continue pop tasks down to the innermost LOOP_NEXT, return
+    down to the CALL_EXIT of the current call. Semantics otherwise match
+    the tree walker.
+    """
+
+    def __init__(self, memory_budget: int = 64 * 1024 * 1024) -> None:
+        self.memory_budget = memory_budget
+        self.functions: Dict[str, FunctionDeclaration] = {}
+        self.globals: List = []
+        self.tasks: List = []
+        self.values: List = []
+        self.frame = None
+        self.frame_bytes = 0        # bytes of all live frames
+        self.max_depth = 0          # deepest call nesting reached
+
+    def run(self, program: Program, entry: str = 'main'):
+        Resolver().resolve(program)
+        self.globals = [0] * program.global_count
+        for decl in program.declarations:
+            if isinstance(decl, FunctionDeclaration):
+                self.functions[decl.name] = decl
+            elif isinstance(decl, VariableDeclaration) and decl.initializer:
+                self.globals[decl.slot] = self.evaluate(decl.initializer)
+        if entry not in self.functions:
+            raise RuntimeError("No main function found")
+        return self.evaluate(FunctionCall(Identifier(entry), []))
+
+    def evaluate(self, expr):
+        """Evaluate expr in the current frame by running the task loop to completion"""
+        self.tasks.append((EVAL, expr))
+        self.execute()
+        return self.values.pop()
+
+    def overflow(self):
+        used = len(self.tasks) * TASK_BYTES + len(self.values) * SLOT_BYTES + self.frame_bytes
+        return used > self.memory_budget
+
+    def execute(self):
+        tasks = self.tasks
+        values = self.values
+        push = tasks.append
+        pop = tasks.pop
+        depth = 0
+
+        while tasks:
+            op, node = pop()
+
+            if op == EVAL:
+                kind = type(node)
+                if kind is Literal:
+                    values.append(node.value)
+                elif kind is Identifier:
+                    values.append(self.load(node))
+                elif kind is BinaryExpression:
+                    operator = node.operator
+                    if operator == ':' and type(node.left) is BinaryExpression and node.left.operator == '?':
+                        push((TERNARY, node))
+                        push((EVAL, node.left.left))
+                    elif operator == '&&':
+                        push((AND, node))
+                        push((EVAL, node.left))
+                    elif operator == '||':
+                        push((OR, node))
+                        push((EVAL, node.left))
+                    else:
+                        if operator not in BINARY_FUNCTIONS:
+                            raise RuntimeError(f"Unknown binary operator: {operator}")
+                        push((BINOP, node.handler or BINARY_FUNCTIONS[operator]))
+                        push((EVAL, node.right))
+                        push((EVAL, node.left))
+                elif kind is FunctionCall:
+                    push((CALL, node))
+                    for arg in reversed(node.arguments):
+                        push((EVAL, arg))
+                elif kind is AssignmentExpression:
+                    if node.operator == '=':
+                        push((STORE, node.left))
+                        push((EVAL, node.right))
+                    else:
+                        # The target is read before the right operand runs
+                        push((COMPOUND, node))
+                        push((EVAL, node.right))
+                        push((EVAL, node.left))
+                elif kind is UnaryExpression:
+                    if node.operator in STEP_OPERATORS:
+                        push((STEP, node))
+                    elif node.handler is not None:
+                        push((APPLY, node.handler))
+                    else:
+                        push((UNARY, node))
+                    push((EVAL, node.operand))
+                elif kind is CastExpression:
+                    push((APPLY, node.handler))
+                    push((EVAL, node.operand))
+                else:
+                    raise RuntimeError(f"Unknown expression type: {kind}")
+
+            elif op == BINOP:
+                right = values.pop()
+                values[-1] = node(values[-1], right)
+
+            elif op == EXEC:
+                kind = type(node)
+                if kind is CompoundStatement:
+                    for stmt in reversed(node.statements):
+                        push((EXEC, stmt))
+                elif kind is ExpressionStatement:
+                    if node.expression:
+                        push((DISCARD, None))
+                        push((EVAL, node.expression))
+                elif kind is IfStatement:
+                    push((IF, node))
+                    push((EVAL, node.condition))
+                elif kind is WhileStatement:
+                    push((LOOP_TEST, node))
+                elif kind is ForStatement:
+                    push((LOOP_TEST, node))
+                    if node.init:
+                        push((EXEC, node.init))
+                elif kind is ReturnStatement:
+                    if node.expression:
+                        push((RETURN_VALUE, None))
+                        push((EVAL, node.expression))
+                    else:
+                        self.frame[RETURN_SLOT] = 0
+                        self.unwind(CALL_EXIT, "return outside of a function")
+                elif kind is VariableDeclaration:
+                    if node.initializer:
+                        push((DECLARE, node.slot))
+                        push((EVAL, node.initializer))
+                    else:
+                        self.frame[node.slot] = 0
+                elif kind is BreakStatement:
+                    self.unwind(LOOP_NEXT, "break outside of a loop")
+                    pop()
+                elif kind is ContinueStatement:
+                    self.unwind(LOOP_NEXT, "continue outside of a loop")
+                else:
+                    raise RuntimeError(f"Unknown statement type: {kind}")
+
+            elif op == DISCARD:
+                values.pop()
+
+            elif op == STORE:
+                self.store(node, values[-1])
+
+            elif op == IF:
+                if values.pop():
+                    push((EXEC, node.then_stmt))
+                elif node.else_stmt:
+                    push((EXEC, node.else_stmt))
+
+            elif op == LOOP_TEST:
+                if node.condition is None:
+                    push((LOOP_NEXT, node))
+                    push((EXEC, node.body))
+                else:
+                    push((LOOP_DECIDE, node))
+                    push((EVAL, node.condition))
+
+            elif op == LOOP_DECIDE:
+                if values.pop():
+                    push((LOOP_NEXT, node))
+                    push((EXEC, node.body))
+
+            elif op == LOOP_NEXT:
+                push((LOOP_TEST, node))
+                if type(node) is ForStatement and node.update:
+                    push((DISCARD, None))
+                    push((EVAL, node.update))
+
+            elif op == CALL:
+                name = node.function.name
+                func = self.functions.get(name)
+                if func is None:
+                    raise RuntimeError(f"Function {name} not defined")
+                count = len(node.arguments)
+                if count:
+                    args = values[-count:]
+                    del values[-count:]
+                else:
+                    args = []
+                frame = [0] * func.frame_size
+                nparams = len(func.parameters)
+                frame[1:1 + nparams] = (args + [0] * nparams)[:nparams]
+
+                push((CALL_EXIT, self.frame))
+                push((EXEC, func.body))
+                self.frame = frame
+                self.frame_bytes += FRAME_BYTES + SLOT_BYTES * len(frame)
+                depth += 1
+                if depth > self.max_depth:
+                    self.max_depth = depth
+                    if self.overflow():
+                        raise RuntimeError(f"Stack overflow: call depth {depth} exceeds the "
+                                           f"memory budget of {self.memory_budget} bytes")
+
+            elif op == CALL_EXIT:
+                frame = self.frame
+                values.append(frame[RETURN_SLOT])
+                self.frame_bytes -= FRAME_BYTES + SLOT_BYTES * len(frame)
+                self.frame = node
+                depth -= 1
+
+            elif op == RETURN_VALUE:
+                self.frame[RETURN_SLOT] = values.pop()
+                self.unwind(CALL_EXIT, "return outside of a function")
+
+            elif op == AND:
+                if values.pop():
+                    push((TRUTH, None))
+                    push((EVAL, node.right))
+                else:
+                    values.append(0)
+
+            elif op == OR:
+                if values.pop():
+                    values.append(1)
+                else:
+                    push((TRUTH, None))
+                    push((EVAL, node.right))
+
+            elif op == TRUTH:
+                values[-1] = 1 if values[-1] else 0
+
+            elif op == TERNARY:
+                push((EVAL, node.left.right if values.pop() else node.right))
+
+            elif op == UNARY:
+                operand = values[-1]
+                operator = node.operator
+                if operator == '-':
+                    values[-1] = -operand
+                elif operator == '!':
+                    values[-1] = 0 if operand else 1
+                elif operator == '~':
+                    values[-1] = ~operand
+                elif operator != '+':
+                    raise RuntimeError(f"Unknown unary operator: {operator}")
+
+            elif op == APPLY:
+                values[-1] = node(values[-1])
+
+            elif op == STEP:
+                step, post = STEP_OPERATORS[node.operator]
+                old = values[-1]
+                new = node.handler(old) if node.handler is not None else old + step
+                self.store(node.operand, new)
+                if not post:
+                    values[-1] = new
+
+            elif op == COMPOUND:
+                right = values.pop()
+                if node.handler is not None:
+                    value = node.handler(values[-1], right)
+                else:
+                    value = BINARY_FUNCTIONS[COMPOUND_OPS[node.operator]](values[-1], right)
+                values[-1] = value
+                self.store(node.left, value)
+
+            elif op == DECLARE:
+                self.frame[node] = values.pop()
+
+    def unwind(self, target, message):
+        """Drop pending tasks down to (not including) the innermost target task"""
+        tasks = self.tasks
+        while tasks and tasks[-1][0] != target:
+            if tasks[-1][0] == CALL_EXIT:
+                raise RuntimeError(message)
+            tasks.pop()
+        if not tasks:
+            raise RuntimeError(message)
+
+    def load(self, target):
+        if target.slot is None:
+            raise RuntimeError(f"Variable {target.name} not defined")
+        elif target.is_global:
+            return self.globals[target.slot]
+        return self.frame[target.slot]
+
+    def store(self, target, value):
+        if not isinstance(target, Identifier):
+            raise RuntimeError("Assignment target must be a variable")
+        if target.slot is None:
+            raise RuntimeError(f"Variable {target.name} not defined")
+        elif target.is_global:
+            self.globals[target.slot] = value
+        else:
+            self.frame[target.slot] = value
@@ -0,0 +1,69 @@
+import pytest
+
+from ast_arena import NODE_CLASSES, ASTArena, copy_tree
+from lexer import regex_lexer
+from parser import BinaryExpression, CParser, FunctionDeclaration, Literal
+from resolver import Resolver
+
+SOURCE = """
+struct node { int value; struct node *next; };
+double scale = 2.5;
+int total(struct node *list, int limit) {
+    int sum = 0;
+    for (int i = 0; i < limit && list; i++) { sum += list->value * 1; list = list->next; }
+    while (sum > 100) { if (sum % 2) break; else continue; }
+    return sum ? -sum : (int)sizeof(struct node) + 1.0 == 1;
+}
+"""
+
+
+def parse(source: str):
+    return CParser(regex_lexer(source, skip_newlines=True)).parse()
+
+
+def test_nodes_have_slots_only():
+    for cls in NODE_CLASSES:
+        assert '__slots__' in cls.__dict__
+    assert not hasattr(parse(SOURCE).declarations[2], '__dict__')
+
+
+def test_round_trip_through_bytes():
+    arena = ASTArena.from_program(parse(SOURCE))
+    data = arena.to_bytes()
+    restored = ASTArena.from_bytes(data)
+    assert len(restored) == len(arena)
+    assert ASTArena.from_program(restored.to_program()).to_bytes() == data
+    with pytest.raises(ValueError):
+        ASTArena.from_bytes(data[:-3])
+
+
+def test_views_read_like_nodes_and_are_read_only():
+    arena = ASTArena.from_program(parse(SOURCE))
+    function = arena.root.declarations[2]
+    assert isinstance(function, FunctionDeclaration)
+    assert function.name == 'total' and [p.name for p in function.parameters] == ['list', 'limit']
+    condition = function.body.statements[1].condition
+    assert isinstance(condition, BinaryExpression) and condition.operator == '&&'
+    with pytest.raises(AttributeError):
+        function.name = 'other'
+
+
+def test_literals_keep_their_type():
+    arena = ASTArena.from_program(parse("int f() { return 1 + 1.0; }"))
+    expression = arena.root.declarations[0].body.statements[0].expression
+    assert isinstance(expression.left, Literal)
+    assert type(expression.left.value) is int and type(expression.right.value) is float
+
+
+def test_copy_tree_makes_plain_unannotated_nodes():
+    program = parse(SOURCE)
+    Resolver().resolve(program)
+    data = ASTArena.from_program(program).to_bytes()
+    for source in (program, ASTArena.from_bytes(data).root):
+        copy = copy_tree(source)
+        assert type(copy.declarations[2]) is FunctionDeclaration
+        assert copy.declarations[2].frame_size == 0 and copy.global_count == 0
+        assert ASTArena.from_program(copy).to_bytes() == data
+    nesting = 20000
+    deep = CParser(regex_lexer("int x = " + "(1 + " * nesting + "1" + ")" * nesting + ";"), 'stack').parse()
+    assert copy_tree(deep).declarations[0].initializer.right.right.operator == '+'
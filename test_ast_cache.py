@@ -0,0 +1,48 @@
+import os
+
+from ast_arena import ASTArena
+from ast_cache import ASTCache
+
+SOURCE = "int square(int x) { return x * x; } int main() { return square(3); }"
+
+
+def encode(program) -> bytes:
+    return ASTArena.from_program(program).to_bytes()
+
+
+def test_second_load_is_a_hit(tmp_path):
+    cache = ASTCache(str(tmp_path))
+    first = cache.load_or_parse(SOURCE)
+    second = ASTCache(str(tmp_path)).load_or_parse(SOURCE)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert encode(second) == encode(first)
+    assert cache.load(SOURCE + " ") is None
+
+
+def test_corrupt_entries_are_parsed_again(tmp_path):
+    cache = ASTCache(str(tmp_path))
+    expected = encode(cache.load_or_parse(SOURCE))
+    with open(cache.path(cache.key(SOURCE)), 'wb') as f:
+        f.write(b"not an arena")
+    assert encode(cache.load_or_parse(SOURCE)) == expected
+    assert cache.misses == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ASTCache(str(tmp_path))
+    sources = [SOURCE.replace("3", str(n)) for n in range(4)]
+    for source in sources:
+        cache.load_or_parse(source)
+    size = os.path.getsize(cache.path(cache.key(sources[0])))
+    for age, source in enumerate(sources):
+        os.utime(cache.path(cache.key(source)), (age, age))
+    cache.max_bytes = 2 * size
+    cache.evict()
+    assert [cache.load(source) is not None for source in sources] == [False, False, True, True]
+
+
+def test_unwritable_cache_still_parses(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = ASTCache(str(blocker / "cache"))
+    assert cache.load_or_parse(SOURCE).declarations[1].name == 'main'
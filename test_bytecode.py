@@ -0,0 +1,41 @@
+import marshal
+
+import pytest
+
+from bytecode import BINARY_CONST, BINARY_LOCAL, BYTECODE_FORMAT, Module, VirtualMachine, compile_program, disassemble
+from lexer import regex_lexer
+from parser import CParser
+
+
+def compile_source(source: str):
+    return compile_program(CParser(regex_lexer(source, skip_newlines=True)).parse())
+
+
+def test_recursion_is_not_bounded_by_python():
+    module = compile_source("""int sum(int n) { if (n == 0) return 0; return n + sum(n - 1); }
+                               int main() { return sum(50000); }""")
+    assert VirtualMachine(module).run() == 1250025000
+
+
+def test_runaway_recursion_overflows_the_frame_stack():
+    module = compile_source("int f(int n) { return f(n + 1) + 1; } int main() { return f(0); }")
+    with pytest.raises(RuntimeError, match="Stack overflow"):
+        VirtualMachine(module, max_depth=1000).run()
+
+
+def test_modules_round_trip_through_bytes():
+    module = compile_source("""int scale = 3;
+                               int f(int a, int b) { int s = 0; for (int i = 0; i < b; i++) s += a * i; return s; }
+                               int main() { return f(scale, 5) + (scale > 2 ? 100 : 0); }""")
+    restored = Module.from_bytes(module.to_bytes())
+    assert disassemble(restored) == disassemble(module)
+    assert VirtualMachine(restored).run() == VirtualMachine(module).run() == 130
+    with pytest.raises(ValueError, match="Bytecode format"):
+        Module.from_bytes(marshal.dumps((BYTECODE_FORMAT - 1, [], [], [])))
+
+
+def test_constant_and_local_operands_are_fused():
+    module = compile_source("int main() { int a = 2; int b = a * 7; return b - a; }")
+    ops = list(module.functions[0].ops)
+    assert BINARY_CONST in ops and BINARY_LOCAL in ops
+    assert VirtualMachine(module).run() == 12
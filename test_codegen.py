@@ -0,0 +1,36 @@
+import shutil
+
+import pytest
+
+from codegen import CodegenError, check_against_interpreter, generate_assembly
+from lexer import regex_lexer
+from parser import CParser
+
+SOURCES = [
+    """int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+       int main() { return fib(12); }""",
+    """int total = 3;
+       int mix(int a, int b, int c, int d, int e, int f, int g, int h) { return a + b * c - d + e * f + g - h; }
+       int main() { int s = 0;
+         for (int i = 0; i < 20; i++) { if (i % 3 == 0) continue; if (i > 15) break; s += i << 1; }
+         total += s; return mix(1, 2, 3, 4, 5, 6, 7, 8) + total / 4 + (s > 10 && !(s & 1)) + (s ? 5 : 6); }""",
+]
+
+
+def parse(source: str):
+    return CParser(regex_lexer(source, skip_newlines=True)).parse()
+
+
+@pytest.mark.skipif(shutil.which('cc') is None or shutil.which('ld') is None, reason="needs a C toolchain")
+def test_executables_agree_with_the_interpreter():
+    for source in SOURCES:
+        for linker in ('cc', 'ld'):
+            actual, expected = check_against_interpreter(source, linker)
+            assert actual == expected
+
+
+def test_unsupported_constructs_are_reported():
+    with pytest.raises(CodegenError, match="literal"):
+        generate_assembly(parse("int main() { return 1.5; }"))
+    with pytest.raises(CodegenError, match="not an integer constant"):
+        generate_assembly(parse("int f() { return 1; } int g = f(); int main() { return g; }"))
@@ -0,0 +1,53 @@
+import pytest
+
+from ast_arena import ASTArena
+from benchmark import load_interpreter
+from incremental import IncrementalDocument
+
+interpreter = load_interpreter()
+
+SOURCE = """int square(int x) { return x * x; }
+int limit = 10;
+int cube(int x) { return x * square(x); }
+int main() { return cube(2) + limit; }
+"""
+
+
+def same_tree(first, second):
+    return ASTArena.from_program(first).to_bytes() == ASTArena.from_program(second).to_bytes()
+
+
+def test_edit_reparses_only_the_declarations_it_touches():
+    document = IncrementalDocument(SOURCE)
+    before = list(document.program.declarations)
+    program = document.apply_edit(SOURCE.index("x * square"), 1, "2")
+    assert document.reparsed == 1
+    assert [a is b for a, b in zip(before, program.declarations)] == [True, True, False, True]
+    assert same_tree(program, IncrementalDocument(document.source).program)
+
+
+def test_edits_that_add_or_break_declarations():
+    document = IncrementalDocument(SOURCE)
+    offset = SOURCE.index("int main")
+    program = document.apply_edit(offset, 0, "int two() { return 2; }\n")
+    assert [decl.name for decl in program.declarations] == ["square", "limit", "cube", "two", "main"]
+    edited = document.source
+    assert same_tree(program, IncrementalDocument(edited).program)
+
+    with pytest.raises(SystemExit):
+        document.apply_edit(offset, 0, "int (")
+    program = document.apply_edit(offset, 5, "")
+    assert document.source == edited
+    assert same_tree(program, IncrementalDocument(edited).program)
+
+
+def test_edited_document_runs_again():
+    source = """int fill(int n) { int a[4]; int x = n; int *p = &x;
+                  for (int i = 0; i < 4; i++) a[i] = *p + i; return a[3]; }
+                int main() { return fill(1); }"""
+    document = IncrementalDocument(source)
+    assert interpreter.CInterpreter().interpret(document.program) == 4
+    program = document.apply_edit(source.index("1)"), 1, "5")
+    assert document.reparsed < len(program.declarations)
+    assert interpreter.CInterpreter().interpret(program) == 8
+    assert interpreter.CInterpreter().interpret(program) == 8
@@ -0,0 +1,190 @@
+import pytest
+
+from ast_arena import ASTArena
+from benchmark import load_interpreter
+from lexer import regex_lexer
+from parser import CParser
+
+interpreter = load_interpreter()
+
+
+def parse(source: str, engine: str = 'recursive'):
+    return CParser(regex_lexer(source, skip_newlines=True), engine).parse()
+
+
+# Programs every engine must agree on, with their results
+PROGRAMS = [
+    ("""int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+        int main() { return fib(15); }""", 610),
+    ("""int counter = 5;
+        int bump(int by) { counter += by; return counter; }
+        int main() { bump(2); bump(3); return counter; }""", 10),
+    ("""int main() { int s = 0;
+          for (int i = 0; i < 10; i++) { if (i == 7) break; if (i % 2) continue; s += i; }
+          int j = 0; while (1) { j++; if (j > 4) break; }
+          return s * 10 + j; }""", 125),
+    ("""int calls = 0;
+        int touch() { calls++; return 1; }
+        int main() { int a = 0 && touch(); int b = 1 || touch(); int c = 1 && touch();
+          return a + b * 10 + c * 100 + calls * 1000 + (calls ? 2 : 3) * 10000; }""", 21110),
+    ("""int main() { int x = 17; x -= 2; x *= 3; x /= 4; x %= 7; int y = x++ + ++x;
+          return (y << 4 | 3) ^ ~x & 255; }""", 90),
+]
+
+
+def test_stack_engine_runs_deeply_nested_expressions():
+    nesting = 20000
+    source = "int main() { return " + "(1 + " * nesting + "1" + ")" * nesting + "; }"
+    program = parse(source, 'stack')
+    assert interpreter.CInterpreter(engine='stack').interpret(program) == nesting + 1
+
+
+def test_vectorised_loops_match_the_scalar_path_past_int64():
+    sources = [
+        """int main() { long a[4]; for (int i = 0; i < 4; i++) a[i] = 4611686018427387904;
+           long s = 0; for (int i = 0; i < 4; i++) s += a[i]; return s == 0; }""",
+        """int main() { long a[4]; long b[4]; for (int i = 0; i < 4; i++) a[i] = 4294967296;
+           for (int i = 0; i < 4; i++) b[i] = a[i] * a[i] / 3; return b[2] % 1000; }""",
+    ]
+    for source in sources:
+        results = [interpreter.CInterpreter('tree', vectorize=enabled).interpret(parse(source))
+                   for enabled in (False, True)]
+        assert results[0] == results[1]
+
+
+def test_every_engine_runs_casts():
+    source = "int main() { double d = 7.9; int x = (int)d; return x + sizeof(long) + (char)300; }"
+    for engine in interpreter.CInterpreter.ENGINES:
+        assert interpreter.CInterpreter(engine).interpret(parse(source)) == 59
+
+
+def test_every_engine_runs_arena_views():
+    source = """int square(int x) { return x * x; }
+                int main() { int s = 0; for (int i = 0; i < 4; i++) s += square(i); return s; }"""
+    arena = ASTArena.from_bytes(ASTArena.from_program(parse(source)).to_bytes())
+    for engine in interpreter.CInterpreter.ENGINES:
+        assert interpreter.CInterpreter(engine).interpret(arena.root) == 14
+
+
+def test_tail_calls_free_the_stack_memory_they_no_longer_need():
+    source = """int sum(int n, int acc) { int a[64]; a[n % 64] = n;
+                  if (n == 0) return acc; return sum(n - 1, acc + a[n % 64]); }
+                int walk(int *p, int n) { int b[4]; b[1] = n; if (n == 0) return p[1]; return walk(b, n - 1); }
+                int main() { return sum(20000, 0) + walk(0, 3); }"""
+    run = interpreter.CInterpreter(memory_budget=1024 * 1024)
+    assert run.interpret(parse(source)) == 200010000 + 1
+
+
+def test_typed_runs_leave_the_program_untouched():
+    source = "int main() { int a = -7; int b = 2147483647; return a / 2 * 10 + (b + 1 > 0); }"
+    program = parse(source)
+    for engine in interpreter.CInterpreter.TYPED_ENGINES:
+        assert interpreter.CInterpreter(engine, typed=True).interpret(program) == -30
+        assert interpreter.CInterpreter(engine).interpret(program) == -39
+        assert interpreter.CInterpreter(engine, typed=True).interpret(program) == -30
+
+
+def test_closure_engine_runs_the_programs():
+    for source, expected in PROGRAMS:
+        assert interpreter.CInterpreter('closure').interpret(parse(source)) == expected
+
+
+def test_missing_main_is_reported_by_every_engine():
+    for engine in interpreter.CInterpreter.ENGINES:
+        with pytest.raises(RuntimeError, match="No main"):
+            interpreter.CInterpreter(engine).interpret(parse("int f() { return 1; }"))
+
+
+def test_hot_functions_are_transpiled_and_agree_with_the_tree_walker():
+    for source, expected in PROGRAMS:
+        assert interpreter.CInterpreter('tree', hot_threshold=2).interpret(parse(source)) == expected
+    source = """int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+                int sum(int n) { int a[2]; a[0] = n; return a[0] + (n ? sum(n - 1) : 0); }
+                int main() { return fib(12) + sum(10); }"""
+    tiered = interpreter.CInterpreter('tree', hot_threshold=2)
+    assert tiered.interpret(parse(source)) == 144 + 55
+    assert set(tiered.native) == {'fib'} and 'sum' in tiered.untranslatable
+    untiered = interpreter.CInterpreter('tree', hot_threshold=None)
+    assert untiered.interpret(parse(source)) == 144 + 55 and untiered.native == {}
+
+
+def test_loop_forms_and_completion_signals():
+    source = """int none() { }
+                int find(int limit) { for (int i = 0; ; i++) { if (i * i > limit) return i; } }
+                int main() {
+                  int s = 0; int i = 0;
+                  for (;;) {
+                    if (++i > 5) break;
+                    for (int j = 0; j < 5; j++) { if (j == i) break; if (j % 2) continue; s++; }
+                  }
+                  int k = 0; while (k < 10) { k++; if (k % 3) continue; s += 100; }
+                  for (i = 0; i < 4; i++) continue;
+                  return s + i * 1000 + find(50) * 10000 + none(); }"""
+    untiered = interpreter.CInterpreter('tree', hot_threshold=None)
+    assert untiered.interpret(parse(source)) == 84309
+    tiered = interpreter.CInterpreter('tree', hot_threshold=1)
+    assert tiered.interpret(parse(source)) == 84309 and set(tiered.native) == {'none', 'find', 'main'}
+    for engine in interpreter.CInterpreter.ENGINES[1:]:
+        assert interpreter.CInterpreter(engine).interpret(parse(source)) == 84309
+
+
+def test_pure_functions_are_memoized_with_lru_eviction():
+    source = """int calls = 0;
+                int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+                int count(int n) { calls++; return n; }
+                int main() { return fib(25) + count(1) + count(1) + calls; }"""
+    memoized = interpreter.CInterpreter('tree', hot_threshold=None, memoize=True)
+    assert memoized.interpret(parse(source)) == 75025 + 4
+    assert set(memoized.memo) == {'fib'}
+    assert memoized.memo_misses == 26 and memoized.memo_hits == 23
+
+    bounded = interpreter.CInterpreter('tree', hot_threshold=None, memoize=True, memo_size=3)
+    assert bounded.interpret(parse(source)) == 75025 + 4
+    assert list(bounded.memo['fib']) == [(24,), (23,), (25,)]  # the hit on 23 refreshed it
+    assert len(bounded.memo['fib']) == 3
+
+
+def test_tail_calls_run_in_constant_python_stack():
+    source = """int count(int n, int acc) { if (n == 0) return acc; return count(n - 1, acc + 2); }
+                int even(int n) { if (n == 0) return 1; return odd(n - 1); }
+                int odd(int n) { if (n == 0) return 0; return even(n - 1); }
+                int main() { return count(100000, 0) + even(50001); }"""
+    for threshold in (None, 50):
+        run = interpreter.CInterpreter('tree', hot_threshold=threshold)
+        assert run.interpret(parse(source)) == 200000
+        assert not {'even', 'odd'} & set(run.native)
+
+
+def test_stack_engine_runs_the_programs_and_deep_recursion():
+    for source, expected in PROGRAMS:
+        assert interpreter.CInterpreter('stack').interpret(parse(source)) == expected
+    source = """int sum(int n) { if (n == 0) return 0; return n + sum(n - 1); }
+                int main() { return sum(20000); }"""
+    assert interpreter.CInterpreter('stack').interpret(parse(source)) == 200010000
+    with pytest.raises(RuntimeError, match="Stack overflow"):
+        interpreter.CInterpreter('stack', memory_budget=64 * 1024).interpret(parse(source))
+
+
+def test_compound_assignment_reads_its_target_first_on_every_engine():
+    source = """int g = 3;
+                int f(int a) { a *= (a = -2); return a; }
+                int h() { g -= (g = 10); return g; }
+                int main() { int s = 0; for (int i = 0; i < 3; i++) { g = 3; s = f(1) * 100 + h(); } return s; }"""
+    expected = -200 - 7
+    for engine in interpreter.CInterpreter.ENGINES:
+        assert interpreter.CInterpreter(engine).interpret(parse(source)) == expected
+    for engine in interpreter.CInterpreter.TYPED_ENGINES:
+        assert interpreter.CInterpreter(engine, typed=True).interpret(parse(source)) == expected
+    tiered = interpreter.CInterpreter('tree', hot_threshold=1)
+    assert tiered.interpret(parse(source)) == expected and 'f' in tiered.native
+    in_memory = "int main() { int b[2]; b[1] = 1; b[1] += (b[1] = 5); return b[1]; }"
+    assert interpreter.CInterpreter('tree').interpret(parse(in_memory)) == 6
+
+
+def test_globals_written_through_pointers_are_not_memoized():
+    source = """int g = 1;
+                int get() { return g; }
+                int set(int v) { int *p = &g; *p = v; return 0; }
+                int main() { int a = get(); set(5); return a * 10 + get(); }"""
+    memoized = interpreter.CInterpreter('tree', memoize=True)
+    assert memoized.interpret(parse(source)) == 15 and memoized.memo == {}
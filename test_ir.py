@@ -0,0 +1,52 @@
+from ir import IRInterpreter, liveness, lower_program, reaching_definitions
+from lexer import regex_lexer
+from parser import CParser
+
+SOURCE = """int limit = 10;
+int collatz(int n) {
+  int steps = 0;
+  while (n != 1) { if (n % 2) n = 3 * n + 1; else n = n / 2; steps++; }
+  return steps; }
+int main() { int s = 0;
+  for (int i = 1; i < limit; i++) { if (i == 7) continue; s += collatz(i); if (s > 100) break; }
+  return s && limit > 3 ? s : -1; }
+"""
+
+
+def lower(source: str, ssa: bool = True):
+    return lower_program(CParser(regex_lexer(source, skip_newlines=True)).parse(), ssa)
+
+
+def definitions(function):
+    return [inst.dest for block in function.blocks for inst in block.instructions if inst.dest]
+
+
+def test_ssa_form_assigns_each_name_once_and_runs_like_the_plain_form():
+    ssa = lower(SOURCE)
+    plain = lower(SOURCE, ssa=False)
+    for function in ssa.functions.values():
+        names = definitions(function)
+        assert len(names) == len(set(names))
+    loop = ssa.functions['collatz']
+    assert any(block.phis() for block in loop.blocks)
+    names = definitions(plain.functions['collatz'])
+    assert len(names) > len(set(names))
+    assert IRInterpreter(ssa).run() == IRInterpreter(plain).run() == 45
+
+
+def test_liveness_and_reaching_definitions():
+    function = lower("int f(int a, int b) { int c = a; if (b) c = b; return c; }", ssa=False).functions['f']
+    then_block, exit_block = function.blocks[1], function.blocks[2]
+    assert exit_block.terminator.op == 'ret'
+    c = exit_block.terminator.args[0]
+    live_in, _ = liveness(function)
+    assert live_in[function.entry.label] == frozenset()
+    assert live_in[exit_block.label] == {c}
+    reaching_in, _ = reaching_definitions(function)
+    assert {d for d in reaching_in[exit_block.label] if d[0] == c} == {(c, 'entry', 2), (c, then_block.label, 0)}
+
+    ssa = lower("int f(int a, int b) { int c = a; if (b) c = b; return c; }").functions['f']
+    merge = ssa.blocks[-1].phis()
+    assert len(merge) == 1 and len(set(merge[0].args)) == 2
+    live_in, _ = liveness(ssa)
+    assert live_in[ssa.blocks[-1].label] == frozenset()  # phi operands are live on the edges
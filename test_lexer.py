@@ -0,0 +1,93 @@
+from lexer import SymbolTable, TokenStream, TokenType, file_lexer, lexer, regex_lexer
+
+SOURCE = """int main() {
+    // comment
+    char *s = "a\\tb"; /* block
+    comment */int x = 3.25 + 'c';
+    if (x >= 2 && x != 4) x <<= 1; else x->y++;
+    return x;
+}
+"""
+
+
+def drain(source_lexer):
+    """(type, val) of every token up to and including EOF"""
+    tokens = []
+    while True:
+        token = source_lexer.get_token()
+        tokens.append((token.type, token.val))
+        if token.type is TokenType.EOF:
+            return tokens
+
+
+def test_regex_lexer_matches_the_reference_lexer():
+    assert drain(regex_lexer(SOURCE)) == drain(lexer(SOURCE))
+
+
+def test_regex_lexer_records_token_offsets():
+    source_lexer = regex_lexer("int  x = 42;")
+    positions = [source_lexer.get_token().pos for _ in range(5)]
+    assert positions == [0, 5, 7, 9, 11]
+
+
+def test_keywords_are_case_exact():
+    for source_lexer in (lexer, regex_lexer):
+        types = [token_type for token_type, _ in drain(source_lexer("while While INT int"))]
+        assert types[:4] == [TokenType.WHILE, TokenType.IDENT, TokenType.IDENT, TokenType.INT]
+
+
+def test_identifiers_are_interned_in_a_shared_symbol_table():
+    symbols = SymbolTable()
+    first = regex_lexer("count total count", symbols)
+    second = lexer("total count", symbols)
+    ids = [first.get_token().id for _ in range(3)] + [second.get_token().id for _ in range(2)]
+    assert ids == [0, 1, 0, 1, 0]
+    assert len(symbols) == 2 and symbols.name(1) == "total"
+
+
+def test_token_buffer_stores_offsets_and_locates_them_lazily():
+    buffer = regex_lexer("int x;\n  x = 10;").tokenize()
+    assert [buffer.token(i).val for i in range(len(buffer))] == ["int", "x", ";", "x", "=", "10", ";", "EOF"]
+    assert list(buffer.starts[:6]) == [0, 4, 5, 9, 11, 13] and buffer.lengths[5] == 2
+    assert buffer.lines is None
+    assert buffer.location(buffer.starts[5]) == (2, 7)
+
+
+def test_token_buffer_peeks_and_stays_on_eof():
+    buffer = regex_lexer("a b").tokenize()
+    assert buffer.peek(2).val == "b" and buffer.peek(5).type is TokenType.EOF
+    assert [buffer.get_token().val for _ in range(4)] == ["a", "b", "EOF", "EOF"]
+
+
+def test_file_lexer_matches_regex_lexer_across_chunk_boundaries(tmp_path):
+    source = SOURCE + 'char *t = "\u00e9t\u00e9";\n'
+    path = tmp_path / "source.c"
+    path.write_text(source, encoding="utf-8")
+    expected = drain(regex_lexer(source))
+    for chunk_size in (1, 3, 7, 64):
+        with file_lexer(str(path), chunk_size=chunk_size) as source_lexer:
+            assert drain(source_lexer) == expected
+
+
+def test_file_lexer_locates_tokens_and_closes_its_file(tmp_path):
+    path = tmp_path / "source.c"
+    path.write_text("int a;\nint b;\n")
+    with file_lexer(str(path), chunk_size=4, skip_newlines=True) as source_lexer:
+        tokens = [source_lexer.get_token() for _ in range(5)]
+        assert tokens[4].val == "b"
+        assert source_lexer.location(tokens[4].pos) == (2, 5)
+        assert source_lexer.location(tokens[0].pos) is None  # dropped from the window
+    assert source_lexer.file.closed
+
+
+def test_token_stream_lexes_in_batches_and_drops_newlines():
+    source_lexer = regex_lexer("a\nb\nc\nd")
+    stream = TokenStream(source_lexer, batch=2)
+    assert stream.peek(1).val == "a"
+    assert len(stream.pending) == 2
+    assert [stream.get_token().val for _ in range(6)] == ["a", "b", "c", "d", "EOF", "EOF"]
+
+
+def test_token_stream_ends_with_eof_on_a_lexer_error():
+    stream = TokenStream(regex_lexer("a $ b"))
+    assert [stream.get_token().type for _ in range(3)] == [TokenType.IDENT, TokenType.EOF, TokenType.EOF]
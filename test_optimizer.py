@@ -0,0 +1,105 @@
+from benchmark import load_interpreter
+from lexer import regex_lexer
+from optimizer import ConstantFolder, DeadCodeEliminator, Inliner, called_functions, optimize
+from parser import BinaryExpression, CParser, Identifier, Literal
+
+interpreter = load_interpreter()
+
+
+def parse(source: str):
+    return CParser(regex_lexer(source, skip_newlines=True)).parse()
+
+
+def run(source: str, **options):
+    return interpreter.CInterpreter(**options).interpret(parse(source))
+
+
+def test_nested_calls_inline_without_leaking_returns():
+    source = "int h(int x) { return x + 1; } int k(int x) { return h(h(x)); } int main() { return k(k(1)); }"
+    for engine in interpreter.CInterpreter.ENGINES:
+        assert run(source, engine=engine, optimize=True) == 5
+
+
+def returned_expression(program, function: int = -1):
+    return program.declarations[function].body.statements[-1].expression
+
+
+def folded(source: str, typed: bool = False):
+    folder = ConstantFolder(typed)
+    return returned_expression(folder.run(parse(source))), folder
+
+
+def test_constants_fold_and_identities_simplify():
+    expr, folder = folded("int f(int x) { return (x + 2) + 3 * 4 - 0; }")
+    assert isinstance(expr, BinaryExpression) and expr.operator == '+'
+    assert isinstance(expr.left, Identifier) and expr.right.value == 14
+    assert folder.folded and folder.simplified
+
+    expr, _ = folded("int f(int x) { return 1 ? x * 1 : x; }")
+    assert isinstance(expr, Identifier)
+
+
+def test_folding_keeps_run_time_behaviour():
+    expr, _ = folded("int f() { return -7 / 2; }")
+    assert not isinstance(expr, Literal)  # truncating and flooring division disagree
+    expr, _ = folded("int g() { return 1; } int f() { return g() * 0; }")
+    assert isinstance(expr, BinaryExpression)  # the call still has to run
+    expr, _ = folded("int f() { return 2147483647 + 1; }", typed=True)
+    assert not isinstance(expr, Literal)  # wraps at run time
+    source = "int main() { int x = 5; return (x * 0 + 7) % 4 + (-7 / 2) * (3 << 2) + (x * 2) * 3; }"
+    for typed in (False, True):
+        assert run(source, optimize=True, typed=typed) == run(source, typed=typed)
+
+
+def test_dead_code_is_removed():
+    source = """int unused(int x) { return x; }
+                int helper() { return 2; }
+                int seen = 0;
+                int effect() { seen++; return 1; }
+                int main() {
+                  int dead = 5; int kept = effect();
+                  while (0) { kept++; }
+                  if (kept) { return helper() + kept; } else { return 0; }
+                  kept = 3;
+                }"""
+    program = parse(source)
+    eliminator = DeadCodeEliminator()
+    eliminator.run(program)
+    assert [decl.name for decl in program.declarations] == ['helper', 'seen', 'effect', 'main']
+    assert len(program.declarations[-1].body.statements) == 2
+    assert (eliminator.functions, eliminator.locals) == (1, 1) and eliminator.statements >= 2
+    assert run(source, optimize=True) == run(source) == 3
+
+
+def test_dead_code_keeps_side_effects_of_unread_locals():
+    source = """int seen = 0;
+                int effect() { seen++; return 1; }
+                int main() { int unread = effect(); unread = effect(); return seen; }"""
+    for engine in interpreter.CInterpreter.ENGINES:
+        assert run(source, engine=engine, optimize=True) == 2
+
+
+def test_small_functions_are_inlined():
+    source = """int twice(int x) { return x + x; }
+                int clamp(int x) { if (x > 9) x = 9; return x; }
+                int fact(int n) { if (n < 2) return 1; return n * fact(n - 1); }
+                int main() { int a = twice(3); int b = clamp(a * 2); return twice(b) + fact(4); }"""
+    program = parse(source)
+    inliner = Inliner()
+    inliner.run(program)
+    assert called_functions(program.declarations[-1]) == {'fact'}
+    assert inliner.expressions == 2 and inliner.statements == 1
+    for engine in interpreter.CInterpreter.ENGINES:
+        assert run(source, engine=engine, optimize=True) == run(source) == 42
+
+
+def test_calls_that_would_change_meaning_are_not_inlined():
+    source = """int g = 1;
+                int read() { return g; }
+                int main() { int g = 5; return read() + g; }"""
+    program = parse(source)
+    Inliner().run(program)
+    assert called_functions(program.declarations[-1]) == {'read'}
+    assert run(source, optimize=True) == 6
+    typed = "int half(int x) { return x / 2; } int main() { return half(7.9) * 2; }"
+    assert run(typed, typed=True, optimize=True) == run(typed, typed=True) == 6
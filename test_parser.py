@@ -0,0 +1,61 @@
+from ast_arena import ASTArena
+from lexer import TokenStream, lexer, regex_lexer
+from parser import AssignmentExpression, BinaryExpression, CParser, parse_file
+
+SOURCE = """
+struct point { int x; int y; };
+int f(int a, int *p, struct point *q) {
+    int b = a - 1 - 2 * 3 % 4 << 1 | a & 2 ^ 3;
+    b += a = a == 1 || b != 2 && !a < -b;
+    b = a ? b ? 1 : 2 : *p + q->x + (int)sizeof(long) + p[a++]--;
+    return ~b >= (a - b) ? f(a, p, q) : &a != p;
+}
+"""
+
+
+def parse(source: str, engine: str = 'recursive'):
+    return CParser(regex_lexer(source, skip_newlines=True), engine).parse()
+
+
+def encode(program) -> bytes:
+    return ASTArena.from_program(program).to_bytes()
+
+
+def returned(source: str, engine: str):
+    return parse("int main() { return " + source + "; }", engine).declarations[0].body.statements[0].expression
+
+
+def test_pratt_engine_builds_the_recursive_engine_tree():
+    assert encode(parse(SOURCE, 'pratt')) == encode(parse(SOURCE))
+
+
+def test_stack_engine_builds_the_recursive_engine_tree():
+    assert encode(parse(SOURCE, 'stack')) == encode(parse(SOURCE))
+    nesting = 20000
+    deep = returned("- " * nesting + "(" * nesting + "x" + ")" * nesting + "[1]", 'stack')
+    for _ in range(nesting):
+        assert deep.operator == '-'
+        deep = deep.operand
+    assert deep.array.name == 'x'
+
+
+def test_pratt_engine_associativity():
+    left = returned("a - b - c", 'pratt')
+    assert isinstance(left.left, BinaryExpression) and left.left.operator == '-'
+    right = returned("a = b = c", 'pratt')
+    assert isinstance(right.right, AssignmentExpression)
+    ternary = returned("a ? b : c ? d : e", 'pratt')
+    assert ternary.operator == ':' and ternary.right.left.left.name == 'c'
+
+
+def test_every_token_source_parses_the_same_tree():
+    expected = encode(parse(SOURCE))
+    sources = [regex_lexer(SOURCE), regex_lexer(SOURCE).tokenize(), TokenStream(lexer(SOURCE), batch=None)]
+    for source in sources:
+        assert encode(CParser(source).parse()) == expected
+
+
+def test_parse_file_matches_parsing_the_text(tmp_path):
+    path = tmp_path / "source.c"
+    path.write_text(SOURCE)
+    assert encode(parse_file(str(path), 'pratt')) == encode(parse(SOURCE))
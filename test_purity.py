@@ -0,0 +1,29 @@
+from lexer import regex_lexer
+from parser import CParser
+from purity import pure_functions
+from resolver import Resolver
+
+
+def pure(source: str) -> set:
+    return pure_functions(Resolver().resolve(CParser(regex_lexer(source, skip_newlines=True)).parse()))
+
+
+def test_pure_functions_depend_only_on_their_arguments():
+    source = """int limit = 10;
+                int counter = 0;
+                int fib(int n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+                int capped(int n) { return n > limit ? limit : fib(n); }
+                int tick() { counter++; return counter; }
+                int reads() { return counter; }
+                int uses_tick(int n) { return n + tick(); }
+                int local(int n) { int a[2]; a[0] = n; return a[0]; }
+                int address(int n) { int *p = &n; return *p; }
+                int main() { return capped(5) + uses_tick(1) + reads() + local(1) + address(1); }"""
+    assert pure(source) == {'fib', 'capped'}
+
+
+def test_mutual_recursion_stays_pure_unless_a_callee_is_impure():
+    even_odd = """int even(int n) { return n == 0 ? 1 : odd(n - 1); }
+                  int odd(int n) { return n == 0 ? 0 : even(n - 1); }"""
+    assert pure(even_odd) == {'even', 'odd'}
+    assert pure("int g = 0;\n" + even_odd.replace("1 : odd", "g++ : odd")) == set()
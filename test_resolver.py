@@ -0,0 +1,30 @@
+from lexer import regex_lexer
+from parser import CParser, Identifier
+from optimizer import iter_nodes
+from resolver import Resolver
+
+
+def resolve(source: str):
+    return Resolver().resolve(CParser(regex_lexer(source, skip_newlines=True)).parse())
+
+
+def identifiers(node):
+    return [(n.name, n.slot, n.is_global) for n in iter_nodes(node) if isinstance(n, Identifier)]
+
+
+def test_parameters_and_locals_get_frame_slots():
+    program = resolve("int f(int a, int b) { int c = a; { int a = b; c = a; } return c; }")
+    func = program.declarations[0]
+    assert identifiers(func.body) == [('a', 1, False), ('b', 2, False), ('c', 3, False),
+                                      ('a', 4, False), ('c', 3, False)]
+    assert func.frame_size == 5
+
+
+def test_globals_are_visible_after_their_declaration():
+    program = resolve("""int early() { return late; }
+                         int first = 1; int late = first;
+                         int f() { int first = 2; return first + late; }""")
+    assert program.global_count == 2
+    assert identifiers(program.declarations[0]) == [('late', None, False)]
+    assert identifiers(program.declarations[2]) == [('first', 0, True)]
+    assert identifiers(program.declarations[3].body) == [('first', 1, False), ('late', 1, True)]
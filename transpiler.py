@@ -0,0 +1,276 @@
+from typing import Callable, Dict, List
+
+from parser import *
+from closure_compiler import COMPOUND_OPS
+
+# C binary operators with a direct Python spelling (`/` floors, as in the tree walker)
+PYTHON_OPS = {'+': '+', '-': '-', '*': '*', '/': '//', '%': '%',
+              '&': '&', '|': '|', '^': '^', '<<': '<<', '>>': '>>'}
+COMPARISON_OPS = {'==', '!=', '<', '<=', '>', '>='}
+LOGICAL_OPS = {'&&': 'and', '||': 'or'}
+STEP_OPS = {'++', '--', '++_post', '--_post'}
+
+# Generated names are prefixed so C identifiers never collide with Python
+# keywords, builtins or each other. Locals also carry their frame slot, so
+# shadowing declarations in nested blocks stay distinct variables.
+LOCAL_PREFIX = 'v_'
+FUNCTION_PREFIX = 'f_'
+GLOBALS_NAME = 'g_'  # the interpreter's global table, indexed by slot
+
+
+class TranspileError(Exception):
+    """Raised for constructs the transpiler does not handle; the caller keeps interpreting"""
+
+
+class PythonTranspiler:
+    """Translates a FunctionDeclaration into the source of an equivalent Python function.
+
+    The function must have been through the Resolver. The generated
+    function takes its C parameters positionally, reads globals from the
+    g_ table and calls other C functions through module-level names
+    (f_<name>) looked up in the namespace it is compiled into, so a caller
+    picks up a callee's native version as soon as that callee is promoted.
+
+    Results match the tree walker: `/` is floor division, comparisons and
+    logical operators yield 1/0, and a function that runs off its end
+    returns 0. C loops become Python while loops; a `for` update is
+    emitted at the end of the body and again before each `continue` that
+    targets the loop. A self tail call outside loops becomes a jump back to
+    the top of the function, so tail recursion runs in constant stack.
+    Anything else raises TranspileError.
+    """
+
+    def __init__(self, arities: Dict[str, int]):
+        """arities maps every callable C function to its parameter count"""
+        self.arities = arities
+        self.lines: List[str] = []
+        self.updates: List = []  # update expression (or None) of each enclosing loop
+        self.function = None
+        self.params: List[str] = []
+        self.tail_calls = 0
+
+    def translate(self, func: FunctionDeclaration) -> str:
+        self.lines = []
+        self.updates = []
+        self.function = func
+        self.params = [local_name(param.name, i + 1) for i, param in enumerate(func.parameters)]
+        self.tail_calls = 0
+        self.translate_statement(func.body, 1)
+        self.emit(1, "return 0")
+
+        if self.tail_calls:
+            # Self tail calls rebind the parameters and `continue` this loop
+            self.lines = ['    while True:'] + ['    ' + line for line in self.lines]
+        self.lines.insert(0, f"def {FUNCTION_PREFIX}{func.name}({', '.join(self.params)}):")
+        return '\n'.join(self.lines) + '\n'
+
+    def emit(self, depth: int, line: str):
+        self.lines.append('    ' * depth + line)
+
+    def translate_statement(self, stmt, depth: int):
+        if isinstance(stmt, CompoundStatement):
+            if not stmt.statements:
+                self.emit(depth, "pass")
+            for child in stmt.statements:
+                self.translate_statement(child, depth)
+        elif isinstance(stmt, ExpressionStatement):
+            if stmt.expression is None:
+                self.emit(depth, "pass")
+            else:
+                self.translate_effect(stmt.expression, depth)
+        elif isinstance(stmt, IfStatement):
+            self.emit(depth, f"if {self.translate_condition(stmt.condition)}:")
+            self.translate_statement(stmt.then_stmt, depth + 1)
+            if stmt.else_stmt:
+                self.emit(depth, "else:")
+                self.translate_statement(stmt.else_stmt, depth + 1)
+        elif isinstance(stmt, WhileStatement):
+            self.translate_loop(stmt.condition, stmt.body, None, depth)
+        elif isinstance(stmt, ForStatement):
+            if stmt.init:
+                self.translate_statement(stmt.init, depth)
+            self.translate_loop(stmt.condition, stmt.body, stmt.update, depth)
+        elif isinstance(stmt, ReturnStatement) and self.is_self_tail_call(stmt.expression):
+            args = [self.translate_expression(arg) for arg in stmt.expression.arguments]
+            if args:
+                self.emit(depth, f"{', '.join(self.params)} = {', '.join(args)}")
+            self.emit(depth, "continue")
+            self.tail_calls += 1
+        elif isinstance(stmt, ReturnStatement):
+            value = self.translate_expression(stmt.expression) if stmt.expression else '0'
+            self.emit(depth, f"return {value}")
+        elif isinstance(stmt, BreakStatement):
+            self.emit(depth, "break")
+        elif isinstance(stmt, ContinueStatement):
+            if self.updates and self.updates[-1] is not None:
+                self.translate_effect(self.updates[-1], depth)
+            self.emit(depth, "continue")
+        elif isinstance(stmt, VariableDeclaration):
+            if stmt.size:
+                raise TranspileError(f"Array {stmt.name}")
+            value = self.translate_expression(stmt.initializer) if stmt.initializer else '0'
+            self.emit(depth, f"{local_name(stmt.name, stmt.slot)} = {value}")
+        else:
+            raise TranspileError(f"Cannot transpile {type(stmt).__name__}")
+
+    def is_self_tail_call(self, expr) -> bool:
+        """`return f(...)` inside f, outside any loop (where `continue` would hit the C loop)"""
+        return (not self.updates and isinstance(expr, FunctionCall) and isinstance(expr.function, Identifier)
+                and expr.function.name == self.function.name
+                and len(expr.arguments) == len(self.function.parameters))
+
+    def translate_loop(self, condition, body, update, depth: int):
+        test = self.translate_condition(condition) if condition else 'True'
+        self.emit(depth, f"while {test}:")
+        self.updates.append(update)
+        self.translate_statement(body, depth + 1)
+        self.updates.pop()
+        if update is not None:
+            self.translate_effect(update, depth + 1)
+
+    def translate_effect(self, expr, depth: int):
+        """Emit expr for its side effects only; assignments become Python statements"""
+        if isinstance(expr, AssignmentExpression):
+            target = self.translate_target(expr.left)
+            value = self.translate_expression(expr.right)
+            if expr.operator == '=':
+                self.emit(depth, f"{target} = {value}")
+            else:
+                op = PYTHON_OPS[COMPOUND_OPS[expr.operator]]
+                self.emit(depth, f"{target} {op}= {value}")
+        elif isinstance(expr, UnaryExpression) and expr.operator in STEP_OPS:
+            op = '+' if expr.operator.startswith('++') else '-'
+            self.emit(depth, f"{self.translate_target(expr.operand)} {op}= 1")
+        else:
+            self.emit(depth, self.translate_expression(expr))
+
+    def translate_condition(self, expr) -> str:
+        """Like translate_expression, but only truthiness matters so no 1/0 conversion is needed"""
+        if isinstance(expr, BinaryExpression):
+            if expr.operator in COMPARISON_OPS:
+                left = self.translate_expression(expr.left)
+                right = self.translate_expression(expr.right)
+                return f"{left} {expr.operator} {right}"
+            if expr.operator in LOGICAL_OPS:
+                left = self.translate_condition(expr.left)
+                right = self.translate_condition(expr.right)
+                return f"({left} {LOGICAL_OPS[expr.operator]} {right})"
+        if isinstance(expr, UnaryExpression) and expr.operator == '!':
+            return f"not ({self.translate_condition(expr.operand)})"
+        return self.translate_expression(expr)
+
+    def translate_target(self, expr) -> str:
+        if not isinstance(expr, Identifier):
+            raise TranspileError("Assignment target must be a variable")
+        return self.translate_expression(expr)
+
+    def translate_expression(self, expr) -> str:
+        if isinstance(expr, Literal):
+            return repr(expr.value)
+        elif isinstance(expr, Identifier):
+            if expr.slot is None:
+                # Let the interpreter raise the error if the read ever happens
+                raise TranspileError(f"Undefined variable {expr.name}")
+            if expr.is_global:
+                return f"{GLOBALS_NAME}[{expr.slot}]"
+            return local_name(expr.name, expr.slot)
+        elif isinstance(expr, BinaryExpression):
+            if expr.operator == ':' and isinstance(expr.left, BinaryExpression) and expr.left.operator == '?':
+                cond = self.translate_condition(expr.left.left)
+                then_expr = self.translate_expression(expr.left.right)
+                else_expr = self.translate_expression(expr.right)
+                return f"({then_expr} if {cond} else {else_expr})"
+            if expr.operator in LOGICAL_OPS:
+                return f"(1 if {self.translate_condition(expr)} else 0)"
+            left = self.translate_expression(expr.left)
+            right = self.translate_expression(expr.right)
+            if expr.operator in COMPARISON_OPS:
+                return f"(1 if {left} {expr.operator} {right} else 0)"
+            if expr.operator in PYTHON_OPS:
+                return f"({left} {PYTHON_OPS[expr.operator]} {right})"
+            raise TranspileError(f"Operator {expr.operator}")
+        elif isinstance(expr, UnaryExpression):
+            if expr.operator in STEP_OPS:
+                target = self.assignable_local(expr.operand)
+                op = '+' if expr.operator.startswith('++') else '-'
+                if expr.operator.endswith('_post'):
+                    undo = '-' if op == '+' else '+'
+                    return f"(({target} := {target} {op} 1) {undo} 1)"
+                return f"({target} := {target} {op} 1)"
+            operand = self.translate_expression(expr.operand)
+            if expr.operator == '!':
+                return f"(0 if {operand} else 1)"
+            if expr.operator in ('-', '+', '~'):
+                return f"({expr.operator}{operand})"
+            raise TranspileError(f"Operator {expr.operator}")
+        elif isinstance(expr, AssignmentExpression):
+            target = self.assignable_local(expr.left)
+            value = self.translate_expression(expr.right)
+            if expr.operator != '=':
+                value = f"({target} {PYTHON_OPS[COMPOUND_OPS[expr.operator]]} {value})"
+            return f"({target} := {value})"
+        elif isinstance(expr, FunctionCall):
+            if not isinstance(expr.function, Identifier) or expr.function.name not in self.arities:
+                raise TranspileError("Call to unknown function")
+            if self.arities[expr.function.name] != len(expr.arguments):
+                raise TranspileError(f"Arity mismatch calling {expr.function.name}")
+            args = ', '.join(self.translate_expression(arg) for arg in expr.arguments)
+            return f"{FUNCTION_PREFIX}{expr.function.name}({args})"
+
+        raise TranspileError(f"Cannot transpile {type(expr).__name__}")
+
+    def assignable_local(self, expr) -> str:
+        """Target of an assignment used as a value; := can't store into the global table"""
+        target = self.translate_target(expr)
+        if expr.is_global:
+            raise TranspileError("Assignment to a global inside an expression")
+        return target
+
+
+def tail_calls(stmt) -> set:
+    """Names of the functions stmt calls in tail position (`return f(...)`)"""
+    if isinstance(stmt, ReturnStatement):
+        expr = stmt.expression
+        if isinstance(expr, FunctionCall) and isinstance(expr.function, Identifier):
+            return {expr.function.name}
+    elif isinstance(stmt, CompoundStatement):
+        return set().union(*(tail_calls(child) for child in stmt.statements))
+    elif isinstance(stmt, IfStatement):
+        return tail_calls(stmt.then_stmt) | (tail_calls(stmt.else_stmt) if stmt.else_stmt else set())
+    elif isinstance(stmt, (WhileStatement, ForStatement)):
+        return tail_calls(stmt.body)
+    return set()
+
+
+def mutual_tail_recursion(functions: Dict[str, FunctionDeclaration]) -> set:
+    """Functions on a cycle of tail calls through other functions.
+
+    The interpreter runs such cycles in constant stack, but transpiled code
+    only turns self tail calls into loops, so these must stay interpreted.
+    """
+    edges = {name: tail_calls(func.body) - {name} for name, func in functions.items()}
+    cyclic = set()
+    for start in functions:
+        pending, seen = list(edges[start]), set()
+        while pending:
+            name = pending.pop()
+            if name == start:
+                cyclic.add(start)
+                break
+            if name in seen or name not in edges:
+                continue
+            seen.add(name)
+            pending.extend(edges[name])
+    return cyclic
+
+
+def local_name(name: str, slot: int) -> str:
+    return f"{LOCAL_PREFIX}{name}_{slot}"
+
+
+def compile_function(func: FunctionDeclaration, arities: Dict[str, int], namespace: dict) -> Callable:
+    """Transpile func, compile it into namespace and return the resulting Python function"""
+    source = PythonTranspiler(arities).translate(func)
+    code = compile(source, f"<transpiled {func.name}>", 'exec')
+    exec(code, namespace)
+    return namespace[FUNCTION_PREFIX + func.name]
@@ -0,0 +1,516 @@
+from typing import Dict, List, Optional, Tuple
+
+from parser import *
+from closure_compiler import COMPOUND_OPS
+from memory import NULL_GUARD, MemoryLayout, format_of
+from optimizer import iter_nodes
+from resolver import Resolver
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # every loop runs element by element
+
+# Element-wise operators a vector loop may use. They apply to NumPy arrays
+# and Python numbers alike; `/` floors, as in the tree walker.
+VECTOR_OPS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a // b,
+    '%': lambda a, b: a % b,
+    '&': lambda a, b: a & b,
+    '|': lambda a, b: a | b,
+    '^': lambda a, b: a ^ b,
+    '<<': lambda a, b: a << b,
+    '>>': lambda a, b: a >> b,
+}
+
+# `s += e` and `s -= e` accumulate a sum over the whole loop
+REDUCTION_OPS = {'+=': '+', '-=': '-'}
+
+# Elements are computed on at full width, as the scalar path does with Python
+# numbers, and narrowed (integers wrapping) when stored
+WIDE_TYPES = {'int': 'q', 'float': 'd'}
+
+# The scalar path computes with unbounded integers. int64 results of these
+# operators still agree with it modulo 2**64, which is all a store of at most
+# 8 bytes keeps; the others need operands (and results) that fit in int64.
+WRAPPING_OPS = {'+', '-', '*', '&', '|', '^', '<<'}
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# bounds() of a floating point value
+FLOATING = (float('-inf'), float('inf'))
+
+
+class VectorLoop:
+    """A counted loop whose body can run as whole-array operations.
+
+    The loop has the form `for (init; i < bound; i += step) body` (also
+    `<=`, `i++` and `i = i + step`) with a constant positive step and a
+    bound the body cannot change. Every body statement is either a store
+    `a[index] = value` / `a[index] op= value` or a reduction `s += value` /
+    `s -= value`, where each index is affine in i (scale * i + offset,
+    scale >= 1) and values combine array elements, i and loop-invariant
+    scalars with arithmetic operators. A reduction variable appears nowhere
+    else in the loop, so the sum can be taken at the end.
+
+    Whether the loop is dependence free is settled in `run`, once the
+    addresses and offsets are known: the bytes a written access covers may
+    only be touched by accesses to the very same elements, so iterations
+    touch disjoint elements and the statements can run one after the other
+    over the whole range. Accesses are NumPy views straight onto the
+    interpreter's Memory. Float sums may round differently from the
+    element by element order.
+
+    Integers are computed on as int64, so `run` also bounds every value
+    over the loop's range and requires the result to be the scalar path's:
+    exact, or congruent modulo 2**64 where it only feeds wrapping operators
+    and an integer store. Integer sums that could leave int64 are added up
+    with Python integers.
+    """
+
+    def __init__(self, variable: Identifier, bound, inclusive: bool, step: int) -> None:
+        self.variable = variable
+        self.bound = bound
+        self.inclusive = inclusive
+        self.step = step
+        self.statements: List[Tuple] = []      # (target, operator, value), in body order
+        self.accesses: Dict[ArrayAccess, Tuple] = {}    # -> (scale, [(coefficient, term)], written)
+        self.invariants: List = []              # maximal loop-invariant subexpressions of the values
+
+    def run(self, interpreter) -> bool:
+        """Execute the loop (its init clause has run) with NumPy.
+
+        Returns False, having changed nothing, if this execution can't be
+        vectorised: NumPy is missing, an operand is not a number, an access
+        would leave mapped memory, a written element range overlaps one
+        accessed at other elements (possibly through another pointer), or
+        int64 arithmetic could give a different result. The caller then runs
+        the loop element by element.
+        """
+        if numpy is None:
+            return False
+        evaluate = interpreter.evaluate_expression
+        start = evaluate(self.variable)
+        bound = evaluate(self.bound)
+        if type(start) is not int or type(bound) is not int:
+            return False
+        if self.inclusive:
+            bound += 1
+        count = max(0, -((start - bound) // self.step))
+        if count == 0:
+            return True
+        indices = (start, start + (count - 1) * self.step)
+        if not self.fits(indices):
+            return False
+
+        values = {}
+        for expr in self.invariants:
+            value = evaluate(expr)
+            if type(value) not in (int, float) or type(value) is int and not self.fits((value, value)):
+                return False
+            values[expr] = value
+        for target, _, _ in self.statements:
+            if isinstance(target, Identifier) and type(evaluate(target)) not in (int, float):
+                return False
+
+        data = interpreter.memory.data
+        views = {}
+        touched = []
+        for access, (scale, terms, written) in self.accesses.items():
+            base = evaluate(access.array)
+            if type(base) is not int:
+                return False
+            offset = 0
+            for coefficient, term in terms:
+                value = evaluate(term)
+                if type(value) is not int:
+                    return False
+                offset += coefficient * value
+            size = access.ctype.size
+            first = base + (scale * start + offset) * size
+            stride = scale * self.step * size
+            end = first + stride * (count - 1) + size
+            if first < NULL_GUARD or end > len(data) or first % size:
+                return False
+            fmt = format_of(access.ctype)
+            view = numpy.frombuffer(data, numpy.dtype(fmt), (end - first) // size, first)
+            views[access] = view[::stride // size]
+            touched.append((first, end, stride, fmt, written))
+        for first, end, stride, fmt, written in touched:
+            if written and any(other_first < end and first < other_end and (other_first, other_stride, other_fmt)
+                               != (first, stride, fmt)
+                               for other_first, other_end, other_stride, other_fmt, _ in touched):
+                return False
+
+        spans = []
+        for target, operator, value in self.statements:
+            span = self.bounds(value, values, views, indices)
+            if span is not None and isinstance(target, ArrayAccess) and operator != '=':
+                span = self.combine(operator, self.element_bounds(views[target]), span)
+            if span is None:
+                return False
+            # Only an integer store wraps; a float store or a sum needs exact values
+            if not (isinstance(target, ArrayAccess) and views[target].dtype.kind != 'f' or self.fits(span)):
+                return False
+            spans.append(span)
+
+        index = numpy.arange(start, start + count * self.step, self.step)
+        try:
+            with numpy.errstate(divide='raise'):
+                for (target, operator, value), span in zip(self.statements, spans):
+                    result = self.compute(value, values, views, index)
+                    if isinstance(target, ArrayAccess):
+                        view = views[target]
+                        if operator != '=':
+                            result = VECTOR_OPS[operator](self.widen(view), result)
+                        numpy.copyto(view, numpy.asarray(result), casting='unsafe')
+                    else:
+                        if not isinstance(result, numpy.ndarray):
+                            total = result * count
+                        elif span is FLOATING or max(-span[0], span[1]) * count <= INT64_MAX:
+                            total = result.sum().item()
+                        else:
+                            total = sum(result.tolist())
+                        interpreter.store(target, VECTOR_OPS[operator](evaluate(target), total))
+        except FloatingPointError:
+            raise ZeroDivisionError("division by zero in a vectorised loop")
+        interpreter.store(self.variable, start + count * self.step)
+        return True
+
+    def compute(self, expr, values: dict, views: dict, index):
+        """Value of expr over all iterations: an ndarray, or a number if it is loop invariant"""
+        if expr in values:
+            return values[expr]
+        if isinstance(expr, Identifier):
+            return index
+        if isinstance(expr, ArrayAccess):
+            return self.widen(views[expr])
+        if isinstance(expr, BinaryExpression):
+            return VECTOR_OPS[expr.operator](self.compute(expr.left, values, views, index),
+                                             self.compute(expr.right, values, views, index))
+        operand = self.compute(expr.operand, values, views, index)
+        return -operand if expr.operator == '-' else operand
+
+    @staticmethod
+    def widen(view):
+        """A copy of the elements as int64 or float64"""
+        return view.astype(WIDE_TYPES['float' if view.dtype.kind == 'f' else 'int'])
+
+    def bounds(self, expr, values: dict, views: dict, indices: Tuple[int, int]) -> Optional[Tuple]:
+        """(low, high) of expr's exact values over all iterations, FLOATING for floats,
+        or None if `compute` may not reproduce them even modulo 2**64"""
+        if expr in values:
+            value = values[expr]
+            return FLOATING if type(value) is float else (value, value)
+        if isinstance(expr, Identifier):
+            return indices
+        if isinstance(expr, ArrayAccess):
+            return self.element_bounds(views[expr])
+        if isinstance(expr, BinaryExpression):
+            left = self.bounds(expr.left, values, views, indices)
+            right = self.bounds(expr.right, values, views, indices)
+            if left is None or right is None:
+                return None
+            return self.combine(expr.operator, left, right)
+        operand = self.bounds(expr.operand, values, views, indices)
+        if operand is None or operand is FLOATING or expr.operator == '+':
+            return operand
+        return -operand[1], -operand[0]
+
+    @staticmethod
+    def element_bounds(view) -> Tuple:
+        if view.dtype.kind == 'f':
+            return FLOATING
+        info = numpy.iinfo(view.dtype)
+        return int(info.min), int(info.max)
+
+    @classmethod
+    def combine(cls, operator: str, left: Tuple, right: Tuple) -> Optional[Tuple]:
+        """bounds() of `left operator right`"""
+        if left is FLOATING or right is FLOATING:
+            # Integer operands are converted, so must be exact; bit operations on floats fail anyway
+            if operator in ('&', '|', '^', '<<', '>>') or not (cls.fits(left) and cls.fits(right)):
+                return None
+            return FLOATING
+        if operator not in WRAPPING_OPS and not (cls.fits(left) and cls.fits(right)):
+            return None
+        (a, b), (c, d) = left, right
+        if operator in ('<<', '>>'):
+            if c < 0 or d > 63:
+                return None
+            shift = (lambda x, n: x << n) if operator == '<<' else (lambda x, n: x >> n)
+            span = min(shift(a, c), shift(a, d)), max(shift(b, c), shift(b, d))
+        elif operator == '+':
+            span = a + c, b + d
+        elif operator == '-':
+            span = a - d, b - c
+        elif operator == '*':
+            products = (a * c, a * d, b * c, b * d)
+            span = min(products), max(products)
+        elif operator == '/':
+            span = -max(-a, b), max(-a, b)
+        elif operator == '%':
+            span = -max(-c, d), max(-c, d)
+        else:
+            # &, | and ^ stay within the two's complement width of their operands
+            bits = max(abs(x).bit_length() for x in (a, b, c, d))
+            span = -(1 << bits), (1 << bits) - 1
+        if operator not in WRAPPING_OPS and not cls.fits(span):
+            return None
+        return span
+
+    @staticmethod
+    def fits(span: Tuple) -> bool:
+        """Floating, or integers that int64 represents exactly"""
+        return span is FLOATING or INT64_MIN <= span[0] and span[1] <= INT64_MAX
+
+
+class LoopAnalyzer:
+    """Decides whether a resolved ForStatement has the shape of a VectorLoop and builds it"""
+
+    def __init__(self, loop: ForStatement) -> None:
+        self.loop = loop
+        self.name = None            # loop variable
+        self.reductions = set()     # names of reduction variables
+        self.own = set()            # ids of the Identifier nodes reductions may use
+        self.plan: Optional[VectorLoop] = None
+
+    def analyze(self) -> Optional[VectorLoop]:
+        loop = self.loop
+        if not self.header(loop.condition, loop.update):
+            return None
+
+        statements = []
+        for stmt in self.flatten(loop.body):
+            statement = self.classify(stmt)
+            if statement is None:
+                return None
+            statements.append(statement)
+
+        # A reduction variable may only be touched by its own statement
+        for target, _, _ in statements:
+            if isinstance(target, Identifier):
+                if target.name in self.reductions or target.name == self.name:
+                    return None
+                self.reductions.add(target.name)
+        for node in iter_nodes(loop.body):
+            if isinstance(node, Identifier) and node.name in self.reductions and id(node) not in self.own:
+                return None
+        if not self.invariant(self.plan.bound):
+            return None
+
+        for target, operator, value in statements:
+            if isinstance(target, ArrayAccess) and not self.access(target, True):
+                return None
+            if not self.vector(value):
+                return None
+        if self.carried():
+            return None
+        self.plan.statements = statements
+        return self.plan
+
+    def header(self, condition, update) -> bool:
+        """Recognise `i < bound` (or <=, >, >=) and a constant positive step of i"""
+        if not isinstance(condition, BinaryExpression):
+            return False
+        if condition.operator in ('<', '<=') and isinstance(condition.left, Identifier):
+            variable, bound = condition.left, condition.right
+        elif condition.operator in ('>', '>=') and isinstance(condition.right, Identifier):
+            variable, bound = condition.right, condition.left
+        else:
+            return False
+        self.name = variable.name
+
+        step = None
+        if isinstance(update, UnaryExpression) and update.operator in ('++', '++_post'):
+            if self.is_variable(update.operand):
+                step = 1
+        elif isinstance(update, AssignmentExpression) and self.is_variable(update.left):
+            if update.operator == '+=':
+                step = self.constant(update.right)
+            elif (update.operator == '=' and isinstance(update.right, BinaryExpression)
+                  and update.right.operator == '+'):
+                if self.is_variable(update.right.left):
+                    step = self.constant(update.right.right)
+                elif self.is_variable(update.right.right):
+                    step = self.constant(update.right.left)
+        if step is None or step <= 0:
+            return False
+        self.plan = VectorLoop(variable, bound, condition.operator in ('<=', '>='), step)
+        return True
+
+    def flatten(self, stmt) -> List:
+        if isinstance(stmt, CompoundStatement):
+            statements = []
+            for child in stmt.statements:
+                statements.extend(self.flatten(child))
+            return statements
+        if isinstance(stmt, ExpressionStatement) and stmt.expression is None:
+            return []
+        return [stmt]
+
+    def classify(self, stmt) -> Optional[Tuple]:
+        """(target, operator, value) for a store or a reduction statement"""
+        if not isinstance(stmt, ExpressionStatement) or not isinstance(stmt.expression, AssignmentExpression):
+            return None
+        expr = stmt.expression
+        target, value = expr.left, expr.right
+        if isinstance(target, ArrayAccess):
+            if expr.operator == '=':
+                return target, '=', value
+            return target, COMPOUND_OPS[expr.operator], value
+        if not isinstance(target, Identifier):
+            return None
+        self.own.add(id(target))
+        if expr.operator in REDUCTION_OPS:
+            return target, REDUCTION_OPS[expr.operator], value
+        # s = s + e, s = e + s, s = s - e
+        if expr.operator == '=' and isinstance(value, BinaryExpression) and value.operator in ('+', '-'):
+            if isinstance(value.left, Identifier) and value.left.name == target.name:
+                self.own.add(id(value.left))
+                return target, value.operator, value.right
+            if (value.operator == '+' and isinstance(value.right, Identifier)
+                    and value.right.name == target.name):
+                self.own.add(id(value.right))
+                return target, '+', value.left
+        return None
+
+    def vector(self, expr) -> bool:
+        """Can expr be computed for all iterations at once? Records its accesses and invariants."""
+        if self.invariant(expr):
+            self.plan.invariants.append(expr)
+            return True
+        if self.is_variable(expr):
+            return True
+        if isinstance(expr, ArrayAccess):
+            return self.access(expr, False)
+        if isinstance(expr, BinaryExpression):
+            return expr.operator in VECTOR_OPS and self.vector(expr.left) and self.vector(expr.right)
+        if isinstance(expr, UnaryExpression):
+            return expr.operator in ('-', '+') and self.vector(expr.operand)
+        return False
+
+    def access(self, expr: ArrayAccess, written: bool) -> bool:
+        if not isinstance(expr.array, Identifier) or not self.invariant(expr.array):
+            return False
+        if expr.ctype is None or expr.ctype.kind not in WIDE_TYPES:
+            return False
+        index = self.affine(expr.index)
+        if index is None or index[0] < 1:
+            return False
+        self.plan.accesses[expr] = (index[0], index[1], written)
+        return True
+
+    def carried(self) -> bool:
+        """A written array is also accessed, under the same name, at a visibly different index.
+
+        Aliases and symbolic offsets are only known at run time; run checks them.
+        """
+        accesses = self.plan.accesses
+        for access, (scale, terms, written) in accesses.items():
+            if not written:
+                continue
+            for other, (other_scale, other_terms, _) in accesses.items():
+                if other.array.name != access.array.name:
+                    continue
+                offset, other_offset = self.constant_offset(terms), self.constant_offset(other_terms)
+                if scale != other_scale or None not in (offset, other_offset) and offset != other_offset:
+                    return True
+        return False
+
+    def constant_offset(self, terms: List) -> Optional[int]:
+        if all(self.constant(term) is not None for _, term in terms):
+            return sum(coefficient * term.value for coefficient, term in terms)
+        return None
+
+    def affine(self, expr) -> Optional[Tuple[int, List]]:
+        """expr as scale * i + sum(coefficient * term) with invariant terms, or None"""
+        if self.is_variable(expr):
+            return 1, []
+        if self.invariant(expr):
+            return 0, [(1, expr)]
+        if not isinstance(expr, BinaryExpression):
+            return None
+        if expr.operator in ('+', '-'):
+            left, right = self.affine(expr.left), self.affine(expr.right)
+            if left is None or right is None:
+                return None
+            sign = 1 if expr.operator == '+' else -1
+            return left[0] + sign * right[0], left[1] + [(sign * c, term) for c, term in right[1]]
+        if expr.operator == '*':
+            for factor, other in ((expr.left, expr.right), (expr.right, expr.left)):
+                constant = self.constant(factor)
+                inner = self.affine(other) if constant is not None else None
+                if inner is not None:
+                    return inner[0] * constant, [(c * constant, term) for c, term in inner[1]]
+        return None
+
+    def invariant(self, expr) -> bool:
+        """Side-effect free and independent of the loop variable and the reductions"""
+        if isinstance(expr, Literal):
+            return type(expr.value) in (int, float)
+        if isinstance(expr, Identifier):
+            return expr.name != self.name and expr.name not in self.reductions
+        if isinstance(expr, BinaryExpression):
+            return expr.operator in VECTOR_OPS and self.invariant(expr.left) and self.invariant(expr.right)
+        if isinstance(expr, UnaryExpression):
+            return expr.operator in ('-', '+') and self.invariant(expr.operand)
+        return False
+
+    def is_variable(self, expr) -> bool:
+        return isinstance(expr, Identifier) and expr.name == self.name
+
+    def constant(self, expr) -> Optional[int]:
+        if isinstance(expr, Literal) and type(expr.value) is int:
+            return expr.value
+        return None
+
+
+def vector_loops(program: Program) -> Dict[ForStatement, VectorLoop]:
+    """Plans for the for loops of a laid out, resolved program that may run as whole-array operations"""
+    loops = {}
+    if numpy is None:
+        return loops
+    for decl in program.declarations:
+        if not isinstance(decl, FunctionDeclaration):
+            continue
+        for node in iter_nodes(decl.body):
+            if isinstance(node, ForStatement):
+                plan = LoopAnalyzer(node).analyze()
+                if plan is not None:
+                    loops[node] = plan
+    return loops
+
+
+def main():
+    source_code = """
+    int main() {
+        int n = 1000;
+        int a[1000];
+        int b[1000];
+        int sum = 0;
+        for (int i = 0; i < n; i++) {
+            b[i] = i;
+        }
+        for (int i = 0; i < n; i++) {
+            a[i] = b[i] * 3 + 1;
+            sum += a[i];
+        }
+        for (int i = 1; i < n; i++) {
+            a[i] = a[i - 1] + b[i];
+        }
+        return sum;
+    }
+    """
+    program = CParser(regex_lexer(source_code, skip_newlines=True)).parse()
+    MemoryLayout().run(program)
+    Resolver().resolve(program)
+    if numpy is None:
+        print("NumPy is not installed: every loop runs element by element")
+    for loop, plan in vector_loops(program).items():
+        print(f"vector loop over {plan.variable.name}: {len(plan.statements)} statements, "
+              f"{len(plan.accesses)} array accesses")
+
+if __name__ == "__main__":
+    main()